@@ -1,16 +1,46 @@
+import time
+
+# Момент запуска процесса для журнала этапов — до всех остальных импортов.
+_STARTED_AT = time.monotonic()
+
 import sys
 import ctypes
 import os
-from PyQt6.QtWidgets import QApplication, QMessageBox
-from src.core.admin_utils import is_admin, restart_as_admin, show_critical_error
-from src.gui.gui import CommandRunnerApp
-from src.gui.translations import translator
 
 APP_GUID = "{2470b8b0-e497-41e4-a51d-d2dd745535ac}"
+HEADLESS_FLAG = "--headless"
 _instance_mutex_handle = None
 is_first_instance = False
 
 if __name__ == "__main__":
+    # Headless-режим не должен загружать PyQt6, поэтому GUI импортируется ниже.
+    if HEADLESS_FLAG in sys.argv[1:]:
+        from src.cli import main as cli_main
+
+        sys.exit(cli_main([arg for arg in sys.argv[1:] if arg != HEADLESS_FLAG]))
+
+    import logging
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+
+    from src.core import lifecycle
+
+    # После перезапуска от администратора цикл запуска продолжается с исходного момента.
+    origin = lifecycle.take_origin(sys.argv)
+    try:
+        lifecycle.events.start(lifecycle.default_path())
+    except OSError as e:
+        logging.warning(f"Lifecycle log is unavailable: {e}")
+    if origin is None:
+        origin = _STARTED_AT
+        lifecycle.mark("process_start", at=origin, origin=origin)
+    else:
+        lifecycle.mark("elevated", origin=origin)
+
+    # Проверка второго экземпляра и forward() идут до импорта PyQt6 и GUI:
+    # повторный запуск с командой не должен платить за загрузку Qt.
+    from src.core.admin_utils import is_admin, restart_as_admin, show_critical_error
+    from src.gui.translations import translator
 
     kernel32 = ctypes.windll.kernel32
     user32 = ctypes.windll.user32
@@ -23,6 +53,17 @@ if __name__ == "__main__":
         last_error = kernel32.GetLastError()
 
         if last_error == ERROR_ALREADY_EXISTS:
+            if sys.argv[1:]:
+                # Повторный запуск с аргументами передает команду работающему экземпляру.
+                from src.core.control import forward
+
+                try:
+                    ok, output = forward(sys.argv[1:])
+                except Exception as e:
+                    ok, output = False, str(e)
+                print(output, file=sys.stdout if ok else sys.stderr)
+                kernel32.CloseHandle(_instance_mutex_handle)
+                sys.exit(0 if ok else 1)
             try:
                 window_title = "Zapret"
                 hwnd = user32.FindWindowW(None, window_title)
@@ -38,6 +79,7 @@ if __name__ == "__main__":
 
         elif last_error == 0 and _instance_mutex_handle:
              is_first_instance = True
+             lifecycle.mark("instance_checked", origin=origin)
 
         else:
             raise ctypes.WinError(last_error)
@@ -49,16 +91,24 @@ if __name__ == "__main__":
             kernel32.CloseHandle(_instance_mutex_handle)
         sys.exit(1) # Keep exit here, ignore potential PyCharm warning if it occurs
 
+    from PyQt6.QtWidgets import QApplication, QMessageBox
+    from src.gui.gui import CommandRunnerApp
+
+    lifecycle.mark("imports_done", origin=origin)
+
     exit_code = 1
     try:
         if not is_admin():
-            restart_as_admin(translator)
+            restart_as_admin(translator, origin)
             sys.exit(1)
+        lifecycle.mark("admin_checked", origin=origin)
 
         app = QApplication(sys.argv)
         try:
             window = CommandRunnerApp()
+            lifecycle.mark("window_created", origin=origin)
             window.show()
+            lifecycle.mark("window_shown", origin=origin)
             exit_code = app.exec()
 
         except RuntimeError as e:
@@ -84,4 +134,5 @@ if __name__ == "__main__":
         if is_first_instance and _instance_mutex_handle:
             kernel32.ReleaseMutex(_instance_mutex_handle)
             kernel32.CloseHandle(_instance_mutex_handle)
+        lifecycle.events.stop()
         sys.exit(exit_code)
\ No newline at end of file
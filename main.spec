@@ -1,11 +1,21 @@
 # -*- mode: python ; coding: utf-8 -*-
+import os
+import sys
 
+sys.path.insert(0, SPECPATH)
+from src.core.extract_cache import BUILD_OVERLAY, PAYLOAD_NAME, build_payload
+
+# Ресурсы упаковываются в один архив: он распаковывается в постоянный кэш
+# один раз на версию, а не загрузчиком во временный каталог при каждом запуске.
+# Списки, сжатые в CI, берутся из build/overlay вместо исходных.
+payload = os.path.join(workpath, PAYLOAD_NAME)
+build_payload(SPECPATH, payload, overlay=os.path.join(SPECPATH, BUILD_OVERLAY))
 
 a = Analysis(
     ['main.py'],
     pathex=['src'],
     binaries=[],
-    datas=[('src/gui/translations', 'src/gui/translations'), ('src/scripts/bin', 'src/scripts/bin'), ('src/scripts/*.txt', 'src/scripts'), ('src/scripts/commands.json', 'src/scripts'), ('icon.ico', '.')],
+    datas=[(payload, '.'), ('icon.ico', '.')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
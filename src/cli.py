@@ -0,0 +1,310 @@
+"""Headless-управление Zapret без PyQt6: list, start, stop, status, switch.
+
+Запуск: ``python main.py --headless <команда>`` или ``python -m src.cli <команда>``.
+Профиль обслуживается фоновым процессом ``run``; остальные команды
+обращаются к работающему экземпляру (фоновому или GUI) через канал
+управления из src.core.control.
+"""
+
+import argparse
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Final, Optional
+
+from src.core.process_utils import DETACHED_CREATION_FLAGS
+
+
+PROJECT_ROOT: Final[str] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IDLE_POLL_INTERVAL: Final[float] = 0.2
+DEFAULT_WAIT: Final[float] = 10.0
+
+
+def _call(cmd: str, **params: Any) -> Any:
+    from src.core.control import ControlClient
+
+    with ControlClient() as client:
+        return client.call(cmd, **params)
+
+
+def read_status() -> Optional[dict]:
+    """Состояние работающего экземпляра или None, если он не запущен."""
+    from src.core.control import ping
+
+    if not ping():
+        return None
+    return _call("status")
+
+
+def _daemon_command(profile: str, sharded: bool) -> list[str]:
+    if getattr(sys, "frozen", False):
+        command = [sys.executable, "--headless", "run", profile]
+    else:
+        command = [sys.executable, "-m", "src.cli", "run", profile]
+    return command + (["--sharded"] if sharded else [])
+
+
+def _check_admin() -> bool:
+    if sys.platform != "win32":
+        from src.core.backends import BACKEND_NFQWS, backend_name
+
+        # nfqws и nft требуют CAP_NET_ADMIN.
+        if backend_name() != BACKEND_NFQWS or os.geteuid() == 0:
+            return True
+        print("Root privileges are required to run nfqws.", file=sys.stderr)
+        return False
+    from src.core.admin_utils import is_admin
+
+    if is_admin():
+        return True
+    print("Administrator rights are required to run winws.", file=sys.stderr)
+    return False
+
+
+def _load_runner():
+    from src.scripts.commands import ZapretRunner
+
+    return ZapretRunner()
+
+
+def cmd_list(args: argparse.Namespace) -> int:
+    status = read_status()
+    active = status.get("profile") if status and status.get("status") == "running" else None
+    for name in _load_runner().registry:
+        print(f"{'*' if name == active else ' '} {name}")
+    return 0
+
+
+def cmd_status(args: argparse.Namespace) -> int:
+    status = read_status()
+    if status is None:
+        print("stopped")
+        return 0
+    print(f"{status.get('status')} {status.get('profile') or '-'}")
+    if status.get("error"):
+        print(status["error"])
+    return 0
+
+
+def _request(cmd: str, profile: Optional[str], wait: float) -> int:
+    from src.core.control import ControlError
+
+    try:
+        state = _call(cmd, profile=profile, wait=True, timeout=wait)
+    except ControlError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    print(f"{state.get('status')} {state.get('profile') or '-'}")
+    return 0 if state.get("profile") == profile else 1
+
+
+def _wait_for_instance(timeout: float) -> bool:
+    from src.core.control import ping
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if ping():
+            return True
+        time.sleep(IDLE_POLL_INTERVAL / 4)
+    return False
+
+
+def cmd_start(args: argparse.Namespace) -> int:
+    if args.profile not in _load_runner().registry:
+        print(f"Command '{args.profile}' not found", file=sys.stderr)
+        return 1
+    status = read_status()
+    if status is not None:
+        running = status.get("profile") if status.get("status") != "stopped" else None
+        if running and running != args.profile:
+            print(f"Profile '{running}' is already running; use 'switch'.", file=sys.stderr)
+            return 1
+        return _request("start", args.profile, args.wait)
+    if not _check_admin():
+        return 1
+
+    kwargs: dict = {"start_new_session": True} if sys.platform != "win32" else {}
+    subprocess.Popen(
+        _daemon_command(args.profile, args.sharded),
+        cwd=PROJECT_ROOT,
+        creationflags=DETACHED_CREATION_FLAGS,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        **kwargs,
+    )
+    if not _wait_for_instance(args.wait):
+        print(f"Failed to start '{args.profile}'", file=sys.stderr)
+        return 1
+    return _request("start", args.profile, args.wait)
+
+
+def cmd_switch(args: argparse.Namespace) -> int:
+    if read_status() is None:
+        return cmd_start(args)
+    return _request("switch", args.profile, args.wait)
+
+
+def cmd_stop(args: argparse.Namespace) -> int:
+    if read_status() is None:
+        print("stopped")
+        return 0
+    return _request("stop", None, args.wait)
+
+
+def cmd_run(args: argparse.Namespace) -> int:
+    """Фоновый процесс: держит профиль под супервизором, пока он не остановлен."""
+    from src.core import lifecycle
+    from src.core.control import ControlServer
+    from src.core.file_watcher import FileWatchService
+    from src.core.supervisor import STATE_STOPPED, ProcessSupervisor
+
+    if not _check_admin():
+        return 1
+
+    runner = _load_runner()
+    runner.sharded = runner.sharded or args.sharded
+    stop_event = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop_event.set())
+
+    try:
+        lifecycle.events.start(lifecycle.default_path())
+    except OSError as e:
+        print(f"Warning: Lifecycle log is unavailable: {e}", file=sys.stderr)
+    supervisor = ProcessSupervisor(runner, lambda state: None)
+    server = ControlServer(supervisor, runner.registry)
+    try:
+        server.start()
+    except OSError as e:
+        print(f"Another instance is already running: {e}", file=sys.stderr)
+        return 1
+    for pid in runner.reap_orphans():
+        print(f"Stopped orphaned winws process {pid}", file=sys.stderr)
+    supervisor.start()
+    supervisor.request(args.profile)
+    watcher = FileWatchService(supervisor, runner.registry)
+    watcher.start()
+
+    try:
+        while not stop_event.wait(IDLE_POLL_INTERVAL):
+            if supervisor.desired is None and supervisor.state.status == STATE_STOPPED:
+                break
+    finally:
+        server.stop()
+        watcher.stop()
+        supervisor.shutdown()
+        lifecycle.events.stop()
+    return 0
+
+
+def _measure(code: str, runs: int) -> dict[str, float]:
+    durations: list[float] = []
+    peak_rss_kb = 0
+    for _ in range(runs):
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, "-c", code],
+            cwd=PROJECT_ROOT,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        if hasattr(os, "wait4"):
+            _, exit_status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(exit_status)
+            peak_rss_kb = max(peak_rss_kb, usage.ru_maxrss)
+        else:
+            process.wait()
+        durations.append(time.perf_counter() - started)
+        if process.returncode != 0:
+            return {"error": float(process.returncode)}
+    return {"median_ms": statistics.median(durations) * 1000, "peak_rss_kb": float(peak_rss_kb)}
+
+
+def cmd_bench_startup(args: argparse.Namespace) -> int:
+    """Сравнивает время запуска и память headless-пути и GUI-пути."""
+    paths = {
+        "headless": "from src.cli import _load_runner; _load_runner()",
+        "gui": "import src.gui.gui",
+    }
+    for name, code in paths.items():
+        result = _measure(code, args.runs)
+        print(name + "\t" + "\t".join(f"{k}={v:.1f}" for k, v in result.items()))
+    return 0
+
+
+IMPORT_GUARD_CODE: Final[str] = """
+import sys
+from src.cli import main
+main(["list"])
+leaked = sorted(m for m in sys.modules if m == "PyQt6" or m.startswith("PyQt6."))
+if leaked:
+    print("Qt modules imported in headless mode: " + ", ".join(leaked), file=sys.stderr)
+    sys.exit(1)
+"""
+
+
+def cmd_check_imports(args: argparse.Namespace) -> int:
+    """Падает, если в графе импорта headless-режима появился PyQt6."""
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_GUARD_CODE],
+        cwd=PROJECT_ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    if result.returncode != 0:
+        print(result.stderr.strip(), file=sys.stderr)
+        return 1
+    print("ok: headless import graph is free of PyQt6")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="zapret-cli", description="Headless Zapret control.")
+    subparsers = parser.add_subparsers(dest="action", required=True)
+
+    subparsers.add_parser("list", help="List profiles").set_defaults(func=cmd_list)
+    subparsers.add_parser("status", help="Show the running profile").set_defaults(
+        func=cmd_status
+    )
+    stop = subparsers.add_parser("stop", help="Stop the running profile")
+    stop.add_argument("--wait", type=float, default=DEFAULT_WAIT)
+    stop.set_defaults(func=cmd_stop)
+    for name, func, help_text in (
+        ("start", cmd_start, "Start a profile in the background"),
+        ("switch", cmd_switch, "Switch the running profile"),
+        ("run", cmd_run, "Run a profile in the foreground"),
+    ):
+        command = subparsers.add_parser(name, help=help_text)
+        command.add_argument("profile")
+        command.add_argument("--wait", type=float, default=DEFAULT_WAIT)
+        command.add_argument(
+            "--sharded",
+            action="store_true",
+            help="Run one winws per group of non-overlapping ports (new instance only)",
+        )
+        command.set_defaults(func=func)
+
+    bench = subparsers.add_parser(
+        "bench-startup", help="Compare headless and GUI startup time and memory"
+    )
+    bench.add_argument("--runs", type=int, default=5)
+    bench.set_defaults(func=cmd_bench_startup)
+    subparsers.add_parser(
+        "check-imports", help="Fail if PyQt6 is imported in headless mode"
+    ).set_defaults(func=cmd_check_imports)
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
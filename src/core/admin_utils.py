@@ -1,10 +1,9 @@
 import ctypes
 import os
 import sys
-from typing import NoReturn
+from typing import NoReturn, Optional
 
-from PyQt6.QtWidgets import QMessageBox, QApplication
-from PyQt6.QtCore import Qt
+from src.core import lifecycle
 
 
 def is_admin() -> bool:
@@ -31,6 +30,10 @@ def show_critical_error(
         message: Текст сообщения об ошибке.
         translator: Экземпляр переводчика.
     """
+    # Qt импортируется здесь, чтобы headless-режим не тянул PyQt6.
+    from PyQt6.QtWidgets import QMessageBox, QApplication
+    from PyQt6.QtCore import Qt
+
     app = QApplication.instance()
     if app is None:
         app = QApplication(sys.argv if hasattr(sys, "argv") else [])
@@ -45,7 +48,7 @@ def show_critical_error(
     msg_box.exec()
 
 
-def restart_as_admin(translator) -> NoReturn:
+def restart_as_admin(translator, origin: Optional[float] = None) -> NoReturn:
     """
     Пытается перезапустить текущий скрипт с правами администратора.
     Если успешно, текущий процесс завершается.
@@ -53,10 +56,16 @@ def restart_as_admin(translator) -> NoReturn:
 
     Args:
         translator: Экземпляр переводчика.
+        origin: Момент исходного запуска (time.monotonic) для журнала этапов;
+            передается новому процессу, чтобы время перезапуска вошло в цикл запуска.
     """
     try:
         script = os.path.abspath(sys.argv[0])
-        params = " ".join(f'"{arg}"' for arg in sys.argv[1:])
+        args = list(sys.argv[1:])
+        if origin is not None:
+            args.append(f"{lifecycle.ORIGIN_ARG}{origin}")
+            lifecycle.mark("admin_restart", origin=origin)
+        params = " ".join(f'"{arg}"' for arg in args)
         executable = sys.executable
         full_params = f'"{script}" {params}'
 
@@ -0,0 +1,156 @@
+"""Бэкенды запуска профилей: winws на Windows и nfqws с nftables на Linux.
+
+Профили в commands.json записаны в синтаксисе winws. Бэкенд решает,
+какие команды запустить для собранного реестром ProfileEntry, и что
+подготовить в системе до запуска и убрать после остановки. ZapretRunner
+работает только через этот интерфейс.
+
+Выбор бэкенда: переменная окружения BACKEND_ENV ("winws" или "nfqws"),
+иначе winws на Windows и nfqws на остальных системах.
+"""
+
+import abc
+import os
+import shutil
+import sys
+from typing import TYPE_CHECKING, Final, Optional
+
+from src.core.profiles import GLOBAL_OPTIONS
+from src.core.registry import ProfileEntry
+
+if TYPE_CHECKING:
+    from src.core.ipset_aggregator import AggregateResult
+    from src.core.nftables import NftFirewall
+
+
+BACKEND_ENV: Final[str] = "ZAPRET_BACKEND"
+BACKEND_WINWS: Final[str] = "winws"
+BACKEND_NFQWS: Final[str] = "nfqws"
+# Куда ставит nfqws install_bin.sh из zapret.
+NFQWS_DEFAULT_PATH: Final[str] = "/opt/zapret/nfq/nfqws"
+
+
+class RunnerBackend(abc.ABC):
+    """Интерфейс бэкенда. Базовая реализация ничего не готовит в системе."""
+
+    name: str = ""
+
+    @abc.abstractmethod
+    def default_launcher(self) -> tuple[str, ...]:
+        """Команда запуска по умолчанию, к которой реестр добавляет аргументы."""
+
+    @abc.abstractmethod
+    def commands(
+        self, entry: ProfileEntry, launcher: tuple[str, ...], sharded: bool
+    ) -> tuple[tuple[str, ...], ...]:
+        """argv процессов профиля; launcher — команда, с которой реестр собрал entry.argv."""
+
+    def activate(self, entry: ProfileEntry) -> None:
+        """Готовит систему к запуску профиля (до старта процессов)."""
+
+    def rollback(self) -> None:
+        """Отменяет последний activate, если процессы не запустились."""
+
+    def deactivate(self) -> None:
+        """Убирает подготовленное после остановки процессов."""
+
+
+class WinwsBackend(RunnerBackend):
+    """winws сам ставит фильтр WinDivert по --wf-*; в режиме шардов — процесс на шард."""
+
+    name = BACKEND_WINWS
+
+    def __init__(self, executable: str):
+        self.executable: str = executable
+
+    def default_launcher(self) -> tuple[str, ...]:
+        return (self.executable,)
+
+    def commands(
+        self, entry: ProfileEntry, launcher: tuple[str, ...], sharded: bool
+    ) -> tuple[tuple[str, ...], ...]:
+        return entry.shards if sharded and entry.shards else (entry.argv,)
+
+
+class NfqwsBackend(RunnerBackend):
+    """nfqws читает очередь NFQUEUE, а правила перехвата ставятся в nftables.
+
+    Глобальные опции --wf-* переводятся в правила (см. nftables), секции
+    передаются nfqws без изменений. Шарды не нужны: отбор пакетов
+    выполняет ядро, и процесс всегда один.
+    """
+
+    name = BACKEND_NFQWS
+
+    def __init__(
+        self,
+        script_dir: str,
+        executable: Optional[str] = None,
+        firewall: Optional["NftFirewall"] = None,
+        qnum: Optional[int] = None,
+    ):
+        # nftables импортируется только здесь: на Windows модуль не нужен.
+        from src.core.nftables import DEFAULT_QNUM, NftFirewall
+
+        self.script_dir: str = script_dir
+        self.executable: str = executable or shutil.which("nfqws") or NFQWS_DEFAULT_PATH
+        self.firewall: NftFirewall = firewall or NftFirewall()
+        self.qnum: int = DEFAULT_QNUM if qnum is None else qnum
+        # Сжатые ipset по путям: при переключении профилей файлы не перечитываются.
+        self._ipsets: dict[tuple[str, ...], "AggregateResult"] = {}
+        self._ipset_signature: dict[str, tuple[int, int]] = {}
+
+    def default_launcher(self) -> tuple[str, ...]:
+        return (self.executable,)
+
+    def commands(
+        self, entry: ProfileEntry, launcher: tuple[str, ...], sharded: bool
+    ) -> tuple[tuple[str, ...], ...]:
+        from src.core.nftables import DESYNC_MARK
+
+        argv = [*launcher, f"--qnum={self.qnum}", f"--dpi-desync-fwmark={DESYNC_MARK:#x}"]
+        for token in entry.argv[len(launcher):]:
+            if token.partition("=")[0] in GLOBAL_OPTIONS:
+                continue
+            argv.append(token)
+        return (tuple(argv),)
+
+    def _drop_changed_ipsets(self, entry: ProfileEntry) -> None:
+        for path in entry.files:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if self._ipset_signature.get(path, signature) != signature:
+                self._ipsets = {k: v for k, v in self._ipsets.items() if path not in k}
+            self._ipset_signature[path] = signature
+
+    def activate(self, entry: ProfileEntry) -> None:
+        from src.core.nftables import build_ruleset
+
+        self._drop_changed_ipsets(entry)
+        ruleset = build_ruleset(entry.profile, self.script_dir, qnum=self.qnum, ipsets=self._ipsets)
+        self.firewall.apply(ruleset.render())
+
+    def rollback(self) -> None:
+        self.firewall.rollback()
+
+    def deactivate(self) -> None:
+        self.firewall.clear()
+
+
+def backend_name() -> str:
+    name = os.environ.get(BACKEND_ENV)
+    if name:
+        return name
+    return BACKEND_WINWS if sys.platform == "win32" else BACKEND_NFQWS
+
+
+def create_backend(script_dir: str, winws_path: str, name: Optional[str] = None) -> RunnerBackend:
+    name = name or backend_name()
+    if name == BACKEND_WINWS:
+        return WinwsBackend(winws_path)
+    if name == BACKEND_NFQWS:
+        return NfqwsBackend(script_dir)
+    raise ValueError(f"Unknown backend '{name}' (expected {BACKEND_WINWS} or {BACKEND_NFQWS})")
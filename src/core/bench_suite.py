@@ -0,0 +1,382 @@
+"""Набор замеров производительности и отказоустойчивости на заглушке winws.
+
+``python -m src.core.bench_suite run --output bench.json`` подменяет
+winws.exe заглушкой из src.core.winws_stub и замеряет задержку
+ZapretRunner.run/terminate, сценарии отказов, круговую задержку
+интерфейса (Qt offscreen) и потребление памяти за много циклов.
+``python -m src.core.bench_suite compare old.json new.json`` сравнивает
+два прогона и завершается с кодом 1 при регрессии.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Final, Optional
+
+from src.core.backends import WinwsBackend
+from src.core.resource_sampler import open_reader
+from src.core.paths import isolated_data_dir
+from src.core.supervisor import (
+    STATE_RESTARTING,
+    STATE_RUNNING,
+    STATE_STOPPED,
+    ProcessSupervisor,
+)
+from src.core.winws_stub import stub_launcher
+from src.scripts.commands import WINWS_EXE_PATH, ZapretRunner
+
+
+SCHEMA_VERSION: Final[int] = 1
+# Метрики, рост которых сравнивается в compare (чем меньше, тем лучше).
+COMPARED_SUFFIXES: Final[tuple[str, ...]] = ("_ms", "_bytes")
+
+
+def _summary_ms(durations: list[float]) -> dict[str, float]:
+    ordered = sorted(durations)
+    return {
+        "p50_ms": statistics.median(ordered) * 1000,
+        "p95_ms": ordered[min(int(0.95 * len(ordered)), len(ordered) - 1)] * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def _use_stub(runner: ZapretRunner, **config: Any) -> None:
+    runner.registry.set_launcher(stub_launcher(**config))
+
+
+def _run_and_stop(runner: ZapretRunner, profile: str) -> tuple[float, float, float]:
+    """Один цикл: (run, terminate, ожидание выхода) в секундах."""
+    started = time.perf_counter()
+    runner.run(profile)
+    launched = time.perf_counter()
+    process = runner.current_process
+    runner.terminate()
+    terminated = time.perf_counter()
+    process.wait()
+    return launched - started, terminated - launched, time.perf_counter() - terminated
+
+
+def bench_launch(runner: ZapretRunner, profile: str, cycles: int) -> dict[str, Any]:
+    _use_stub(runner)
+    run, terminate, exit_wait = [], [], []
+    for _ in range(cycles):
+        timings = _run_and_stop(runner, profile)
+        run.append(timings[0])
+        terminate.append(timings[1])
+        exit_wait.append(timings[2])
+    return {
+        "cycles": cycles,
+        "run": _summary_ms(run),
+        "terminate": _summary_ms(terminate),
+        "exit_confirmed": _summary_ms(exit_wait),
+    }
+
+
+def bench_rss(runner: ZapretRunner, profile: str, cycles: int, samples: int = 20) -> dict[str, Any]:
+    """Циклы запуска/остановки с замером RSS, дескрипторов и потоков этого процесса."""
+    _use_stub(runner)
+    reader = open_reader(os.getpid())
+    every = max(cycles // samples, 1)
+    series: list[tuple[int, float, float, float]] = []
+    try:
+        for cycle in range(cycles):
+            _run_and_stop(runner, profile)
+            if cycle % every == 0 or cycle == cycles - 1:
+                _, rss, handles, threads, _ = reader.sample()
+                series.append((cycle, rss, handles, threads))
+    finally:
+        reader.close()
+    # Первый замер сделан до прогрева кэшей, поэтому рост считается от второго.
+    baseline = series[1] if len(series) > 1 else series[0]
+    return {
+        "cycles": cycles,
+        "rss_start_bytes": series[0][1],
+        "rss_end_bytes": series[-1][1],
+        "rss_growth_bytes": series[-1][1] - baseline[1],
+        "handles_growth": series[-1][2] - baseline[2],
+        "threads_growth": series[-1][3] - baseline[3],
+        "series": [list(point) for point in series],
+    }
+
+
+def _wait_for(predicate: Callable[[], bool], timeout: float) -> float:
+    started = time.perf_counter()
+    while not predicate():
+        if time.perf_counter() - started > timeout:
+            raise TimeoutError("condition not reached")
+        time.sleep(0.001)
+    return time.perf_counter() - started
+
+
+def _bench_slow_start(runner: ZapretRunner, profile: str) -> dict[str, Any]:
+    """Заглушка "инициализируется" 0.5 с: когда супервизор сообщает RUNNING
+    и когда процесс на самом деле готов."""
+    states: list[tuple[float, str]] = []
+    supervisor = ProcessSupervisor(
+        runner, lambda state: states.append((time.perf_counter(), state.status))
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        ready_file = os.path.join(tmp, "ready")
+        _use_stub(runner, start_delay=0.5, ready_file=ready_file)
+        supervisor.start()
+        try:
+            started = time.perf_counter()
+            supervisor.request(profile)
+            _wait_for(lambda: any(status == STATE_RUNNING for _, status in states), 10.0)
+            running_at = next(t for t, status in states if status == STATE_RUNNING)
+            process = runner.current_process
+            _wait_for(lambda: os.path.exists(ready_file), 10.0)
+            initialized_at = time.perf_counter()
+            supervisor.request(None)
+            _wait_for(lambda: states[-1][1] == STATE_STOPPED, 10.0)
+            process.wait()
+            stopped_at = time.perf_counter()
+        finally:
+            supervisor.shutdown()
+    return {
+        "running_ms": (running_at - started) * 1000,
+        "initialized_ms": (initialized_at - started) * 1000,
+        "stop_confirmed_ms": (stopped_at - initialized_at) * 1000,
+    }
+
+
+def bench_scenarios(runner: ZapretRunner, profile: str) -> dict[str, Any]:
+    results: dict[str, Any] = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        argv_log = os.path.join(tmp, "argv.jsonl")
+        _use_stub(runner, argv_log=argv_log)
+        runner.run(profile)
+        process = runner.current_process
+        try:
+            _wait_for(lambda: os.path.exists(argv_log) and os.path.getsize(argv_log) > 0, 10.0)
+        finally:
+            runner.terminate()
+            process.wait()
+        with open(argv_log, "r", encoding="utf-8") as f:
+            recorded = json.loads(f.readline())["argv"]
+        expected = list(runner.registry.get(profile).argv[len(runner.registry.launcher):])
+        results["argv_recorded"] = recorded == expected
+
+    _use_stub(runner, exit_code=2)
+    started = time.perf_counter()
+    try:
+        runner.run(profile)
+        process = runner.current_process
+        process.wait()
+        results["immediate_exit"] = {"returncode": process.returncode, "raised": False}
+    except RuntimeError:
+        results["immediate_exit"] = {"raised": True}
+    results["immediate_exit"]["elapsed_ms"] = (time.perf_counter() - started) * 1000
+    runner.discard_process(runner.current_process)
+
+    results["slow_start"] = _bench_slow_start(runner, profile)
+
+    _use_stub(runner, term_delay=0.5)
+    runner.run(profile)
+    time.sleep(0.2)  # заглушка должна успеть установить обработчик SIGTERM
+    process = runner.current_process
+    started = time.perf_counter()
+    runner.terminate()
+    terminated = time.perf_counter()
+    process.wait()
+    results["slow_termination"] = {
+        "terminate_ms": (terminated - started) * 1000,
+        "exit_confirmed_ms": (time.perf_counter() - started) * 1000,
+    }
+
+    flood = 16 << 20
+    _use_stub(runner, stderr_bytes=flood)
+    runner.log_buffer.clear()
+    started = time.perf_counter()
+    runner.run(profile)
+    process = runner.current_process
+    try:
+        _wait_for(lambda: len(runner.log_buffer) >= runner.log_buffer.capacity, 30.0)
+        time.sleep(0.5)
+    finally:
+        runner.terminate()
+        process.wait()
+    results["stderr_flood"] = {
+        "flood_bytes": flood,
+        "elapsed_ms": (time.perf_counter() - started) * 1000,
+        "buffered_lines": len(runner.log_buffer),
+        "capacity": runner.log_buffer.capacity,
+    }
+
+    _use_stub(runner, crash_after=0.2)
+    states: list[tuple[float, str]] = []
+    supervisor = ProcessSupervisor(
+        runner, lambda state: states.append((time.perf_counter(), state.status)),
+        backoff_initial=0.05,
+    )
+    supervisor.start()
+    try:
+        supervisor.request(profile)
+        _wait_for(lambda: any(status == STATE_RESTARTING for _, status in states), 10.0)
+        restart_at = next(t for t, status in states if status == STATE_RESTARTING)
+        _wait_for(
+            lambda: any(t > restart_at and s == STATE_RUNNING for t, s in states), 10.0
+        )
+        running_at = next(t for t, s in states if t > restart_at and s == STATE_RUNNING)
+        results["crash_restart"] = {"restart_ms": (running_at - restart_at) * 1000}
+    finally:
+        supervisor.shutdown()
+    return results
+
+
+def bench_gui(profile: str, cycles: int) -> dict[str, Any]:
+    """Круговая задержка: нажатие на профиль -> супервизор -> сигнал -> состояние строки.
+
+    Окно создается без фоновых служб: бенчмарк не должен убивать winws
+    работающего экземпляра, занимать его канал управления и порт метрик.
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PyQt6.QtWidgets import QApplication
+    except ImportError as e:
+        return {"skipped": f"PyQt6 is unavailable: {e}"}
+    from src.gui.gui import CommandRunnerApp
+
+    app = QApplication.instance() or QApplication([])
+    window = CommandRunnerApp(services=False)
+    start, stop = [], []
+
+    def round_trip(expected: Optional[str]) -> float:
+        started = time.perf_counter()
+        window.handle_command_button(profile)
+        while window._running_command_name != expected:
+            app.processEvents()
+            if time.perf_counter() - started > 10:
+                raise TimeoutError("GUI did not reach the expected state")
+        return time.perf_counter() - started
+
+    try:
+        for _ in range(cycles):
+            start.append(round_trip(profile))
+            stop.append(round_trip(None))
+    finally:
+        window._stop_background_services()
+        window.tray_icon.hide()
+        window.deleteLater()
+        app.processEvents()
+    return {"cycles": cycles, "start": _summary_ms(start), "stop": _summary_ms(stop)}
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(
+    profile: Optional[str], cycles: int, rss_cycles: int, gui_cycles: int
+) -> dict[str, Any]:
+    """Прогоняет набор с каталогом данных во временной папке."""
+    with isolated_data_dir():
+        return _run_suite(profile, cycles, rss_cycles, gui_cycles)
+
+
+def _run_suite(
+    profile: Optional[str], cycles: int, rss_cycles: int, gui_cycles: int
+) -> dict[str, Any]:
+    runner = ZapretRunner()
+    # Заглушка ведет себя как winws.
+    runner.use_backend(WinwsBackend(WINWS_EXE_PATH))
+    profile = profile or next(iter(runner.registry))
+    launcher = runner.registry.launcher
+    try:
+        results = {
+            "launch": bench_launch(runner, profile, cycles),
+            "scenarios": bench_scenarios(runner, profile),
+            "rss": bench_rss(runner, profile, rss_cycles),
+        }
+        _use_stub(runner)
+        results["gui"] = bench_gui(profile, gui_cycles)
+    finally:
+        runner.registry.set_launcher(launcher)
+    return {
+        "schema": SCHEMA_VERSION,
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": sys.platform,
+        "profile": profile,
+        "results": results,
+    }
+
+
+def _flatten(data: Any, prefix: str = "") -> dict[str, float]:
+    flat: dict[str, float] = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            flat.update(_flatten(value, f"{prefix}.{key}" if prefix else key))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        flat[prefix] = float(data)
+    return flat
+
+
+def compare(old: dict[str, Any], new: dict[str, Any], threshold: float) -> list[str]:
+    """Метрики *_ms и *_bytes, выросшие больше чем в threshold раз."""
+    old_flat, new_flat = _flatten(old["results"]), _flatten(new["results"])
+    regressions = []
+    for key, value in new_flat.items():
+        if not key.endswith(COMPARED_SUFFIXES) or key not in old_flat:
+            continue
+        baseline = old_flat[key]
+        if baseline > 0 and value > baseline * threshold:
+            regressions.append(f"{key}: {baseline:.3f} -> {value:.3f}")
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark and stress suite on a winws stub.")
+    subparsers = parser.add_subparsers(dest="action", required=True)
+
+    run = subparsers.add_parser("run", help="Run the suite and emit JSON")
+    run.add_argument("--profile")
+    run.add_argument("--cycles", type=int, default=200)
+    run.add_argument("--rss-cycles", type=int, default=10000)
+    run.add_argument("--gui-cycles", type=int, default=100)
+    run.add_argument("--output", help="Write JSON here instead of stdout")
+
+    diff = subparsers.add_parser("compare", help="Compare two suite results")
+    diff.add_argument("old")
+    diff.add_argument("new")
+    diff.add_argument("--threshold", type=float, default=1.25)
+    args = parser.parse_args(argv)
+
+    if args.action == "compare":
+        with open(args.old, "r", encoding="utf-8") as f:
+            old = json.load(f)
+        with open(args.new, "r", encoding="utf-8") as f:
+            new = json.load(f)
+        regressions = compare(old, new, args.threshold)
+        for line in regressions:
+            print(line)
+        return 1 if regressions else 0
+
+    report = run_suite(args.profile, args.cycles, args.rss_cycles, args.gui_cycles)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""Локальный канал управления запущенным экземпляром Zapret.
+
+Сервер слушает именованный канал (Windows) или Unix-сокет (Linux) и
+принимает JSON-запросы ``{"id", "cmd", ...}``. Ответы ``{"id", "ok",
+"result" | "error"}`` приходят в порядке запросов, поэтому клиент может
+отправить пачку запросов и только потом читать ответы. Доступ ограничен
+ключом, который лежит в пользовательском каталоге данных. На Linux файл
+ключа создается с правами 0o600; на Windows права 0o600 не действуют, и
+ключ защищают права каталога %LOCALAPPDATA%, доступного только владельцу
+профиля (а также SYSTEM и администраторам).
+"""
+
+import json
+import os
+import secrets
+import sys
+import threading
+from dataclasses import asdict
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Any, Final, Iterable, Optional
+
+from src.core.paths import data_dir
+from src.core.supervisor import ProcessSupervisor
+
+
+PIPE_NAME: Final[str] = r"\\.\pipe\zapret-control-2470b8b0-e497-41e4-a51d-d2dd745535ac"
+SOCKET_NAME: Final[str] = "control.sock"
+KEY_NAME: Final[str] = "control.key"
+COMMANDS: Final[frozenset[str]] = frozenset(
+    {"ping", "list", "status", "start", "switch", "stop"}
+)
+DEFAULT_WAIT: Final[float] = 10.0
+
+
+class ControlError(RuntimeError):
+    """Ошибка, которую вернул сервер управления."""
+
+
+def control_address() -> str:
+    if sys.platform == "win32":
+        return PIPE_NAME
+    return os.path.join(data_dir(), SOCKET_NAME)
+
+
+def _key_path() -> str:
+    return os.path.join(data_dir(), KEY_NAME)
+
+
+def _read_key() -> Optional[bytes]:
+    try:
+        with open(_key_path(), "rb") as f:
+            return f.read() or None
+    except OSError:
+        return None
+
+
+def _write_key() -> bytes:
+    key = secrets.token_bytes(32)
+    path = _key_path()
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    os.replace(tmp_path, path)
+    return key
+
+
+class ControlServer:
+    """Обслуживает запросы управления, перенаправляя их супервизору."""
+
+    def __init__(self, supervisor: ProcessSupervisor, profiles: Iterable[str]):
+        self._supervisor: ProcessSupervisor = supervisor
+        self._profiles: Iterable[str] = profiles
+        self._address: str = control_address()
+        self._listener: Optional[Listener] = None
+        self._thread: Optional[threading.Thread] = None
+        self._closed: threading.Event = threading.Event()
+
+    def start(self) -> None:
+        """Начинает слушать адрес. OSError означает, что адрес уже занят.
+
+        Работающий экземпляр ищется до записи ключа на всех системах:
+        именованный канал Windows можно открыть повторно под тем же именем,
+        и новый ключ отрезал бы от первого экземпляра всех клиентов.
+        """
+        if ping():
+            raise OSError(f"Control channel is already in use: {self._address}")
+        if sys.platform != "win32" and os.path.exists(self._address):
+            os.remove(self._address)
+        key = _write_key()
+        self._listener = Listener(self._address, authkey=key)
+        self._thread = threading.Thread(
+            target=self._accept_loop, name="zapret-control", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._listener is None or self._closed.is_set():
+            return
+        self._closed.set()
+        try:
+            # Разблокирует accept(), ожидающий следующего клиента.
+            Client(self._address, authkey=_read_key()).close()
+        except Exception:
+            pass
+        self._listener.close()
+        if self._thread:
+            self._thread.join(1.0)
+        if sys.platform != "win32":
+            try:
+                os.remove(self._address)
+            except OSError:
+                pass
+
+    def _accept_loop(self) -> None:
+        while not self._closed.is_set():
+            try:
+                connection = self._listener.accept()
+            except Exception:
+                if self._closed.is_set():
+                    return
+                continue
+            if self._closed.is_set():
+                connection.close()
+                return
+            threading.Thread(
+                target=self._serve, args=(connection,), name="zapret-control-conn", daemon=True
+            ).start()
+
+    def _serve(self, connection: Connection) -> None:
+        with connection:
+            while True:
+                try:
+                    raw = connection.recv_bytes()
+                except (EOFError, OSError):
+                    return
+                response = self._handle_raw(raw)
+                try:
+                    connection.send_bytes(json.dumps(response, ensure_ascii=False).encode("utf-8"))
+                except OSError:
+                    return
+
+    def _handle_raw(self, raw: bytes) -> dict[str, Any]:
+        request_id = None
+        try:
+            request = json.loads(raw.decode("utf-8"))
+            request_id = request.get("id")
+            return {"id": request_id, "ok": True, "result": self.handle(request)}
+        except Exception as e:
+            return {"id": request_id, "ok": False, "error": str(e)}
+
+    def handle(self, request: dict[str, Any]) -> Any:
+        command = request.get("cmd")
+        if command not in COMMANDS:
+            raise ValueError(f"Unknown command '{command}'")
+        if command == "ping":
+            return "pong"
+        if command == "list":
+            return list(self._profiles)
+        if command == "status":
+            return asdict(self._supervisor.state)
+
+        if command == "stop":
+            profile = None
+        else:
+            profile = request.get("profile")
+            if profile not in self._profiles:
+                raise ValueError(f"Command '{profile}' not found")
+        since = self._supervisor.generation
+        self._supervisor.request(profile)
+        if not request.get("wait", False):
+            return {"accepted": True}
+        state = self._supervisor.wait_until_settled(
+            profile, float(request.get("timeout", DEFAULT_WAIT)), since
+        )
+        if state.error and state.profile != profile:
+            raise ControlError(state.error)
+        return asdict(state)
+
+
+class ControlClient:
+    """Клиент канала управления с поддержкой конвейерных запросов."""
+
+    def __init__(self, address: Optional[str] = None):
+        key = _read_key()
+        if key is None:
+            raise ConnectionRefusedError("Control key not found")
+        self._connection: Connection = Client(address or control_address(), authkey=key)
+        self._next_id: int = 0
+
+    def __enter__(self) -> "ControlClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def pipeline(self, requests: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Отправляет все запросы подряд и затем читает ответы по порядку."""
+        for request in requests:
+            self._next_id += 1
+            payload = dict(request, id=self._next_id)
+            self._connection.send_bytes(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+        return [json.loads(self._connection.recv_bytes()) for _ in requests]
+
+    def call(self, cmd: str, **params: Any) -> Any:
+        response = self.pipeline([dict(params, cmd=cmd)])[0]
+        if not response.get("ok"):
+            raise ControlError(response.get("error"))
+        return response.get("result")
+
+
+def ping() -> bool:
+    """Проверяет, отвечает ли запущенный экземпляр."""
+    try:
+        with ControlClient() as client:
+            return client.call("ping") == "pong"
+    except Exception:
+        return False
+
+
+def forward(argv: list[str], timeout: float = DEFAULT_WAIT) -> tuple[bool, str]:
+    """Пересылает аргументы второго запуска ("start X", "stop", ...) работающему экземпляру."""
+    if not argv:
+        raise ValueError("No command to forward")
+    command, params = argv[0], argv[1:]
+    request: dict[str, Any] = {"cmd": command, "wait": True, "timeout": timeout}
+    if command in ("start", "switch"):
+        if not params:
+            raise ValueError(f"'{command}' requires a profile name")
+        request["profile"] = params[0]
+    try:
+        with ControlClient() as client:
+            result = client.call(**request)
+    except ControlError as e:
+        return False, str(e)
+    if isinstance(result, list):
+        return True, "\n".join(result)
+    if isinstance(result, dict):
+        return True, f"{result.get('status')} {result.get('profile') or '-'}"
+    return True, str(result)
@@ -0,0 +1,275 @@
+import argparse
+import ipaddress
+import os
+import random
+import sys
+import time
+from dataclasses import dataclass
+from typing import Iterable, Optional, TextIO
+
+from src.core.lists import CidrSet, DomainTrie, iter_list_file, parse_address
+from src.core.profiles import (
+    PortRanges,
+    Profile,
+    load_profiles,
+    ports_contain,
+    resolve_path,
+)
+from src.scripts.commands import SCRIPT_DIR
+
+
+@dataclass(frozen=True)
+class CompiledSection:
+    profile: str
+    index: int
+    tcp_ports: Optional[PortRanges]
+    udp_ports: Optional[PortRanges]
+    hostlists: tuple[DomainTrie, ...]
+    hostlist_excludes: tuple[DomainTrie, ...]
+    ipsets: tuple[CidrSet, ...]
+    ipset_excludes: tuple[CidrSet, ...]
+
+    def matches(
+        self, protocol: str, port: int, host: Optional[str], ip: Optional[str]
+    ) -> bool:
+        if self.tcp_ports is not None or self.udp_ports is not None:
+            ranges = self.tcp_ports if protocol == "tcp" else self.udp_ports
+            if ranges is None or not ports_contain(ranges, port):
+                return False
+        if self.hostlists:
+            if host is None or not any(host in trie for trie in self.hostlists):
+                return False
+        if host is not None and any(host in trie for trie in self.hostlist_excludes):
+            return False
+        if self.ipsets:
+            if ip is None or not any(ip in cidrs for cidrs in self.ipsets):
+                return False
+        if ip is not None and any(ip in cidrs for cidrs in self.ipset_excludes):
+            return False
+        return True
+
+
+@dataclass(frozen=True)
+class CompiledProfile:
+    name: str
+    wf_tcp: PortRanges
+    wf_udp: PortRanges
+    sections: tuple[CompiledSection, ...]
+
+
+class CoverageIndex:
+    """Скомпилированный индекс профилей для ответа на вопрос
+    "какая секция профиля обработает трафик к host/IP на порту?" без запуска winws.
+
+    Каждый файл списка загружается один раз и разделяется между секциями
+    и профилями, которые на него ссылаются.
+    """
+
+    def __init__(self, profiles: dict[str, Profile], base_dir: str = SCRIPT_DIR):
+        self._base_dir: str = base_dir
+        self._hostlists: dict[str, DomainTrie] = {}
+        self._ipsets: dict[str, CidrSet] = {}
+        self.profiles: dict[str, CompiledProfile] = {
+            name: self._compile(profile) for name, profile in profiles.items()
+        }
+
+    @classmethod
+    def from_commands(cls, commands_path: Optional[str] = None) -> "CoverageIndex":
+        path = commands_path or os.path.join(SCRIPT_DIR, "commands.json")
+        return cls(load_profiles(path), os.path.dirname(os.path.abspath(path)))
+
+    def _hostlist(self, path: str) -> DomainTrie:
+        full_path = resolve_path(self._base_dir, path)
+        if full_path not in self._hostlists:
+            self._hostlists[full_path] = DomainTrie(iter_list_file(full_path))
+        return self._hostlists[full_path]
+
+    def _ipset(self, path: str) -> CidrSet:
+        full_path = resolve_path(self._base_dir, path)
+        if full_path not in self._ipsets:
+            self._ipsets[full_path] = CidrSet(iter_list_file(full_path))
+        return self._ipsets[full_path]
+
+    def _compile(self, profile: Profile) -> CompiledProfile:
+        sections = tuple(
+            CompiledSection(
+                profile=profile.name,
+                index=section.index,
+                tcp_ports=section.tcp_ports,
+                udp_ports=section.udp_ports,
+                hostlists=tuple(map(self._hostlist, section.hostlists)),
+                hostlist_excludes=tuple(
+                    map(self._hostlist, section.values("--hostlist-exclude"))
+                ),
+                ipsets=tuple(map(self._ipset, section.ipsets)),
+                ipset_excludes=tuple(
+                    map(self._ipset, section.values("--ipset-exclude"))
+                ),
+            )
+            for section in profile.sections
+        )
+        return CompiledProfile(profile.name, profile.wf_tcp, profile.wf_udp, sections)
+
+    def lookup(
+        self,
+        profile_name: str,
+        protocol: str,
+        port: int,
+        host: Optional[str] = None,
+        ip: Optional[str] = None,
+    ) -> Optional[CompiledSection]:
+        """Возвращает первую секцию профиля, которая обработает трафик, или None."""
+        profile = self.profiles.get(profile_name)
+        if profile is None:
+            raise ValueError(f"Command '{profile_name}' not found")
+        wf_ranges = profile.wf_tcp if protocol == "tcp" else profile.wf_udp
+        if not ports_contain(wf_ranges, port):
+            return None
+        for section in profile.sections:
+            if section.matches(protocol, port, host, ip):
+                return section
+        return None
+
+    def lookup_all(
+        self,
+        protocol: str,
+        port: int,
+        host: Optional[str] = None,
+        ip: Optional[str] = None,
+    ) -> dict[str, Optional[CompiledSection]]:
+        return {
+            name: self.lookup(name, protocol, port, host, ip) for name in self.profiles
+        }
+
+
+def parse_query(line: str) -> tuple[Optional[str], Optional[str], str, int]:
+    """Разбирает строку запроса вида "<host|ip> [port[/tcp|/udp]]"."""
+    parts = line.split()
+    target = parts[0]
+    port_spec = parts[1] if len(parts) > 1 else "443"
+    port, _, protocol = port_spec.partition("/")
+    protocol = protocol.lower() or "tcp"
+    if protocol not in ("tcp", "udp"):
+        raise ValueError(f"Unknown protocol '{protocol}'")
+    if not port.isdigit() or not 0 <= int(port) <= 65535:
+        raise ValueError(f"Invalid port '{port}'")
+    try:
+        parse_address(target)
+        return None, target, protocol, int(port)
+    except OSError:
+        return target, None, protocol, int(port)
+
+
+def run_queries(
+    index: CoverageIndex, lines: Iterable[str], out: TextIO, profile: Optional[str]
+) -> int:
+    """Отвечает на запросы построчно; возвращает число строк с ошибкой.
+
+    Ошибочная строка дает запись "error: ..." вместо результата, остальные
+    запросы пачки обрабатываются дальше.
+    """
+    if profile is not None and profile not in index.profiles:
+        raise ValueError(f"Command '{profile}' not found")
+    names = [profile] if profile else list(index.profiles)
+    errors = 0
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            host, ip, protocol, port = parse_query(line)
+        except ValueError as e:
+            errors += 1
+            out.write(f"{line}\t-\terror: {e}\n")
+            continue
+        for name in names:
+            section = index.lookup(name, protocol, port, host, ip)
+            result = f"section {section.index}" if section else "-"
+            out.write(f"{line}\t{name}\t{result}\n")
+    return errors
+
+
+def _naive_contains_host(entries: list[str], host: str) -> bool:
+    return any(host == entry or host.endswith("." + entry) for entry in entries)
+
+
+def _naive_contains_ip(entries: list[str], ip: str) -> bool:
+    address = ipaddress.ip_address(ip)
+    return any(address in ipaddress.ip_network(entry, strict=False) for entry in entries)
+
+
+def benchmark(index: CoverageIndex, queries: int = 20000, seed: int = 0) -> dict[str, float]:
+    """Сравнивает поиск по индексу с линейным перебором строк списков."""
+    rng = random.Random(seed)
+    results: dict[str, float] = {}
+
+    for path, trie in index._hostlists.items():
+        entries = list(iter_list_file(path))
+        hosts = [
+            rng.choice(["", "cdn.", "a.b."]) + rng.choice(entries)
+            if rng.random() < 0.5
+            else f"host{rng.randrange(10**6)}.example.org"
+            for _ in range(queries)
+        ]
+        started = time.perf_counter()
+        for host in hosts:
+            _naive_contains_host(entries, host)
+        naive = time.perf_counter() - started
+        started = time.perf_counter()
+        for host in hosts:
+            host in trie
+        indexed = time.perf_counter() - started
+        results[f"hostlist:{os.path.basename(path)}:naive_us"] = naive / queries * 1e6
+        results[f"hostlist:{os.path.basename(path)}:index_us"] = indexed / queries * 1e6
+
+    ip_queries = max(queries // 20, 1)
+    for path, cidrs in index._ipsets.items():
+        entries = list(iter_list_file(path))
+        ips = [
+            str(ipaddress.ip_address(rng.getrandbits(32))) for _ in range(ip_queries)
+        ]
+        started = time.perf_counter()
+        for ip in ips:
+            _naive_contains_ip(entries, ip)
+        naive = time.perf_counter() - started
+        started = time.perf_counter()
+        for ip in ips:
+            ip in cidrs
+        indexed = time.perf_counter() - started
+        results[f"ipset:{os.path.basename(path)}:naive_us"] = naive / ip_queries * 1e6
+        results[f"ipset:{os.path.basename(path)}:index_us"] = indexed / ip_queries * 1e6
+
+    return results
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Query which profile section handles a host/IP and port."
+    )
+    parser.add_argument("--commands", help="Path to commands.json")
+    subparsers = parser.add_subparsers(dest="action", required=True)
+    query = subparsers.add_parser(
+        "query", help="Read '<host|ip> [port[/tcp|/udp]]' lines from stdin"
+    )
+    query.add_argument("--profile", help="Only report this profile")
+    bench = subparsers.add_parser("bench", help="Compare index lookups with a linear scan")
+    bench.add_argument("--queries", type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    try:
+        index = CoverageIndex.from_commands(args.commands)
+        if args.action == "query":
+            errors = run_queries(index, sys.stdin, sys.stdout, args.profile)
+            return 1 if errors else 0
+        results = benchmark(index, args.queries)
+    except ValueError as e:
+        # В том числе некорректные фильтры портов в commands.json.
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    for name, value in results.items():
+        print(f"{name}\t{value:.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
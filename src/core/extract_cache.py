@@ -0,0 +1,340 @@
+"""Постоянный кэш распакованных ресурсов onefile-сборки.
+
+Загрузчик PyInstaller при каждом запуске распаковывает все datas во
+временный _MEIPASS. Поэтому бинарники winws, списки и переводы
+упаковываются в один архив payload.zip с манифестом (SHA-256 и размер
+каждого файла). Архив распаковывается один раз в
+<data_dir>/cache/<ключ>, где ключ — хеш манифеста. При следующих запусках
+файлы кэша только сверяются с манифестом. Каталоги прежних версий
+удаляются; занятые (например, winws еще работает) пропускаются до
+следующего раза.
+
+Без архива (запуск из исходников) resource_path просто указывает на
+корень проекта.
+"""
+
+import argparse
+import glob
+import hashlib
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from typing import Final, Iterable, Optional
+
+
+PAYLOAD_NAME: Final[str] = "payload.zip"
+MANIFEST_NAME: Final[str] = "manifest.json"
+COMPLETE_MARKER: Final[str] = ".complete"
+PARTIAL_PREFIX: Final[str] = ".partial-"
+# Незавершенные распаковки старше этого (секунды) считаются брошенными.
+PARTIAL_MAX_AGE: Final[float] = 600.0
+CACHE_DIR_NAME: Final[str] = "cache"
+HASH_CHUNK: Final[int] = 1 << 20
+# Что входит в архив: каталоги, файлы и glob-шаблоны относительно корня
+# проекта. Списки берутся шаблоном, чтобы новый list-*.txt не пропал из сборки.
+PAYLOAD_SOURCES: Final[tuple[str, ...]] = (
+    "src/gui/translations",
+    "src/scripts/bin",
+    "src/scripts/commands.json",
+    "src/scripts/*.txt",
+)
+# Сборочные версии файлов из PAYLOAD_SOURCES (например, сжатые в CI списки)
+# с тем же относительным путем; исходники в репозитории не переписываются.
+BUILD_OVERLAY: Final[str] = os.path.join("build", "overlay")
+VERIFY_SIZE: Final[str] = "size"
+VERIFY_HASH: Final[str] = "hash"
+
+PROJECT_ROOT: Final[str] = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+
+def bundle_root() -> str:
+    """_MEIPASS в собранном exe, иначе корень проекта."""
+    if getattr(sys, "frozen", False) and hasattr(sys, "_MEIPASS"):
+        return sys._MEIPASS
+    return PROJECT_ROOT
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _iter_files(root: str, sources: Iterable[str]) -> Iterable[str]:
+    for source in sources:
+        if any(char in source for char in "*?["):
+            for path in sorted(glob.glob(os.path.join(glob.escape(root), source))):
+                if os.path.isfile(path):
+                    yield os.path.relpath(path, root).replace(os.sep, "/")
+            continue
+        path = os.path.join(root, source)
+        if os.path.isdir(path):
+            for directory, _, files in os.walk(path):
+                for name in sorted(files):
+                    full = os.path.join(directory, name)
+                    yield os.path.relpath(full, root).replace(os.sep, "/")
+        elif os.path.isfile(path):
+            yield source
+
+
+def build_payload(
+    root: str,
+    output: str,
+    sources: Iterable[str] = PAYLOAD_SOURCES,
+    overlay: Optional[str] = None,
+) -> dict:
+    """Собирает payload.zip (вызывается из main.spec). Возвращает манифест.
+
+    Файл из каталога overlay с тем же относительным путем заменяет исходный.
+    """
+    import json
+    import zipfile
+
+    def source_path(relative: str) -> str:
+        if overlay:
+            candidate = os.path.join(overlay, relative)
+            if os.path.isfile(candidate):
+                return candidate
+        return os.path.join(root, relative)
+
+    paths = {relative: source_path(relative) for relative in sorted(set(_iter_files(root, sources)))}
+    files = {
+        relative: {"sha256": _file_digest(path), "size": os.path.getsize(path)}
+        for relative, path in paths.items()
+    }
+    manifest = {
+        "key": hashlib.sha256(json.dumps(files, sort_keys=True).encode("utf-8")).hexdigest(),
+        "files": files,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED, compresslevel=9) as archive:
+        archive.writestr(MANIFEST_NAME, json.dumps(manifest, indent=1, sort_keys=True))
+        for relative, path in paths.items():
+            archive.write(path, relative)
+    return manifest
+
+
+class ExtractionCache:
+    """Распаковка payload.zip в каталог, адресуемый хешем содержимого."""
+
+    def __init__(self, payload: str, cache_root: str, verify: str = VERIFY_HASH):
+        self.payload: str = payload
+        self.cache_root: str = cache_root
+        self.verify: str = verify
+        self.manifest: dict = {}
+        self.directory: Optional[str] = None
+        # Как был получен каталог: "warm", "extracted" или "repaired".
+        self.outcome: Optional[str] = None
+
+    def _read_manifest(self, archive) -> dict:
+        import json
+
+        return json.loads(archive.read(MANIFEST_NAME).decode("utf-8"))
+
+    def _valid(self, directory: str) -> bool:
+        if not os.path.exists(os.path.join(directory, COMPLETE_MARKER)):
+            return False
+        for relative, meta in self.manifest["files"].items():
+            path = os.path.join(directory, relative)
+            try:
+                if os.path.getsize(path) != meta["size"]:
+                    return False
+            except OSError:
+                return False
+            if self.verify == VERIFY_HASH and _file_digest(path) != meta["sha256"]:
+                return False
+        return True
+
+    def _extract(self, archive, target: str) -> None:
+        os.makedirs(self.cache_root, exist_ok=True)
+        partial = tempfile.mkdtemp(prefix=PARTIAL_PREFIX, dir=self.cache_root)
+        try:
+            for relative, meta in self.manifest["files"].items():
+                path = os.path.join(partial, relative)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with archive.open(relative) as src, open(path, "wb") as dst:
+                    shutil.copyfileobj(src, dst, HASH_CHUNK)
+                if _file_digest(path) != meta["sha256"]:
+                    raise OSError(f"Payload member {relative} does not match the manifest")
+            open(os.path.join(partial, COMPLETE_MARKER), "w").close()
+            if os.path.isdir(target):
+                # Поврежденный каталог этой же версии.
+                shutil.rmtree(target, ignore_errors=True)
+            try:
+                os.replace(partial, target)
+            except OSError:
+                # Другой экземпляр успел первым; используем его каталог.
+                if not self._valid(target):
+                    raise
+        finally:
+            shutil.rmtree(partial, ignore_errors=True)
+
+    def ensure(self) -> str:
+        """Возвращает каталог с проверенными файлами, распаковывая их при необходимости."""
+        if self.directory is not None:
+            return self.directory
+        import zipfile
+
+        with zipfile.ZipFile(self.payload) as archive:
+            self.manifest = self._read_manifest(archive)
+            target = os.path.join(self.cache_root, self.manifest["key"][:32])
+            if self._valid(target):
+                self.outcome = "warm"
+            else:
+                self.outcome = "repaired" if os.path.isdir(target) else "extracted"
+                self._extract(archive, target)
+        self.directory = target
+        return target
+
+    def collect_garbage(self) -> list[str]:
+        """Удаляет каталоги других версий и брошенные частичные распаковки."""
+        removed = []
+        current = os.path.basename(self.directory or "")
+        try:
+            names = os.listdir(self.cache_root)
+        except OSError:
+            return removed
+        for name in names:
+            if name == current:
+                continue
+            path = os.path.join(self.cache_root, name)
+            try:
+                if not os.path.isdir(path):
+                    continue
+                if name.startswith(PARTIAL_PREFIX) and time.time() - os.path.getmtime(path) < PARTIAL_MAX_AGE:
+                    continue  # возможно, его сейчас распаковывает другой экземпляр
+                # На Windows переименование не удается, пока файлы каталога открыты
+                # (например, работает winws прежней версии): каталог не трогаем.
+                trash = os.path.join(self.cache_root, PARTIAL_PREFIX + "trash-" + name)
+                os.replace(path, trash)
+            except OSError:
+                continue
+            shutil.rmtree(trash, ignore_errors=True)
+            removed.append(name)
+        return removed
+
+    def resolve(self, relative_path: str, fallback_root: str) -> str:
+        directory = self.ensure()
+        normalized = relative_path.replace(os.sep, "/").strip("/")
+        files = self.manifest["files"]
+        if normalized in files or any(name.startswith(normalized + "/") for name in files):
+            return os.path.join(directory, relative_path)
+        return os.path.join(fallback_root, relative_path)
+
+
+_cache: Optional[ExtractionCache] = None
+_cache_checked: bool = False
+_cache_lock: threading.Lock = threading.Lock()
+
+
+def _default_cache() -> Optional[ExtractionCache]:
+    global _cache, _cache_checked
+    with _cache_lock:
+        if not _cache_checked:
+            _cache_checked = True
+            payload = os.path.join(bundle_root(), PAYLOAD_NAME)
+            if not os.path.isfile(payload):
+                return None
+            from src.core.paths import data_dir
+
+            cache = ExtractionCache(payload, os.path.join(data_dir(), CACHE_DIR_NAME))
+            try:
+                cache.ensure()
+            except (OSError, ValueError, KeyError) as e:
+                # Без кэша ресурсы не найдутся: в _MEIPASS лежит только архив.
+                print(f"Warning: Failed to unpack bundled resources: {e}", file=sys.stderr)
+                return None
+            cache.collect_garbage()
+            _cache = cache
+        return _cache
+
+
+def resource_path(relative_path: str) -> str:
+    """Путь к ресурсу: из кэша распаковки, если он есть, иначе из корня сборки."""
+    cache = _default_cache()
+    if cache is None:
+        return os.path.join(bundle_root(), relative_path)
+    return cache.resolve(relative_path, bundle_root())
+
+
+def _bench_once(payload: str, cache_root: str) -> tuple[float, str]:
+    started = time.perf_counter()
+    cache = ExtractionCache(payload, cache_root)
+    cache.ensure()
+    cache.collect_garbage()
+    return time.perf_counter() - started, cache.outcome or ""
+
+
+def _legacy_extract(blobs: dict[str, bytes], target: str) -> float:
+    """Как загрузчик onefile: каждый файл заново распаковывается во временный каталог."""
+    import zlib
+
+    started = time.perf_counter()
+    for relative, blob in blobs.items():
+        path = os.path.join(target, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(zlib.decompress(blob))
+    return time.perf_counter() - started
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build or benchmark the resource extraction cache.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Pack bundled resources into payload.zip")
+    build.add_argument("--root", default=PROJECT_ROOT)
+    build.add_argument("--output", required=True)
+    bench = subparsers.add_parser("bench", help="Compare fresh extraction with a warm cache")
+    bench.add_argument("--bundle", default=PROJECT_ROOT, help="Directory with the resources to pack")
+    bench.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        manifest = build_payload(args.root, args.output)
+        print(f"{args.output}: {len(manifest['files'])} files, key {manifest['key'][:16]}")
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        payload = os.path.join(tmp, "meipass", PAYLOAD_NAME)
+        build_payload(args.bundle, payload)
+        cache_root = os.path.join(tmp, "cache")
+        import zlib
+
+        blobs = {}
+        for relative in _iter_files(args.bundle, PAYLOAD_SOURCES):
+            with open(os.path.join(args.bundle, relative), "rb") as f:
+                blobs[relative] = zlib.compress(f.read(), 6)
+        legacy, fresh, warm = [], [], []
+        for run in range(args.runs):
+            legacy.append(_legacy_extract(blobs, os.path.join(tmp, f"legacy-{run}")))
+            shutil.rmtree(cache_root, ignore_errors=True)
+            elapsed, outcome = _bench_once(payload, cache_root)
+            assert outcome == "extracted", outcome
+            fresh.append(elapsed)
+            elapsed, outcome = _bench_once(payload, cache_root)
+            assert outcome == "warm", outcome
+            warm.append(elapsed)
+
+        # Старая версия в кэше удаляется при запуске новой.
+        os.makedirs(os.path.join(cache_root, "0" * 32))
+        cache = ExtractionCache(payload, cache_root)
+        cache.ensure()
+        collected = cache.collect_garbage()
+
+    print("mode\tmedian_ms\tmax_ms")
+    for mode, samples in (("legacy", legacy), ("fresh", fresh), ("warm", warm)):
+        print(f"{mode}\t{statistics.median(samples) * 1000:.2f}\t{max(samples) * 1000:.2f}")
+    print(f"# stale versions collected: {len(collected)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,403 @@
+"""Слежение за commands.json и файлами, на которые ссылается запущенный профиль.
+
+События файловой системы приходят от inotify (Linux),
+ReadDirectoryChangesW (Windows) или от периодического опроса stat().
+После паузы без новых событий (debounce) пересчитывается отпечаток
+профиля: его argv и нормализованное содержимое файлов (списки без
+комментариев и пустых строк, отсортированные и без повторов; бинарные
+fake-пакеты — как есть). Профиль перезапускается, только если отпечаток
+изменился, так что "пустые" сохранения и touch не создают разрыва обхода.
+"""
+
+import argparse
+import ctypes
+import hashlib
+import os
+import queue
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Final, Optional
+
+from src.core.lists import iter_list_file, normalize_domain, parse_cidr
+from src.core.registry import ProfileRegistry
+from src.core.supervisor import STATE_RUNNING, ProcessSupervisor
+from src.core.validation import KIND_BINARY, KIND_IPSET, referenced_files
+
+
+DEFAULT_DEBOUNCE: Final[float] = 0.5
+MAX_DEBOUNCE: Final[float] = 5.0
+POLL_INTERVAL: Final[float] = 1.0
+HASH_CHUNK: Final[int] = 1 << 20
+
+
+def _normalize_line(kind: str, line: str) -> str:
+    if kind == KIND_IPSET:
+        try:
+            version, start, end = parse_cidr(line)
+            return f"{version}:{start}-{end}"
+        except ValueError:
+            return line.strip()
+    return normalize_domain(line)
+
+
+def normalized_digest(path: str, kind: str) -> str:
+    """SHA-256 содержимого в том виде, в котором его использует winws."""
+    digest = hashlib.sha256()
+    if kind == KIND_BINARY:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    for entry in sorted({_normalize_line(kind, line) for line in iter_list_file(path)}):
+        digest.update(entry.encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+class DigestCache:
+    """Кэш нормализованных хешей по (путь, mtime, размер)."""
+
+    def __init__(self):
+        self._entries: dict[str, tuple[tuple[int, int], str]] = {}
+        self.computed: int = 0
+
+    def digest(self, path: str, kind: str) -> str:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return "missing"
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._entries.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        value = normalized_digest(path, kind)
+        self.computed += 1
+        self._entries[path] = (signature, value)
+        return value
+
+
+def profile_fingerprint(registry: ProfileRegistry, name: str, cache: DigestCache) -> str:
+    registry.refresh()
+    entry = registry.get(name)
+    digest = hashlib.sha256("\0".join(entry.argv).encode("utf-8"))
+    for path, kind in sorted(referenced_files(entry, registry.script_dir).items()):
+        digest.update(f"\0{path}\0{cache.digest(path, kind)}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class _PollingBackend:
+    """Сравнивает stat() отслеживаемых файлов раз в interval секунд."""
+
+    def __init__(self, interval: float = POLL_INTERVAL):
+        self._interval: float = interval
+        self._stats: dict[str, Optional[tuple[int, int, int]]] = {}
+
+    @staticmethod
+    def _stat(path: str) -> Optional[tuple[int, int, int]]:
+        try:
+            stat = os.stat(path)
+            return stat.st_mtime_ns, stat.st_size, stat.st_ino
+        except OSError:
+            return None
+
+    def watch(self, paths: set[str]) -> None:
+        self._stats = {path: self._stat(path) for path in paths}
+
+    def wait(self, timeout: float) -> set[str]:
+        time.sleep(min(timeout, self._interval))
+        changed = set()
+        for path, previous in self._stats.items():
+            current = self._stat(path)
+            if current != previous:
+                self._stats[path] = current
+                changed.add(path)
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+class _InotifyBackend:
+    """inotify на каталогах файлов: так видны и атомарные замены через rename."""
+
+    IN_MODIFY: Final[int] = 0x002
+    IN_ATTRIB: Final[int] = 0x004
+    IN_CLOSE_WRITE: Final[int] = 0x008
+    IN_MOVED_TO: Final[int] = 0x080
+    IN_CREATE: Final[int] = 0x100
+    IN_DELETE: Final[int] = 0x200
+    EVENT_HEADER: Final[struct.Struct] = struct.Struct("iIII")
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self._fd: int = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: dict[int, str] = {}
+        self._paths: set[str] = set()
+
+    def watch(self, paths: set[str]) -> None:
+        for wd in list(self._dirs):
+            self._libc.inotify_rm_watch(self._fd, wd)
+        self._dirs.clear()
+        self._paths = set(paths)
+        mask = (
+            self.IN_MODIFY | self.IN_ATTRIB | self.IN_CLOSE_WRITE
+            | self.IN_MOVED_TO | self.IN_CREATE | self.IN_DELETE
+        )
+        for directory in {os.path.dirname(path) for path in paths}:
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), mask)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+            self._dirs[wd] = directory
+
+    def wait(self, timeout: float) -> set[str]:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        changed: set[str] = set()
+        try:
+            data = os.read(self._fd, 65536)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(data):
+            wd, _, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            directory = self._dirs.get(wd)
+            if directory is not None:
+                path = os.path.join(directory, os.fsdecode(name))
+                if path in self._paths:
+                    changed.add(path)
+        return changed
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class _WindowsBackend:
+    """ReadDirectoryChangesW: по одному блокирующему потоку на каталог."""
+
+    FILE_LIST_DIRECTORY: Final[int] = 0x0001
+    FILE_SHARE_ALL: Final[int] = 0x0007
+    OPEN_EXISTING: Final[int] = 3
+    FILE_FLAG_BACKUP_SEMANTICS: Final[int] = 0x02000000
+    # FILE_NAME | ATTRIBUTES | SIZE | LAST_WRITE
+    NOTIFY_FILTER: Final[int] = 0x0001 | 0x0004 | 0x0008 | 0x0010
+    BUFFER_SIZE: Final[int] = 65536
+
+    def __init__(self):
+        from ctypes import wintypes
+
+        self._kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        self._kernel32.CreateFileW.restype = wintypes.HANDLE
+        self._kernel32.CreateFileW.argtypes = (
+            wintypes.LPCWSTR, wintypes.DWORD, wintypes.DWORD, wintypes.LPVOID,
+            wintypes.DWORD, wintypes.DWORD, wintypes.HANDLE,
+        )
+        self._kernel32.ReadDirectoryChangesW.argtypes = (
+            wintypes.HANDLE, wintypes.LPVOID, wintypes.DWORD, wintypes.BOOL,
+            wintypes.DWORD, ctypes.POINTER(wintypes.DWORD), wintypes.LPVOID, wintypes.LPVOID,
+        )
+        self._kernel32.CancelIoEx.argtypes = (wintypes.HANDLE, wintypes.LPVOID)
+        self._kernel32.CloseHandle.argtypes = (wintypes.HANDLE,)
+        self._wintypes = wintypes
+        self._events: queue.Queue[str] = queue.Queue()
+        self._handles: dict[str, int] = {}
+        self._paths: set[str] = set()
+
+    def watch(self, paths: set[str]) -> None:
+        self.close()
+        self._paths = {os.path.normcase(path) for path in paths}
+        for directory in {os.path.dirname(path) for path in paths}:
+            handle = self._kernel32.CreateFileW(
+                directory, self.FILE_LIST_DIRECTORY, self.FILE_SHARE_ALL, None,
+                self.OPEN_EXISTING, self.FILE_FLAG_BACKUP_SEMANTICS, None,
+            )
+            if handle in (None, ctypes.c_void_p(-1).value):
+                raise ctypes.WinError(ctypes.get_last_error())
+            self._handles[directory] = handle
+            threading.Thread(
+                target=self._read_loop, args=(directory, handle),
+                name="zapret-watch", daemon=True,
+            ).start()
+
+    def _read_loop(self, directory: str, handle: int) -> None:
+        buffer = ctypes.create_string_buffer(self.BUFFER_SIZE)
+        returned = self._wintypes.DWORD()
+        while True:
+            ok = self._kernel32.ReadDirectoryChangesW(
+                handle, buffer, self.BUFFER_SIZE, False, self.NOTIFY_FILTER,
+                ctypes.byref(returned), None, None,
+            )
+            if not ok:
+                return  # CancelIoEx или закрытый дескриптор
+            if returned.value == 0:
+                # Буфер переполнен: считаем измененными все файлы каталога.
+                for path in self._paths:
+                    if os.path.dirname(path) == os.path.normcase(directory):
+                        self._events.put(path)
+                continue
+            offset = 0
+            while True:
+                next_offset, _, length = struct.unpack_from("III", buffer.raw, offset)
+                name = buffer.raw[offset + 12:offset + 12 + length].decode("utf-16-le")
+                self._events.put(os.path.normcase(os.path.join(directory, name)))
+                if not next_offset:
+                    break
+                offset += next_offset
+
+    def wait(self, timeout: float) -> set[str]:
+        changed: set[str] = set()
+        try:
+            changed.add(self._events.get(timeout=timeout))
+            while True:
+                changed.add(self._events.get_nowait())
+        except queue.Empty:
+            pass
+        return {path for path in changed if path in self._paths}
+
+    def close(self) -> None:
+        for handle in self._handles.values():
+            self._kernel32.CancelIoEx(handle, None)
+            self._kernel32.CloseHandle(handle)
+        self._handles.clear()
+
+
+def create_backend(kind: str = "auto"):
+    """inotify/ReadDirectoryChangesW с откатом на опрос при ошибке."""
+    if kind == "poll":
+        return _PollingBackend()
+    try:
+        if sys.platform == "win32":
+            return _WindowsBackend()
+        if sys.platform.startswith("linux"):
+            return _InotifyBackend()
+    except (OSError, AttributeError):
+        pass
+    return _PollingBackend()
+
+
+class FileWatchService:
+    """Перезапускает работающий профиль, когда меняется используемое им содержимое.
+
+    Работает в отдельном потоке с собственной копией реестра, чтобы не
+    пересекаться с супервизором; перезапуск выполняет ProcessSupervisor.reload.
+    """
+
+    def __init__(
+        self,
+        supervisor: ProcessSupervisor,
+        registry: ProfileRegistry,
+        debounce: float = DEFAULT_DEBOUNCE,
+        backend: str = "auto",
+    ):
+        self._supervisor: ProcessSupervisor = supervisor
+        self._registry: ProfileRegistry = ProfileRegistry(
+            registry.commands_path, registry.script_dir, registry.launcher
+        )
+        self._debounce: float = debounce
+        self._backend = create_backend(backend)
+        self._cache: DigestCache = DigestCache()
+        self._profile: Optional[str] = None
+        self._fingerprint: Optional[str] = None
+        self._stop: threading.Event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.reloads: int = 0
+        self.ignored: int = 0
+
+    def _running_profile(self) -> Optional[str]:
+        state = self._supervisor.state
+        return state.profile if state.status == STATE_RUNNING else None
+
+    @property
+    def backend_name(self) -> str:
+        return type(self._backend).__name__.strip("_").replace("Backend", "").lower()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="zapret-file-watch", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(2.0)
+        self._backend.close()
+
+    def _track(self, profile: Optional[str]) -> None:
+        self._profile = profile
+        self._fingerprint = None
+        paths = {self._registry.commands_path}
+        if profile is not None:
+            try:
+                self._fingerprint = profile_fingerprint(self._registry, profile, self._cache)
+                entry = self._registry.get(profile)
+                paths.update(referenced_files(entry, self._registry.script_dir))
+            except (RuntimeError, ValueError):
+                pass
+        self._backend.watch(paths)
+
+    def _run(self) -> None:
+        self._track(self._running_profile())
+        while not self._stop.is_set():
+            changed = self._backend.wait(0.5)
+            profile = self._running_profile()
+            if profile != self._profile:
+                self._track(profile)
+                continue
+            if not changed or profile is None:
+                continue
+
+            # Debounce: ждем, пока поток событий не стихнет.
+            deadline = time.monotonic() + MAX_DEBOUNCE
+            while time.monotonic() < deadline and not self._stop.is_set():
+                if not self._backend.wait(self._debounce):
+                    break
+            self.check()
+
+    def check(self) -> bool:
+        """Сравнивает отпечаток профиля с запомненным; True, если запрошен перезапуск."""
+        profile = self._profile
+        if profile is None:
+            return False
+        try:
+            fingerprint = profile_fingerprint(self._registry, profile, self._cache)
+        except (RuntimeError, ValueError):
+            return False
+        if fingerprint == self._fingerprint:
+            self.ignored += 1
+            return False
+        self._fingerprint = fingerprint
+        self.reloads += 1
+        self._supervisor.reload()
+        # Набор файлов профиля мог измениться вместе с commands.json.
+        self._backend.watch(
+            {self._registry.commands_path,
+             *referenced_files(self._registry.get(profile), self._registry.script_dir)}
+        )
+        return True
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    from src.scripts.commands import ZapretRunner
+
+    parser = argparse.ArgumentParser(description="Print normalized fingerprints of profiles.")
+    parser.add_argument("--profile", action="append", dest="profiles")
+    args = parser.parse_args(argv)
+
+    registry = ZapretRunner().registry
+    cache = DigestCache()
+    for name in args.profiles or list(registry):
+        started = time.perf_counter()
+        fingerprint = profile_fingerprint(registry, name, cache)
+        print(f"{name}\t{fingerprint[:16]}\t{(time.perf_counter() - started) * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
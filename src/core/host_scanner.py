@@ -0,0 +1,465 @@
+"""Проверка доступности доменов из hostlist'ов и предложение сокращенного списка.
+
+Для каждого домена asyncio выполняет цепочку проб: DNS, TCP connect на
+порт 443 и TLS ClientHello с SNI домена. Одновременно проверяется не
+больше concurrency доменов, на домен отводится timeout секунд, а
+результаты кэшируются с TTL (в памяти и, при запуске из командной
+строки, в файле в каталоге данных).
+
+Сканирование идет в два прохода: без обхода и — только для доменов,
+не прошедших первый, — с запущенным профилем. Домены делятся на
+    dead         не резолвятся или недоступны и с обходом;
+    direct       доступны без обхода — блокировка снята;
+    bypass_only  доступны только с обходом — их нужно оставить.
+Сокращенный список сохраняет только bypass_only и домены, которые не
+удалось проверить.
+
+``python -m src.core.host_scanner selftest`` проверяет сканер без сети:
+заглушка DNS отдает адреса 127.0.0.x, а локальный TLS-сервер
+"блокирует" часть SNI, пока включена имитация DPI.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable, Final, Iterable, Optional
+
+from src.core.lists import iter_list_file, normalize_domain
+
+
+CLASS_DEAD: Final[str] = "dead"
+CLASS_DIRECT: Final[str] = "direct"
+CLASS_BYPASS_ONLY: Final[str] = "bypass_only"
+CLASS_UNKNOWN: Final[str] = "unknown"
+MODE_DIRECT: Final[str] = "direct"
+MODE_BYPASS: Final[str] = "bypass"
+
+DEFAULT_PORT: Final[int] = 443
+DEFAULT_CONCURRENCY: Final[int] = 64
+DEFAULT_TIMEOUT: Final[float] = 5.0
+DEFAULT_TTL: Final[float] = 6 * 3600.0
+# Таймаут чаще означает временный сбой сети, чем блокировку: он живет недолго.
+TIMEOUT_TTL: Final[float] = 600.0
+CACHE_NAME: Final[str] = "host-scan-cache.json"
+
+
+@dataclass
+class ProbeResult:
+    host: str
+    mode: str
+    dns: bool = False
+    tcp: bool = False
+    tls: bool = False
+    address: Optional[str] = None
+    error: Optional[str] = None
+    seconds: float = 0.0
+    checked_at: float = 0.0
+
+    @property
+    def reachable(self) -> bool:
+        return self.tls
+
+
+class StaticResolver:
+    """Резолвер по словарю: домен (и его поддомены) -> адреса. Для офлайн-проверок."""
+
+    def __init__(self, mapping: dict[str, list[str]]):
+        self._mapping: dict[str, list[str]] = {
+            normalize_domain(host): addresses for host, addresses in mapping.items()
+        }
+        self.queries: int = 0
+
+    async def resolve(self, host: str) -> list[str]:
+        self.queries += 1
+        labels = host.split(".")
+        for depth in range(len(labels)):
+            addresses = self._mapping.get(".".join(labels[depth:]))
+            if addresses is not None:
+                return list(addresses)
+        raise OSError(f"NXDOMAIN {host}")
+
+
+class SystemResolver:
+    async def resolve(self, host: str) -> list[str]:
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            host, None, type=0, proto=0, flags=0
+        )
+        return list(dict.fromkeys(info[4][0] for info in infos))
+
+
+class ResultCache:
+    """Результаты проб с TTL по (режим, домен); можно сохранить в JSON.
+
+    Режим обхода включает имя профиля ("bypass:<профиль>"), поэтому замеры
+    с другим профилем не берутся из кэша. Таймауты хранятся timeout_ttl.
+    """
+
+    def __init__(
+        self, ttl: float = DEFAULT_TTL, path: Optional[str] = None, timeout_ttl: float = TIMEOUT_TTL
+    ):
+        self.ttl: float = ttl
+        self.timeout_ttl: float = min(timeout_ttl, ttl)
+        self.path: Optional[str] = path
+        self._entries: dict[str, ProbeResult] = {}
+        self.hits: int = 0
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    for data in json.load(f):
+                        result = ProbeResult(**data)
+                        self._entries[f"{result.mode}:{result.host}"] = result
+            except (OSError, ValueError, TypeError):
+                self._entries = {}
+
+    def _fresh(self, result: ProbeResult, now: float) -> bool:
+        ttl = self.timeout_ttl if result.error == "timeout" else self.ttl
+        return now - result.checked_at <= ttl
+
+    def get(self, mode: str, host: str) -> Optional[ProbeResult]:
+        result = self._entries.get(f"{mode}:{host}")
+        if result is None or not self._fresh(result, time.time()):
+            return None
+        self.hits += 1
+        return result
+
+    def put(self, result: ProbeResult) -> None:
+        self._entries[f"{result.mode}:{result.host}"] = result
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        now = time.time()
+        fresh = [asdict(r) for r in self._entries.values() if self._fresh(r, now)]
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(fresh, f)
+
+
+def client_context() -> ssl.SSLContext:
+    """Важен только факт завершения рукопожатия, поэтому сертификат не проверяется."""
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+class HostScanner:
+    def __init__(
+        self,
+        resolver=None,
+        port: int = DEFAULT_PORT,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        timeout: float = DEFAULT_TIMEOUT,
+        cache: Optional[ResultCache] = None,
+    ):
+        self.resolver = resolver or SystemResolver()
+        self.port: int = port
+        self.concurrency: int = concurrency
+        self.timeout: float = timeout
+        self.cache: ResultCache = cache or ResultCache()
+        self._context: ssl.SSLContext = client_context()
+
+    async def _probe_steps(self, result: ProbeResult) -> None:
+        addresses = await self.resolver.resolve(result.host)
+        result.dns = bool(addresses)
+        last_error: Optional[Exception] = None
+        for address in addresses:
+            result.address = address
+            try:
+                reader, writer = await asyncio.open_connection(address, self.port)
+            except OSError as e:
+                last_error = e
+                continue
+            result.tcp = True
+            try:
+                await writer.start_tls(self._context, server_hostname=result.host)
+                result.tls = True
+                return
+            except (OSError, ssl.SSLError) as e:
+                last_error = e
+            finally:
+                # Без закрытия TLS: ожидание close_notify при отмене по таймауту
+                # растянулось бы на ssl_shutdown_timeout.
+                writer.transport.abort()
+        if last_error is not None:
+            raise last_error
+
+    async def probe(self, host: str, mode: str) -> ProbeResult:
+        cached = self.cache.get(mode, host)
+        if cached is not None:
+            return cached
+        result = ProbeResult(host, mode)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._probe_steps(result), self.timeout)
+        except asyncio.TimeoutError:
+            result.error = "timeout"
+        except (OSError, ssl.SSLError) as e:
+            result.error = f"{type(e).__name__}: {e}"
+        result.seconds = time.perf_counter() - started
+        result.checked_at = time.time()
+        self.cache.put(result)
+        return result
+
+    async def scan(self, hosts: Iterable[str], mode: str) -> dict[str, ProbeResult]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(host: str) -> ProbeResult:
+            async with semaphore:
+                return await self.probe(host, mode)
+
+        results = await asyncio.gather(*(bounded(host) for host in dict.fromkeys(hosts)))
+        return {result.host: result for result in results}
+
+
+def classify(direct: ProbeResult, bypass: Optional[ProbeResult]) -> str:
+    if direct.reachable:
+        return CLASS_DIRECT
+    if bypass is None:
+        return CLASS_UNKNOWN
+    if bypass.reachable:
+        return CLASS_BYPASS_ONLY
+    return CLASS_DEAD
+
+
+async def classify_hosts(
+    scanner: HostScanner,
+    hosts: Iterable[str],
+    enable_bypass: Optional[Callable[[], Awaitable[None]]] = None,
+    disable_bypass: Optional[Callable[[], Awaitable[None]]] = None,
+    bypass_mode: str = MODE_BYPASS,
+) -> dict[str, str]:
+    """Два прохода: без обхода, затем с обходом только для недоступных доменов."""
+    hosts = list(dict.fromkeys(hosts))
+    direct = await scanner.scan(hosts, MODE_DIRECT)
+    failed = [host for host in hosts if not direct[host].reachable]
+    bypass: dict[str, ProbeResult] = {}
+    if failed and enable_bypass is not None:
+        await enable_bypass()
+        try:
+            bypass = await scanner.scan(failed, bypass_mode)
+        finally:
+            if disable_bypass is not None:
+                await disable_bypass()
+    return {host: classify(direct[host], bypass.get(host)) for host in hosts}
+
+
+def prune(entries: Iterable[str], classes: dict[str, str]) -> list[str]:
+    """Оставляет домены, которым нужен обход, и непроверенные."""
+    return [
+        entry
+        for entry in entries
+        if classes.get(normalize_domain(entry), CLASS_UNKNOWN) in (CLASS_BYPASS_ONLY, CLASS_UNKNOWN)
+    ]
+
+
+def referenced_hostlists() -> list[str]:
+    """Файлы --hostlist всех профилей commands.json."""
+    from src.core.profiles import resolve_path
+    from src.scripts.commands import ZapretRunner
+
+    registry = ZapretRunner().registry
+    paths: dict[str, None] = {}
+    for name in registry:
+        for section in registry.get(name).profile.sections:
+            for value in section.values("--hostlist"):
+                paths[resolve_path(registry.script_dir, value)] = None
+    return list(paths)
+
+
+# --- офлайн-проверка -------------------------------------------------------
+
+
+def _self_signed(directory: str) -> tuple[str, str]:
+    openssl = shutil.which("openssl")
+    if openssl is None:
+        raise RuntimeError("openssl is required to create a test certificate")
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(
+        [openssl, "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=localhost", "-keyout", key, "-out", cert],
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    return cert, key
+
+
+class _FakeDpi:
+    """TLS-сервер, обрывающий рукопожатие для "заблокированных" SNI, пока DPI включен."""
+
+    def __init__(self, cert: str, key: str, blocked: set[str]):
+        self.enabled: bool = True
+        self.blocked: set[str] = blocked
+        self.context: ssl.SSLContext = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.context.load_cert_chain(cert, key)
+        self.context.sni_callback = self._on_sni
+
+    def _on_sni(self, sock, server_name, context) -> Optional[int]:
+        if self.enabled and server_name in self.blocked:
+            return ssl.ALERT_DESCRIPTION_HANDSHAKE_FAILURE
+        return None
+
+    @staticmethod
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        writer.close()
+
+
+async def _silent(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    # Принимает TCP, но молчит: ClientHello остается без ответа, пока клиент не уйдет.
+    try:
+        while await reader.read(4096):
+            pass
+    except OSError:
+        pass
+    writer.close()
+
+
+async def _selftest(hosts_per_class: int, concurrency: int, timeout: float) -> int:
+    expected: dict[str, str] = {}
+    mapping: dict[str, list[str]] = {}
+    blocked: set[str] = set()
+    for n in range(hosts_per_class):
+        expected[f"open{n}.test"] = CLASS_DIRECT
+        mapping[f"open{n}.test"] = ["127.0.0.1"]
+        expected[f"blocked{n}.test"] = CLASS_BYPASS_ONLY
+        mapping[f"blocked{n}.test"] = ["127.0.0.1"]
+        blocked.add(f"blocked{n}.test")
+        expected[f"nxdomain{n}.test"] = CLASS_DEAD
+        expected[f"refused{n}.test"] = CLASS_DEAD
+        mapping[f"refused{n}.test"] = ["127.0.0.2"]
+        expected[f"silent{n}.test"] = CLASS_DEAD
+        mapping[f"silent{n}.test"] = ["127.0.0.3"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cert, key = _self_signed(tmp)
+        dpi = _FakeDpi(cert, key, blocked)
+        tls_server = await asyncio.start_server(dpi.handle, "127.0.0.1", 0, ssl=dpi.context)
+        port = tls_server.sockets[0].getsockname()[1]
+        silent_server = await asyncio.start_server(_silent, "127.0.0.3", port)
+
+        async def enable() -> None:
+            dpi.enabled = False
+
+        async def disable() -> None:
+            dpi.enabled = True
+
+        resolver = StaticResolver(mapping)
+        scanner = HostScanner(resolver, port, concurrency, timeout)
+        started = time.perf_counter()
+        classes = await classify_hosts(scanner, expected, enable, disable)
+        elapsed = time.perf_counter() - started
+
+        queries = resolver.queries
+        await classify_hosts(scanner, expected, enable, disable)
+        cached_queries = resolver.queries - queries
+
+        tls_server.close()
+        silent_server.close()
+
+    wrong = {host: (cls, expected[host]) for host, cls in classes.items() if cls != expected[host]}
+    counts: dict[str, int] = {}
+    for cls in classes.values():
+        counts[cls] = counts.get(cls, 0) + 1
+    print("hosts\tseconds\tdead\tdirect\tbypass_only\tcached_rescan_queries")
+    print(
+        f"{len(classes)}\t{elapsed:.2f}\t{counts.get(CLASS_DEAD, 0)}\t{counts.get(CLASS_DIRECT, 0)}\t"
+        f"{counts.get(CLASS_BYPASS_ONLY, 0)}\t{cached_queries}"
+    )
+    pruned = prune(expected, classes)
+    print(f"# pruned list keeps {len(pruned)} of {len(expected)} entries")
+    if wrong or cached_queries:
+        for host, (got, want) in sorted(wrong.items())[:10]:
+            print(f"FAIL: {host} classified {got}, expected {want}", file=sys.stderr)
+        if cached_queries:
+            print("FAIL: cached rescan hit the resolver", file=sys.stderr)
+        return 1
+    return 0
+
+
+async def _scan_files(args: argparse.Namespace) -> int:
+    from src.core.paths import data_dir
+    from src.scripts.commands import ZapretRunner
+
+    runner = ZapretRunner()
+    running = runner.locked_processes()
+    if running:
+        # С работающим обходом заблокированные домены попали бы в direct,
+        # и сокращенный список потерял бы именно их.
+        print(
+            f"Error: winws is running (PID {', '.join(map(str, running))}); "
+            "stop the active profile before scanning",
+            file=sys.stderr,
+        )
+        return 1
+
+    paths = args.hostlists or referenced_hostlists()
+    entries = {path: list(iter_list_file(path)) for path in paths}
+    hosts = [normalize_domain(entry) for values in entries.values() for entry in values]
+    cache = ResultCache(args.cache_ttl, os.path.join(data_dir(), CACHE_NAME))
+    scanner = HostScanner(None, args.port, args.concurrency, args.timeout, cache)
+
+    enable = disable = None
+    bypass_mode = MODE_BYPASS
+    if args.bypass_profile:
+        bypass_mode = f"{MODE_BYPASS}:{args.bypass_profile}"
+
+        async def enable() -> None:
+            await asyncio.to_thread(runner.run, args.bypass_profile)
+            await asyncio.sleep(args.settle)
+
+        async def disable() -> None:
+            await asyncio.to_thread(runner.terminate)
+
+    classes = await classify_hosts(scanner, hosts, enable, disable, bypass_mode)
+    cache.save()
+
+    for host, cls in classes.items():
+        print(f"{host}\t{cls}")
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+        for path, values in entries.items():
+            kept = prune(values, classes)
+            with open(os.path.join(args.output_dir, os.path.basename(path)), "w", encoding="utf-8") as f:
+                f.writelines(f"{entry}\n" for entry in kept)
+            print(f"# {os.path.basename(path)}: {len(values)} -> {len(kept)}", file=sys.stderr)
+    return 0
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Classify hostlist domains by reachability.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(sub: argparse.ArgumentParser) -> None:
+        sub.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+        sub.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT)
+
+    scan = subparsers.add_parser("scan", help="Probe hostlists and propose pruned copies")
+    scan.add_argument("hostlists", nargs="*", help="Default: every --hostlist in commands.json")
+    scan.add_argument("--port", type=int, default=DEFAULT_PORT)
+    scan.add_argument("--cache-ttl", type=float, default=DEFAULT_TTL)
+    scan.add_argument(
+        "--bypass-profile",
+        help="Profile to run for the second pass; without it failed hosts stay 'unknown'",
+    )
+    scan.add_argument("--settle", type=float, default=2.0, help="Seconds to wait after starting winws")
+    scan.add_argument("--output-dir", help="Write pruned hostlists here")
+    add_common(scan)
+
+    selftest = subparsers.add_parser("selftest", help="Run offline against local stub servers")
+    selftest.add_argument("--hosts-per-class", type=int, default=200)
+    add_common(selftest)
+
+    args = parser.parse_args(argv)
+    if args.command == "selftest":
+        return asyncio.run(_selftest(args.hosts_per_class, args.concurrency, min(args.timeout, 2.0)))
+    return asyncio.run(_scan_files(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+import argparse
+import os
+import sys
+from dataclasses import dataclass, field
+from typing import Final, Iterable, Optional, TextIO
+
+from src.core.lists import DomainTrie, iter_list_file, normalize_domain
+
+
+REASON_DUPLICATE: Final[str] = "duplicate"
+REASON_COVERED: Final[str] = "covered"
+
+
+@dataclass(frozen=True)
+class Removal:
+    source: str
+    entry: str
+    reason: str
+    covered_by: str
+
+
+@dataclass
+class MinimizeResult:
+    kept: dict[str, list[str]] = field(default_factory=dict)
+    removed: list[Removal] = field(default_factory=list)
+
+    @property
+    def total_kept(self) -> int:
+        return sum(len(entries) for entries in self.kept.values())
+
+
+def minimize(sources: dict[str, Iterable[str]], merge: bool = False) -> MinimizeResult:
+    """Удаляет из hostlist'ов записи, уже покрытые родительским доменом.
+
+    Без merge каждый файл минимизируется независимо, потому что профили
+    ссылаются на списки по отдельности. С merge все источники сводятся в
+    один список под ключом первого источника. Время работы линейно по
+    суммарному числу меток.
+    """
+    result = MinimizeResult()
+    normalized: dict[str, list[str]] = {}
+    tries: dict[str, DomainTrie] = {}
+    shared_trie = DomainTrie()
+
+    for source, entries in sources.items():
+        trie = shared_trie if merge else tries.setdefault(source, DomainTrie())
+        domains = normalized.setdefault(source, [])
+        for entry in entries:
+            domain = normalize_domain(entry)
+            if domain:
+                domains.append(domain)
+                trie.add(domain)
+
+    target = next(iter(sources), None)
+    emitted: set[str] = set()
+    for source, domains in normalized.items():
+        trie = shared_trie if merge else tries[source]
+        kept = result.kept.setdefault(target if merge else source, [])
+        if not merge:
+            emitted = set()
+        for domain in domains:
+            cover = trie.match(domain)
+            if cover != domain:
+                result.removed.append(Removal(source, domain, REASON_COVERED, cover))
+            elif domain in emitted:
+                result.removed.append(Removal(source, domain, REASON_DUPLICATE, domain))
+            else:
+                emitted.add(domain)
+                kept.append(domain)
+    return result
+
+
+def write_report(result: MinimizeResult, out: TextIO) -> None:
+    for removal in result.removed:
+        out.write(
+            f"{removal.source}\t{removal.entry}\t{removal.reason}\t{removal.covered_by}\n"
+        )
+    out.write(
+        f"# removed {len(result.removed)} entries, kept {result.total_kept}\n"
+    )
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Drop hostlist entries already covered by a parent domain."
+    )
+    parser.add_argument("lists", nargs="+", help="Hostlist files to minimize")
+    parser.add_argument(
+        "--output-dir", required=True, help="Directory for the minimized lists"
+    )
+    parser.add_argument(
+        "--merge",
+        metavar="NAME",
+        help="Combine all inputs into a single minimized list with this file name",
+    )
+    parser.add_argument("--report", help="Write the removal report to this file")
+    args = parser.parse_args(argv)
+
+    sources = {path: iter_list_file(path) for path in args.lists}
+    result = minimize(sources, merge=bool(args.merge))
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for source, entries in result.kept.items():
+        name = args.merge or os.path.basename(source)
+        with open(os.path.join(args.output_dir, name), "w", encoding="utf-8") as f:
+            f.writelines(f"{entry}\n" for entry in entries)
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            write_report(result, f)
+    else:
+        write_report(result, sys.stdout)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
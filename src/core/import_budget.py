@@ -0,0 +1,103 @@
+"""Профилирование времени импорта (``python -X importtime``) с бюджетом.
+
+``python -m src.core.import_budget`` печатает самые дорогие импорты;
+с ``--check`` завершается с кодом 1, если модуль превысил бюджет или
+переводчик загрузил каталог во время импорта.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Final, Optional
+
+
+PROJECT_ROOT: Final[str] = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+# Бюджеты в миллисекундах суммарного (cumulative) времени импорта модуля.
+BUDGETS_MS: Final[dict[str, float]] = {
+    "src.gui.translations": 60.0,
+    "src.cli": 150.0,
+    "src.scripts.commands": 250.0,
+}
+_LAZY_CHECK: Final[str] = (
+    "import sys; from src.gui.translations import translator; "
+    "sys.exit(0 if translator._catalog is None else 1)"
+)
+
+
+def parse_importtime(stderr: str) -> list[tuple[int, int, str]]:
+    """Разбирает строки "import time: self | cumulative | name" в микросекундах."""
+    entries: list[tuple[int, int, str]] = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        entries.append((int(parts[0]), int(parts[1]), parts[2].rstrip()))
+    return entries
+
+
+def measure(module: str) -> list[tuple[int, int, str]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    return parse_importtime(result.stderr)
+
+
+def module_cost_ms(entries: list[tuple[int, int, str]], module: str) -> float:
+    for _, cumulative, name in entries:
+        if name.strip() == module:
+            return cumulative / 1000
+    return 0.0
+
+
+def translator_is_lazy() -> bool:
+    return (
+        subprocess.run(
+            [sys.executable, "-c", _LAZY_CHECK],
+            cwd=PROJECT_ROOT,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        ).returncode
+        == 0
+    )
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Import-time report and budget check.")
+    parser.add_argument("--module", action="append", dest="modules")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--check", action="store_true", help="Enforce BUDGETS_MS")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module in args.modules or list(BUDGETS_MS):
+        runs = [measure(module) for _ in range(args.runs)]
+        cost = statistics.median(module_cost_ms(entries, module) for entries in runs)
+        budget = BUDGETS_MS.get(module)
+        verdict = ""
+        if budget is not None:
+            verdict = "ok" if cost <= budget else "OVER BUDGET"
+            failed |= cost > budget
+        print(f"{module}\t{cost:.1f} ms\tbudget {budget or '-'} ms\t{verdict}")
+        for self_us, cumulative, name in sorted(runs[-1], key=lambda e: -e[0])[: args.top]:
+            print(f"    {self_us / 1000:7.2f} ms self  {cumulative / 1000:7.2f} ms cum  {name.strip()}")
+
+    if not translator_is_lazy():
+        print("Translator loaded its catalog at import time", file=sys.stderr)
+        failed = True
+    return 1 if args.check and failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
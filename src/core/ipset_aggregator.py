@@ -0,0 +1,294 @@
+"""Сжатие ipset: минимальный набор CIDR с тем же покрытием.
+
+Записи переводятся в целочисленные интервалы (без объектов ipaddress),
+сливаются и раскладываются обратно в минимальное число выровненных
+префиксов. IPv4-интервалы хранятся упакованными в array('Q') как
+start << 32 | end, поэтому миллионы записей занимают 8 байт каждая.
+
+В режиме надмножества (allow_extra > 0) соседние префиксы дополнительно
+заменяются общим родительским, если это добавляет не больше allow_extra
+адресов на семейство; жадно выбирается слияние с наименьшим числом
+лишних адресов на одну удаленную запись.
+
+Результат всегда проверяется: в точном режиме покрытие совпадает
+адрес в адрес, в режиме надмножества исходное покрытие целиком входит в
+новое, а число лишних адресов не превышает бюджет.
+"""
+
+import argparse
+import heapq
+import os
+import random
+import sys
+import time
+from array import array
+from dataclasses import dataclass, field
+from typing import Final, Iterable, Iterator, Optional
+
+from src.core.list_pipeline import format_cidr, iter_source
+from src.core.lists import COMMENT_PREFIX, merge_intervals, parse_cidr
+
+
+FAMILY_BITS: Final[dict[int, int]] = {4: 32, 6: 128}
+_V4_MASK: Final[int] = (1 << 32) - 1
+
+Interval = tuple[int, int]
+Cidr = tuple[int, int]  # (первый адрес, длина префикса)
+
+
+class AggregationError(RuntimeError):
+    """Сжатый ipset не прошел проверку покрытия."""
+
+
+@dataclass
+class AggregateResult:
+    cidrs: dict[int, list[Cidr]] = field(default_factory=lambda: {4: [], 6: []})
+    entries_before: dict[int, int] = field(default_factory=lambda: {4: 0, 6: 0})
+    addresses_before: dict[int, int] = field(default_factory=lambda: {4: 0, 6: 0})
+    extra_addresses: dict[int, int] = field(default_factory=lambda: {4: 0, 6: 0})
+    invalid: int = 0
+
+    @property
+    def entries_after(self) -> dict[int, int]:
+        return {version: len(cidrs) for version, cidrs in self.cidrs.items()}
+
+    def lines(self) -> Iterator[str]:
+        for version, cidrs in self.cidrs.items():
+            bits = FAMILY_BITS[version]
+            for start, prefix in cidrs:
+                yield format_cidr(version, start, start + (1 << (bits - prefix)) - 1)
+
+
+def _merge_v4(keys: array) -> list[Interval]:
+    """Слияние упакованных IPv4-интервалов без создания кортежа на каждую запись."""
+    merged: list[Interval] = []
+    current_start = current_end = -1
+    for key in sorted(keys):
+        start, end = key >> 32, key & _V4_MASK
+        if current_end >= 0 and start <= current_end + 1:
+            if end > current_end:
+                current_end = end
+            continue
+        if current_end >= 0:
+            merged.append((current_start, current_end))
+        current_start, current_end = start, end
+    if current_end >= 0:
+        merged.append((current_start, current_end))
+    return merged
+
+
+def interval_to_cidrs(start: int, end: int, bits: int) -> Iterator[Cidr]:
+    """Минимальное разложение [start, end] на выровненные префиксы."""
+    while start <= end:
+        size = start & -start if start else 1 << bits
+        while size > end - start + 1:
+            size >>= 1
+        yield start, bits - (size.bit_length() - 1)
+        start += size
+
+
+def cidr_interval(cidr: Cidr, bits: int) -> Interval:
+    start, prefix = cidr
+    return start, start + (1 << (bits - prefix)) - 1
+
+
+def _common_supernet(a: Cidr, b: Cidr, bits: int) -> Cidr:
+    prefix = min(a[1], b[1], bits - (a[0] ^ b[0]).bit_length())
+    return (a[0] >> (bits - prefix)) << (bits - prefix), prefix
+
+
+def widen(cidrs: list[Cidr], bits: int, allow_extra: int) -> tuple[list[Cidr], int]:
+    """Жадно заменяет группы соседних префиксов общим родителем в пределах бюджета."""
+    n = len(cidrs)
+    if n < 2 or allow_extra <= 0:
+        return cidrs, 0
+    starts = [start for start, _ in cidrs]
+    sizes = [1 << (bits - prefix) for _, prefix in cidrs]
+    prefixes = [prefix for _, prefix in cidrs]
+    prev = list(range(-1, n - 1))
+    nxt = list(range(1, n + 1))
+    nxt[-1] = -1
+    alive = bytearray(b"\1") * n
+
+    def candidate(i: int) -> Optional[tuple[float, int, int, int]]:
+        j = nxt[i]
+        if j < 0:
+            return None
+        supernet = _common_supernet((starts[i], prefixes[i]), (starts[j], prefixes[j]), bits)
+        low, high = cidr_interval(supernet, bits)
+        covered, removed, k = 0, -1, i
+        while k >= 0 and starts[k] >= low:
+            first = k
+            k = prev[k]
+        k = first
+        while k >= 0 and starts[k] <= high:
+            covered += sizes[k]
+            removed += 1
+            k = nxt[k]
+        extra = (high - low + 1) - covered
+        return extra / removed, extra, first, supernet[1]
+
+    heap: list[tuple[float, int, int, int, int]] = []
+    for i in range(n - 1):
+        found = candidate(i)
+        if found is not None:
+            heapq.heappush(heap, (found[0], found[1], i, found[2], found[3]))
+
+    budget = allow_extra
+    while heap:
+        ratio, extra, i, first, prefix = heapq.heappop(heap)
+        if extra > budget:
+            continue
+        if not alive[i]:
+            continue
+        found = candidate(i)
+        if found is None or found[1:] != (extra, first, prefix):
+            if found is not None:
+                heapq.heappush(heap, (found[0], found[1], i, found[2], found[3]))
+            continue
+        host_bits = bits - prefix
+        low = (starts[first] >> host_bits) << host_bits
+        high = low + (1 << host_bits) - 1
+        # Поглощаем все префиксы внутри родителя в узел first.
+        k = nxt[first]
+        while k >= 0 and starts[k] <= high:
+            alive[k] = 0
+            k = nxt[k]
+        nxt[first] = k
+        if k >= 0:
+            prev[k] = first
+        starts[first], prefixes[first], sizes[first] = low, prefix, high - low + 1
+        budget -= extra
+        for node in (first, prev[first]):
+            if node >= 0:
+                found = candidate(node)
+                if found is not None:
+                    heapq.heappush(heap, (found[0], found[1], node, found[2], found[3]))
+
+    result = [(starts[i], prefixes[i]) for i in range(n) if alive[i]]
+    return result, allow_extra - budget
+
+
+def _covered(inner: list[Interval], outer: list[Interval]) -> bool:
+    j = 0
+    for start, end in inner:
+        while j < len(outer) and outer[j][1] < start:
+            j += 1
+        if j == len(outer) or not (outer[j][0] <= start and end <= outer[j][1]):
+            return False
+    return True
+
+
+def aggregate(entries: Iterable[str], allow_extra: int = 0) -> AggregateResult:
+    """Сжимает записи ipset; бросает AggregationError, если проверка покрытия не прошла."""
+    result = AggregateResult()
+    v4_keys = array("Q")
+    v6_intervals: list[Interval] = []
+    for entry in entries:
+        try:
+            version, start, end = parse_cidr(entry)
+        except (OSError, ValueError):
+            result.invalid += 1
+            continue
+        result.entries_before[version] += 1
+        if version == 4:
+            v4_keys.append(start << 32 | end)
+        else:
+            v6_intervals.append((start, end))
+
+    merged = {4: _merge_v4(v4_keys), 6: merge_intervals(v6_intervals)}
+    del v4_keys, v6_intervals
+    for version, intervals in merged.items():
+        bits = FAMILY_BITS[version]
+        result.addresses_before[version] = sum(end - start + 1 for start, end in intervals)
+        cidrs = [cidr for start, end in intervals for cidr in interval_to_cidrs(start, end, bits)]
+        cidrs, extra = widen(cidrs, bits, allow_extra)
+        result.cidrs[version] = cidrs
+        result.extra_addresses[version] = extra
+
+        after = merge_intervals(cidr_interval(cidr, bits) for cidr in cidrs)
+        if extra == 0 and after != intervals:
+            raise AggregationError(f"IPv{version} coverage changed during aggregation")
+        added = sum(end - start + 1 for start, end in after) - result.addresses_before[version]
+        if not _covered(intervals, after) or added != extra or extra > allow_extra:
+            raise AggregationError(f"IPv{version} superset check failed")
+    return result
+
+
+def iter_ipset_file(path: str) -> Iterator[str]:
+    for line in iter_source(path):
+        entry = line.strip()
+        if entry and not entry.startswith(COMMENT_PREFIX):
+            yield entry
+
+
+def _synthetic(path: str, count: int, seed: int) -> None:
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for _ in range(count):
+            if rng.random() < 0.95:
+                value = rng.randrange(1 << 24) << 8 | rng.randrange(256)
+                prefix = rng.choice((32, 32, 32, 30, 28, 24))
+                octets = ".".join(str(value >> shift & 255) for shift in (24, 16, 8, 0))
+                f.write(f"{octets}/{prefix}\n")
+            else:
+                f.write(f"2001:db8:{rng.randrange(1 << 16):x}::{rng.randrange(1 << 16):x}/128\n")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Collapse ipset entries into a minimal CIDR set.")
+    parser.add_argument("ipsets", nargs="*", help="Plain, .gz or .xz ipset files")
+    parser.add_argument("--output", help="Write the aggregated ipset here")
+    parser.add_argument(
+        "--allow-extra", type=int, default=0, metavar="N",
+        help="Allow up to N extra addresses per family to merge more prefixes",
+    )
+    parser.add_argument(
+        "--synthetic", type=int, metavar="COUNT",
+        help="Benchmark on a generated ipset with COUNT entries instead of the inputs",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    paths = list(args.ipsets)
+    temp_path: Optional[str] = None
+    if args.synthetic:
+        import tempfile
+
+        fd, temp_path = tempfile.mkstemp(suffix=".txt")
+        os.close(fd)
+        _synthetic(temp_path, args.synthetic, args.seed)
+        paths = [temp_path]
+    if not paths:
+        parser.error("no ipset files given")
+
+    try:
+        started = time.perf_counter()
+        result = aggregate(
+            (entry for path in paths for entry in iter_ipset_file(path)), args.allow_extra
+        )
+        elapsed = time.perf_counter() - started
+    except AggregationError as e:
+        # Непроверенный результат не записывается.
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if temp_path:
+            os.unlink(temp_path)
+
+    print("family\tbefore\tafter\taddresses\textra")
+    for version in FAMILY_BITS:
+        print(
+            f"IPv{version}\t{result.entries_before[version]}\t{result.entries_after[version]}\t"
+            f"{result.addresses_before[version]}\t{result.extra_addresses[version]}"
+        )
+    print(f"# {result.invalid} invalid, verified in {elapsed:.2f} s")
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.writelines(f"{line}\n" for line in result.lines())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
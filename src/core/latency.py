@@ -0,0 +1,68 @@
+import threading
+from array import array
+from typing import Final, Optional
+
+
+DEFAULT_CAPACITY: Final[int] = 4096
+QUANTILES: Final[tuple[float, ...]] = (0.5, 0.95, 0.99)
+
+
+def _quantile(sorted_values: list[float], q: float) -> float:
+    return sorted_values[min(int(q * len(sorted_values)), len(sorted_values) - 1)]
+
+
+class LatencyRecorder:
+    """Кольцевой буфер последних замеров длительности (в секундах).
+
+    Память выделяется один раз; перцентили считаются по последним
+    capacity значениям, счетчик и сумма — за все время.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self._capacity: int = capacity
+        self._values: array = array("d", bytes(8 * capacity))
+        self._lock: threading.Lock = threading.Lock()
+        self.count: int = 0
+        self.total: float = 0.0
+        self.maximum: float = 0.0
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._values[self.count % self._capacity] = seconds
+            self.count += 1
+            self.total += seconds
+            self.maximum = max(self.maximum, seconds)
+
+    @property
+    def last(self) -> Optional[float]:
+        with self._lock:
+            if not self.count:
+                return None
+            return self._values[(self.count - 1) % self._capacity]
+
+    def values(self) -> list[float]:
+        with self._lock:
+            return self._values[: min(self.count, self._capacity)].tolist()
+
+    def percentile(self, q: float) -> Optional[float]:
+        values = sorted(self.values())
+        return _quantile(values, q) if values else None
+
+    def summary(self) -> dict[str, float]:
+        values = sorted(self.values())
+        result: dict[str, float] = {"count": float(self.count), "max": self.maximum}
+        for q in QUANTILES:
+            if values:
+                result[f"p{int(q * 100)}"] = _quantile(values, q)
+        return result
+
+    def render_openmetrics(self, name: str, help_text: str) -> list[str]:
+        """Строки метрики типа summary (без завершающего "# EOF")."""
+        values = sorted(self.values())
+        lines = [f"# TYPE {name} summary", f"# HELP {name} {help_text}"]
+        if values:
+            for q in QUANTILES:
+                lines.append(f'{name}{{quantile="{q}"}} {_quantile(values, q)}')
+        lines.append(f"{name}_count {self.count}")
+        lines.append(f"{name}_sum {self.total}")
+        return lines
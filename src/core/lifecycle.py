@@ -0,0 +1,249 @@
+"""Журнал этапов жизненного цикла: запуск приложения, старт и остановка профилей.
+
+mark() только кладет кортеж (monotonic, этап, профиль, поля) в deque;
+сериализацию и запись в JSON lines с ротацией выполняет фоновый поток,
+поэтому вызов безопасен в потоке интерфейса. Пока запись не запущена
+(start), хранятся последние DEFAULT_CAPACITY событий.
+
+Этапы группируются в циклы по виду (KIND_STAGES): цикл открывает первый
+этап вида, последующие события того же процесса и профиля измеряются от
+него. ``python -m src.core.lifecycle summary`` печатает перцентили
+задержек этапов, общие и по профилям.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from typing import Any, Final, Iterable, Iterator, Optional
+
+from src.core.latency import LatencyRecorder
+
+
+DEFAULT_CAPACITY: Final[int] = 10000
+LOG_NAME: Final[str] = "lifecycle.jsonl"
+FLUSH_INTERVAL: Final[float] = 1.0
+# Аргумент, которым перезапуск с правами администратора передает момент исходного запуска.
+ORIGIN_ARG: Final[str] = "--lifecycle-origin="
+
+KIND_STARTUP: Final[str] = "startup"
+KIND_START: Final[str] = "start"
+KIND_STOP: Final[str] = "stop"
+# Первый этап каждого вида открывает цикл.
+KIND_STAGES: Final[dict[str, tuple[str, ...]]] = {
+    KIND_STARTUP: (
+        "process_start",
+        "admin_restart",
+        "elevated",
+        "instance_checked",
+        "imports_done",
+        "admin_checked",
+        "window_created",
+        "window_shown",
+    ),
+    KIND_START: (
+        "start_requested",
+        "argv_built",
+        "spawned",
+        "first_poll",
+        "started",
+        "ui_running",
+    ),
+    KIND_STOP: (
+        "stop_requested",
+        "terminate_sent",
+        "process_exited",
+        "stopped",
+        "ui_stopped",
+    ),
+}
+STAGE_KINDS: Final[dict[str, str]] = {
+    stage: kind for kind, stages in KIND_STAGES.items() for stage in stages
+}
+
+Event = tuple[float, str, Optional[str], Optional[dict[str, Any]]]
+
+
+class EventRecorder:
+    """Буфер событий с фоновой записью в файл."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self._pending: deque[Event] = deque(maxlen=capacity)
+        self._logger: Optional[logging.Logger] = None
+        self._wakeup: threading.Event = threading.Event()
+        self._stopping: bool = False
+        self._thread: Optional[threading.Thread] = None
+        self.path: Optional[str] = None
+
+    def mark(
+        self, stage: str, profile: Optional[str] = None, at: Optional[float] = None, **fields: Any
+    ) -> None:
+        # deque.append потокобезопасен; никаких блокировок и ввода-вывода.
+        self._pending.append(
+            (time.monotonic() if at is None else at, stage, profile, fields or None)
+        )
+
+    def start(self, path: str, max_bytes: int = 1 << 20, backup_count: int = 3) -> None:
+        if self._thread is not None:
+            return
+        self.path = path
+        self._logger = logging.getLogger(f"zapret.lifecycle.{id(self)}")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        handler = RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self._logger.addHandler(handler)
+        self._thread = threading.Thread(target=self._run, name="zapret-lifecycle", daemon=True)
+        self._thread.start()
+
+    def flush(self) -> None:
+        self._wakeup.set()
+
+    def stop(self) -> None:
+        """Дописывает накопленные события и останавливает поток записи."""
+        if self._thread is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        self._thread.join(2.0)
+        self._thread = None
+        if self._logger:
+            for handler in list(self._logger.handlers):
+                handler.close()
+                self._logger.removeHandler(handler)
+
+    def _run(self) -> None:
+        pid = os.getpid()
+        while True:
+            self._wakeup.wait(FLUSH_INTERVAL)
+            self._wakeup.clear()
+            stopping = self._stopping
+            # Смещение monotonic -> время на часах, только для удобства чтения.
+            wall_offset = time.time() - time.monotonic()
+            while self._pending:
+                t, stage, profile, fields = self._pending.popleft()
+                record = {"t": round(t, 6), "wall": round(t + wall_offset, 3), "pid": pid, "stage": stage}
+                if profile is not None:
+                    record["profile"] = profile
+                if fields:
+                    record.update(fields)
+                self._logger.info(json.dumps(record, ensure_ascii=False))
+            if stopping:
+                return
+
+    def snapshot(self) -> list[Event]:
+        return list(self._pending)
+
+
+events: EventRecorder = EventRecorder()
+
+
+def mark(stage: str, profile: Optional[str] = None, at: Optional[float] = None, **fields: Any) -> None:
+    events.mark(stage, profile, at, **fields)
+
+
+def default_path() -> str:
+    from src.core.paths import data_dir
+
+    return os.path.join(data_dir(), LOG_NAME)
+
+
+def take_origin(argv: list[str]) -> Optional[float]:
+    """Извлекает из argv момент исходного запуска, переданный перезапуском от администратора."""
+    origin: Optional[float] = None
+    for arg in list(argv):
+        if arg.startswith(ORIGIN_ARG):
+            argv.remove(arg)
+            try:
+                origin = float(arg[len(ORIGIN_ARG):])
+            except ValueError:
+                pass
+    return origin
+
+
+def iter_log(path: str) -> Iterator[dict[str, Any]]:
+    """События из файла и его ротированных копий, от старых к новым."""
+    paths = [f"{path}.{n}" for n in range(9, 0, -1)] + [path]
+    for candidate in paths:
+        if not os.path.exists(candidate):
+            continue
+        with open(candidate, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+
+def summarize(
+    records: Iterable[dict[str, Any]],
+) -> dict[tuple[str, str, Optional[str]], LatencyRecorder]:
+    """Задержки этапов от начала цикла по (вид, этап, профиль); профиль None — все профили."""
+    open_cycles: dict[tuple[int, str, Optional[str]], float] = {}
+    groups: dict[tuple[str, str, Optional[str]], LatencyRecorder] = {}
+
+    def add(key: tuple[str, str, Optional[str]], value: float) -> None:
+        recorder = groups.get(key)
+        if recorder is None:
+            recorder = groups[key] = LatencyRecorder()
+        recorder.record(value)
+
+    for record in sorted(records, key=lambda r: r["t"]):
+        stage = record.get("stage")
+        kind = STAGE_KINDS.get(stage)
+        if kind is None:
+            continue
+        profile = record.get("profile") if kind != KIND_STARTUP else None
+        # Цикл запуска приложения продолжается в процессе, перезапущенном от администратора.
+        pid = record.get("pid") if kind != KIND_STARTUP else record.get("origin", record.get("pid"))
+        key = (pid, kind, profile)
+        if stage == KIND_STAGES[kind][0]:
+            open_cycles[key] = record["t"]
+            continue
+        started = open_cycles.get(key)
+        if started is None:
+            continue
+        add((kind, stage, None), record["t"] - started)
+        if profile is not None:
+            add((kind, stage, profile), record["t"] - started)
+    return groups
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Summarize lifecycle stage timings.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    summary = subparsers.add_parser("summary", help="Percentiles per stage and per profile")
+    summary.add_argument("--path", help=f"Event log (default: {LOG_NAME} in the data directory)")
+    summary.add_argument("--by-profile", action="store_true")
+    args = parser.parse_args(argv)
+
+    path = args.path or default_path()
+    if not os.path.exists(path):
+        print(f"No lifecycle log at {path}", file=sys.stderr)
+        return 1
+    groups = summarize(iter_log(path))
+
+    order = {stage: n for n, stage in enumerate(STAGE_KINDS)}
+    print("kind\tstage\tprofile\tcount\tp50_ms\tp95_ms\tp99_ms\tmax_ms")
+    for (kind, stage, profile), recorder in sorted(
+        groups.items(), key=lambda item: (item[0][2] or "", order[item[0][1]])
+    ):
+        if profile is not None and not args.by_profile:
+            continue
+        stats = recorder.summary()
+        print(
+            f"{kind}\t{stage}\t{profile or '*'}\t{int(stats['count'])}\t"
+            + "\t".join(f"{stats[q] * 1000:.1f}" for q in ("p50", "p95", "p99", "max"))
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,343 @@
+"""Потоковая сборка одного hostlist/ipset из нескольких источников.
+
+Источники читаются построчно генераторами: обычные файлы (крупные —
+через mmap), .gz и .xz. Записи нормализуются и проверяются, а повторы
+удаляются внешней сортировкой: в памяти держится не больше chunk_entries
+уникальных записей, заполненный блок сбрасывается на диск отсортированным
+прогоном, и прогоны затем сливаются heapq.merge. Поэтому пиковая память
+ограничена размером блока, а не размером входа.
+
+``python -m src.core.list_pipeline build`` собирает список,
+``python -m src.core.list_pipeline bench --lines 10000000`` измеряет
+пропускную способность и пиковый RSS на синтетическом входе.
+"""
+
+import argparse
+import gzip
+import heapq
+import lzma
+import mmap
+import os
+import random
+import re
+import socket
+import sys
+import tempfile
+import threading
+import time
+from contextlib import ExitStack, closing
+from dataclasses import dataclass
+from typing import Callable, Final, Iterable, Iterator, Optional
+
+from src.core.lists import COMMENT_PREFIX, normalize_domain, parse_cidr
+
+
+KIND_HOSTLIST: Final[str] = "hostlist"
+KIND_IPSET: Final[str] = "ipset"
+DEFAULT_CHUNK_ENTRIES: Final[int] = 500_000
+# Файлы меньше этого размера читаются обычным open().
+MMAP_MIN_SIZE: Final[int] = 1 << 20
+READ_BUFFER: Final[int] = 1 << 20
+# Шаг освобождения уже прочитанных страниц mmap (кратен размеру страницы).
+MMAP_RELEASE_STEP: Final[int] = 16 << 20
+_DOMAIN_RE: Final[re.Pattern] = re.compile(
+    r"(?=.{1,253}$)(?:[a-z0-9_](?:[a-z0-9_-]{0,61}[a-z0-9_])?\.)*"
+    r"[a-z0-9_](?:[a-z0-9_-]{0,61}[a-z0-9_])?"
+)
+_FAMILIES: Final[dict[int, tuple[int, int]]] = {4: (socket.AF_INET, 32), 6: (socket.AF_INET6, 128)}
+
+
+@dataclass
+class PipelineStats:
+    sources: int = 0
+    lines: int = 0
+    invalid: int = 0
+    duplicates: int = 0
+    written: int = 0
+    runs: int = 0
+    seconds: float = 0.0
+
+
+def _iter_mmap_lines(path: str) -> Iterator[str]:
+    """Строки файла через mmap; прочитанные страницы отдаются обратно ОС.
+
+    Иначе весь отображенный файл постепенно попадает в RSS процесса.
+    """
+    release = getattr(mmap, "MADV_DONTNEED", None)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+        released = 0
+        while True:
+            line = view.readline()
+            if not line:
+                return
+            yield line.decode("utf-8", "replace")
+            if release is not None and view.tell() - released >= MMAP_RELEASE_STEP:
+                view.madvise(release, released, MMAP_RELEASE_STEP)
+                released += MMAP_RELEASE_STEP
+
+
+def iter_source(path: str) -> Iterator[str]:
+    """Сырые строки источника; сжатие определяется по расширению."""
+    if path.endswith(".gz"):
+        with gzip.open(path, "rt", encoding="utf-8", errors="replace") as f:
+            yield from f
+    elif path.endswith(".xz"):
+        with lzma.open(path, "rt", encoding="utf-8", errors="replace") as f:
+            yield from f
+    elif os.path.getsize(path) >= MMAP_MIN_SIZE:
+        yield from _iter_mmap_lines(path)
+    else:
+        with open(path, "r", encoding="utf-8", errors="replace", buffering=READ_BUFFER) as f:
+            yield from f
+
+
+def normalize_hostlist_entry(entry: str) -> Optional[str]:
+    domain = normalize_domain(entry)
+    if not domain.isascii():
+        try:
+            domain = domain.encode("idna").decode("ascii")
+        except UnicodeError:
+            return None
+    return domain if _DOMAIN_RE.fullmatch(domain) else None
+
+
+def format_cidr(version: int, start: int, end: int) -> str:
+    family, bits = _FAMILIES[version]
+    address = socket.inet_ntop(family, start.to_bytes(bits // 8, "big"))
+    prefix = bits - (end - start).bit_length()
+    return address if prefix == bits else f"{address}/{prefix}"
+
+
+def normalize_ipset_entry(entry: str) -> Optional[str]:
+    """Каноническая запись подсети (адрес сети/префикс) или None, если строка некорректна."""
+    try:
+        return format_cidr(*parse_cidr(entry))
+    except (OSError, ValueError):
+        return None
+
+
+NORMALIZERS: Final[dict[str, Callable[[str], Optional[str]]]] = {
+    KIND_HOSTLIST: normalize_hostlist_entry,
+    KIND_IPSET: normalize_ipset_entry,
+}
+
+
+def iter_entries(
+    sources: Iterable[str], kind: str, stats: Optional[PipelineStats] = None
+) -> Iterator[str]:
+    """Нормализованные записи всех источников по порядку, без комментариев и мусора."""
+    stats = stats if stats is not None else PipelineStats()
+    normalize = NORMALIZERS[kind]
+    for path in sources:
+        stats.sources += 1
+        for line in iter_source(path):
+            entry = line.strip()
+            if not entry or entry.startswith(COMMENT_PREFIX):
+                continue
+            stats.lines += 1
+            value = normalize(entry)
+            if value is None:
+                stats.invalid += 1
+                continue
+            yield value
+
+
+def _write_run(directory: str, entries: set[str], index: int) -> str:
+    path = os.path.join(directory, f"run-{index:05d}.txt")
+    with open(path, "w", encoding="utf-8", buffering=READ_BUFFER) as f:
+        f.writelines(f"{entry}\n" for entry in sorted(entries))
+    return path
+
+
+def _read_run(path: str) -> Iterator[str]:
+    with open(path, "r", encoding="utf-8", buffering=READ_BUFFER) as f:
+        for line in f:
+            yield line[:-1]
+
+
+def dedupe_sorted(
+    entries: Iterable[str],
+    chunk_entries: int = DEFAULT_CHUNK_ENTRIES,
+    stats: Optional[PipelineStats] = None,
+    temp_dir: Optional[str] = None,
+) -> Iterator[str]:
+    """Уникальные записи в отсортированном порядке с памятью O(chunk_entries)."""
+    stats = stats if stats is not None else PipelineStats()
+    with tempfile.TemporaryDirectory(prefix="zapret-lists-", dir=temp_dir) as directory:
+        runs: list[str] = []
+        chunk: set[str] = set()
+        for entry in entries:
+            if entry in chunk:
+                stats.duplicates += 1
+                continue
+            chunk.add(entry)
+            if len(chunk) >= chunk_entries:
+                runs.append(_write_run(directory, chunk, len(runs)))
+                chunk = set()
+        stats.runs = len(runs) + (1 if chunk else 0)
+
+        if not runs:
+            yield from sorted(chunk)
+            return
+        if chunk:
+            runs.append(_write_run(directory, chunk, len(runs)))
+            chunk = set()
+
+        with ExitStack() as stack:
+            readers = [stack.enter_context(closing(_read_run(path))) for path in runs]
+            previous: Optional[str] = None
+            for entry in heapq.merge(*readers):
+                if entry == previous:
+                    stats.duplicates += 1
+                    continue
+                previous = entry
+                yield entry
+
+
+def build_list(
+    sources: list[str],
+    output: str,
+    kind: str = KIND_HOSTLIST,
+    chunk_entries: int = DEFAULT_CHUNK_ENTRIES,
+    temp_dir: Optional[str] = None,
+) -> PipelineStats:
+    """Собирает отсортированный список без повторов и атомарно заменяет output."""
+    stats = PipelineStats()
+    started = time.perf_counter()
+    directory = os.path.dirname(os.path.abspath(output))
+    fd, partial = tempfile.mkstemp(prefix=".list-", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", buffering=READ_BUFFER) as f:
+            for entry in dedupe_sorted(
+                iter_entries(sources, kind, stats), chunk_entries, stats, temp_dir
+            ):
+                f.write(entry)
+                f.write("\n")
+                stats.written += 1
+        os.replace(partial, output)
+    except BaseException:
+        os.unlink(partial)
+        raise
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+
+def write_synthetic(path: str, lines: int, kind: str, seed: int = 0) -> None:
+    """Синтетический источник: около 40% повторов, комментарии и мусорные строки."""
+    rng = random.Random(seed)
+    unique = max(1, lines * 4 // 5)
+    with open(path, "w", encoding="utf-8", buffering=READ_BUFFER) as f:
+        for n in range(lines):
+            roll = rng.random()
+            if roll < 0.002:
+                f.write("# comment\n")
+            elif roll < 0.004:
+                f.write("not a valid entry!\n")
+            else:
+                value = rng.randrange(unique)
+                if kind == KIND_IPSET:
+                    address = socket.inet_ntoa((0x0A000000 + value * 4).to_bytes(4, "big"))
+                    f.write(f"{address}/30\n" if value % 3 else f"{address}\n")
+                else:
+                    f.write(f"host{value}.example{value % 997}.com\n")
+
+
+class _PeakRss:
+    """Фоновый опрос RSS текущего процесса."""
+
+    def __init__(self, interval: float = 0.02):
+        from src.core.resource_sampler import open_reader
+
+        self._reader = open_reader(os.getpid())
+        self._interval: float = interval
+        self._stop: threading.Event = threading.Event()
+        self.baseline: float = self._reader.sample()[1]
+        self.peak: float = self.baseline
+        self._thread: threading.Thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            self.peak = max(self.peak, self._reader.sample()[1])
+
+    def __enter__(self) -> "_PeakRss":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._reader.sample()[1])
+        self._reader.close()
+
+
+def _cmd_build(args: argparse.Namespace) -> int:
+    stats = build_list(args.sources, args.output, args.kind, args.chunk_entries, args.temp_dir)
+    print(
+        f"{args.output}: {stats.written} entries from {stats.sources} source(s), "
+        f"{stats.invalid} invalid, {stats.duplicates} duplicates, {stats.runs} run(s), "
+        f"{stats.seconds:.2f} s"
+    )
+    return 0
+
+
+def _cmd_bench(args: argparse.Namespace) -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "source.txt")
+        started = time.perf_counter()
+        write_synthetic(source, args.lines, args.kind, args.seed)
+        generated = time.perf_counter() - started
+        if args.compress:
+            compressed = source + "." + args.compress
+            opener = gzip.open if args.compress == "gz" else lzma.open
+            with open(source, "rb") as src, opener(compressed, "wb") as dst:
+                while chunk := src.read(READ_BUFFER):
+                    dst.write(chunk)
+            os.unlink(source)
+            source = compressed
+
+        with _PeakRss() as rss:
+            stats = build_list(
+                [source], os.path.join(tmp, "out.txt"), args.kind, args.chunk_entries, tmp
+            )
+    peak_mb = (rss.peak - rss.baseline) / (1 << 20)
+    print("lines\twritten\tduplicates\tinvalid\truns\tseconds\tlines_per_s\tpeak_rss_delta_mb")
+    print(
+        f"{stats.lines}\t{stats.written}\t{stats.duplicates}\t{stats.invalid}\t{stats.runs}\t"
+        f"{stats.seconds:.2f}\t{stats.lines / stats.seconds:.0f}\t{peak_mb:.1f}"
+    )
+    print(f"# synthetic input generated in {generated:.2f} s", file=sys.stderr)
+    if args.max_rss_mb is not None and peak_mb > args.max_rss_mb:
+        print(f"FAIL: peak RSS grew by {peak_mb:.1f} MB > {args.max_rss_mb} MB", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Stream, validate and deduplicate hostlists/ipsets.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(sub: argparse.ArgumentParser) -> None:
+        sub.add_argument("--kind", choices=tuple(NORMALIZERS), default=KIND_HOSTLIST)
+        sub.add_argument("--chunk-entries", type=int, default=DEFAULT_CHUNK_ENTRIES)
+
+    build = subparsers.add_parser("build", help="Merge sources into one consolidated list")
+    build.add_argument("sources", nargs="+", help="Plain, .gz or .xz list files")
+    build.add_argument("--output", required=True)
+    build.add_argument("--temp-dir", help="Directory for external sort runs")
+    add_common(build)
+    build.set_defaults(func=_cmd_build)
+
+    bench = subparsers.add_parser("bench", help="Measure throughput and peak memory")
+    bench.add_argument("--lines", type=int, default=10_000_000)
+    bench.add_argument("--compress", choices=("gz", "xz"))
+    bench.add_argument("--seed", type=int, default=0)
+    bench.add_argument("--max-rss-mb", type=float, help="Fail if peak RSS grows by more")
+    add_common(bench)
+    bench.set_defaults(func=_cmd_bench)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+import socket
+from bisect import bisect_right
+from typing import Final, Iterable, Iterator, Optional
+
+
+COMMENT_PREFIX: Final[str] = "#"
+_TERMINAL: Final[str] = ""
+_FAMILIES: Final[dict[int, int]] = {4: socket.AF_INET, 6: socket.AF_INET6}
+_FAMILY_BITS: Final[dict[int, int]] = {4: 32, 6: 128}
+
+
+def iter_list_file(path: str) -> Iterator[str]:
+    """Построчно читает hostlist/ipset, пропуская пустые строки и комментарии."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            entry = line.strip()
+            if entry and not entry.startswith(COMMENT_PREFIX):
+                yield entry
+
+
+def normalize_domain(entry: str) -> str:
+    return entry.strip().rstrip(".").lower()
+
+
+class DomainTrie:
+    """Суффиксное дерево доменов по перевернутым меткам.
+
+    Запись "discord.com" покрывает сам домен и все его поддомены, как это
+    делает winws при проверке --hostlist. Поиск занимает O(число меток).
+    """
+
+    def __init__(self, domains: Iterable[str] = ()):
+        self._root: dict = {}
+        self._size: int = 0
+        for domain in domains:
+            self.add(domain)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, domain: str) -> bool:
+        """Добавляет домен; возвращает False, если он уже был в дереве."""
+        node = self._root
+        for label in reversed(normalize_domain(domain).split(".")):
+            node = node.setdefault(label, {})
+        if _TERMINAL in node:
+            return False
+        node[_TERMINAL] = True
+        self._size += 1
+        return True
+
+    def match(self, host: str) -> Optional[str]:
+        """Возвращает самую короткую запись, покрывающую host, или None."""
+        node = self._root
+        labels = normalize_domain(host).split(".")
+        depth = 0
+        for label in reversed(labels):
+            node = node.get(label)
+            if node is None:
+                return None
+            depth += 1
+            if _TERMINAL in node:
+                return ".".join(labels[-depth:])
+        return None
+
+    def __contains__(self, host: str) -> bool:
+        return self.match(host) is not None
+
+    def iter_roots(self) -> Iterator[str]:
+        """Перечисляет записи, не покрытые никакой другой записью дерева."""
+        stack: list[tuple[dict, tuple[str, ...]]] = [(self._root, ())]
+        while stack:
+            node, labels = stack.pop()
+            if _TERMINAL in node:
+                yield ".".join(reversed(labels))
+                continue
+            for label, child in node.items():
+                stack.append((child, labels + (label,)))
+
+
+def parse_address(address: str) -> tuple[int, int]:
+    """Переводит IPv4/IPv6 адрес в пару (версия, целое число) без ipaddress."""
+    if ":" in address:
+        return 6, int.from_bytes(socket.inet_pton(socket.AF_INET6, address), "big")
+    return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, address), "big")
+
+
+def parse_cidr(entry: str) -> tuple[int, int, int]:
+    """Переводит "a.b.c.d/nn" в (версия, первый адрес, последний адрес)."""
+    address, sep, prefix = entry.strip().partition("/")
+    version, value = parse_address(address)
+    bits = _FAMILY_BITS[version]
+    length = int(prefix) if sep else bits
+    if not 0 <= length <= bits:
+        raise ValueError(f"Invalid prefix length in '{entry}'")
+    host_bits = bits - length
+    start = (value >> host_bits) << host_bits
+    return version, start, start | ((1 << host_bits) - 1)
+
+
+def merge_intervals(intervals: Iterable[tuple[int, int]]) -> list[tuple[int, int]]:
+    """Сливает пересекающиеся и смежные интервалы [start, end]."""
+    merged: list[tuple[int, int]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class CidrSet:
+    """Набор подсетей IPv4/IPv6 в виде отсортированных непересекающихся интервалов.
+
+    Проверка адреса выполняется бинарным поиском за O(log n).
+    """
+
+    def __init__(self, entries: Iterable[str] = ()):
+        pending: dict[int, list[tuple[int, int]]] = {4: [], 6: []}
+        for entry in entries:
+            version, start, end = parse_cidr(entry)
+            pending[version].append((start, end))
+        self._starts: dict[int, list[int]] = {}
+        self._ends: dict[int, list[int]] = {}
+        for version, intervals in pending.items():
+            merged = merge_intervals(intervals)
+            self._starts[version] = [start for start, _ in merged]
+            self._ends[version] = [end for _, end in merged]
+
+    def __len__(self) -> int:
+        return sum(len(starts) for starts in self._starts.values())
+
+    def intervals(self, version: int) -> list[tuple[int, int]]:
+        return list(zip(self._starts[version], self._ends[version]))
+
+    def contains_value(self, version: int, value: int) -> bool:
+        starts = self._starts[version]
+        position = bisect_right(starts, value) - 1
+        return position >= 0 and value <= self._ends[version][position]
+
+    def __contains__(self, address: str) -> bool:
+        try:
+            version, value = parse_address(address)
+        except OSError:
+            return False
+        return self.contains_value(version, value)
@@ -0,0 +1,645 @@
+"""Правила nftables для запуска профилей через nfqws на Linux.
+
+Профиль winws переводится в одну таблицу ``inet zapret``. Что именно
+отправить в очередь nfqws, ядро решает само: правило на каждую пару
+(протокол, порты) из объединения секций профиля, а для секций с --ipset
+порты дополнительно ограничены адресом назначения из множества
+``flags interval``. Множества строятся из файлов ipset через
+ipset_aggregator, так что в ядро попадает минимальный набор префиксов.
+Порты, которые и так уходят в очередь правилом без множества, из правил
+с множеством вычитаются. Правила всегда покрывают все пакеты, которые
+обработала бы хоть одна секция: --ipset-exclude и --hostlist проверяет
+сам nfqws.
+
+Как и в стандартных правилах zapret, в очередь идут только первые
+пакеты соединения (ct original packets, для TCP еще ответы сервера для
+autottl), а пакеты, отправленные самим nfqws (метка DESYNC_MARK),
+пропускаются. Очередь с флагом bypass: пока nfqws не слушает, трафик
+проходит без обработки.
+
+Таблица заменяется атомарно: текст правил начинается с создания и
+удаления таблицы, и ``nft -f`` применяет все одной транзакцией.
+NftFirewall перед заменой проверяет правила (``nft -c``) и запоминает
+прежнюю таблицу для отката.
+
+``python -m src.core.nftables render PROFILE`` печатает правила профиля;
+``check`` сверяет правила профилей из nft_golden с эталонными файлами;
+``bench`` считает, сколько пакетов синтетического захвата попадет в
+очередь с фильтрацией по множествам и без нее (``--live`` — то же на
+loopback в ядре, нужны root и nft).
+"""
+
+import argparse
+import difflib
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from bisect import bisect_right
+from collections import Counter
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import Final, Iterable, Optional
+
+from src.core.ipset_aggregator import AggregateResult, aggregate, iter_ipset_file
+from src.core.lists import merge_intervals
+from src.core.profiles import PortRanges, Profile, load_profiles, ports_contain, resolve_path
+from src.core.sharding import section_ports
+
+
+TABLE_FAMILY: Final[str] = "inet"
+TABLE_NAME: Final[str] = "zapret"
+DEFAULT_QNUM: Final[int] = 200
+# Метка пакетов, которые nfqws отправляет сам (--dpi-desync-fwmark).
+DESYNC_MARK: Final[int] = 0x40000000
+HOOK_OUT: Final[str] = "postrouting"
+HOOK_IN: Final[str] = "prerouting"
+# После srcnat и до dstnat: nfqws видит адреса, с которыми пакет уйдет в сеть.
+HOOK_PRIORITY: Final[dict[str, int]] = {HOOK_OUT: 101, HOOK_IN: -101}
+# Сколько первых пакетов соединения отправлять в очередь (как в zapret по умолчанию).
+PACKETS_OUT: Final[tuple[int, int]] = (1, 9)
+TCP_PACKETS_IN: Final[tuple[int, int]] = (1, 3)
+# Счетчик пакетов потока выше этого значения на решение уже не влияет.
+_PACKETS_CAP: Final[int] = max(PACKETS_OUT[1], TCP_PACKETS_IN[1]) + 1
+L3_FAMILIES: Final[dict[str, int]] = {"ipv4": 4, "ipv6": 6}
+_ADDRESS_TYPES: Final[dict[int, tuple[str, str]]] = {4: ("ipv4_addr", "ip"), 6: ("ipv6_addr", "ip6")}
+GOLDEN_DIR: Final[str] = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nft_golden")
+GOLDEN_SUFFIX: Final[str] = ".nft"
+
+
+@dataclass(frozen=True)
+class NftSet:
+    name: str
+    family: int
+    elements: tuple[str, ...]
+    intervals: tuple[tuple[int, int], ...]
+    paths: tuple[str, ...]
+    starts: tuple[int, ...] = field(default=(), compare=False)
+
+    def contains(self, address: int) -> bool:
+        i = bisect_right(self.starts, address) - 1
+        return i >= 0 and address <= self.intervals[i][1]
+
+
+@dataclass(frozen=True)
+class NftRule:
+    hook: str
+    protocol: str
+    ports: PortRanges
+    packets: tuple[int, int]
+    # Семейство адресов, если правило ограничено им (--wf-l3 или множеством).
+    family: Optional[int] = None
+    set_name: Optional[str] = None
+
+    def render(self, qnum: int, sets: dict[str, NftSet], counter: bool = False) -> str:
+        outbound = self.hook == HOOK_OUT
+        parts: list[str] = []
+        if self.family is not None and self.set_name is None:
+            parts.append(f"meta nfproto ipv{self.family}")
+        parts.append(f"{self.protocol} {'dport' if outbound else 'sport'} {render_ports(self.ports)}")
+        if self.set_name is not None:
+            prefix = _ADDRESS_TYPES[sets[self.set_name].family][1]
+            parts.append(f"{prefix} {'daddr' if outbound else 'saddr'} @{self.set_name}")
+        start, end = self.packets
+        parts.append(f"ct {'original' if outbound else 'reply'} packets {start}-{end}")
+        if counter:
+            parts.append("counter")
+        parts.append(f"queue num {qnum} bypass")
+        return " ".join(parts)
+
+
+@dataclass(frozen=True)
+class Ruleset:
+    """Таблица nftables одного профиля и ее модель для офлайн-оценки."""
+
+    profile: str
+    sets: dict[str, NftSet]
+    rules: tuple[NftRule, ...]
+    qnum: int = DEFAULT_QNUM
+    table: str = TABLE_NAME
+
+    def render(self, counter: bool = False) -> str:
+        """Текст для ``nft -f``: атомарная замена таблицы целиком."""
+        name = " ".join(self.profile.split())
+        lines = [
+            f"# profile: {name}",
+            f"table {TABLE_FAMILY} {self.table}",
+            f"delete table {TABLE_FAMILY} {self.table}",
+            f"table {TABLE_FAMILY} {self.table} {{",
+        ]
+        for nft_set in self.sets.values():
+            lines += [
+                f"\tset {nft_set.name} {{",
+                f"\t\ttype {_ADDRESS_TYPES[nft_set.family][0]}",
+                "\t\tflags interval",
+                "\t\telements = {",
+                ",\n".join(f"\t\t\t{element}" for element in nft_set.elements),
+                "\t\t}",
+                "\t}",
+            ]
+        for hook in (HOOK_OUT, HOOK_IN):
+            rules = [rule for rule in self.rules if rule.hook == hook]
+            if not rules:
+                continue
+            lines += [
+                f"\tchain {hook} {{",
+                f"\t\ttype filter hook {hook} priority {HOOK_PRIORITY[hook]}; policy accept;",
+            ]
+            if hook == HOOK_OUT:
+                lines.append(f"\t\tmeta mark & {DESYNC_MARK:#x} == {DESYNC_MARK:#x} return")
+            lines += [f"\t\t{rule.render(self.qnum, self.sets, counter)}" for rule in rules]
+            lines.append("\t}")
+        lines.append("}")
+        return "\n".join(lines) + "\n"
+
+    def queued(self, hook: str, protocol: str, family: int, address: int, port: int, packet: int) -> bool:
+        """Попадет ли пакет в очередь. address и port — удаленной стороны, packet — номер в направлении."""
+        for rule in self.rules:
+            if rule.hook != hook or rule.protocol != protocol:
+                continue
+            if not rule.packets[0] <= packet <= rule.packets[1]:
+                continue
+            if rule.family is not None and rule.family != family:
+                continue
+            if not ports_contain(rule.ports, port):
+                continue
+            if rule.set_name is not None and not self.sets[rule.set_name].contains(address):
+                continue
+            return True
+        return False
+
+
+def render_ports(ranges: PortRanges) -> str:
+    return "{ " + ", ".join(str(s) if s == e else f"{s}-{e}" for s, e in ranges) + " }"
+
+
+def subtract_ports(a: PortRanges, b: PortRanges) -> PortRanges:
+    """Порты из a, не входящие в b (оба отсортированы и слиты)."""
+    result: list[tuple[int, int]] = []
+    for start, end in a:
+        for b_start, b_end in b:
+            if b_end < start or b_start > end:
+                continue
+            if b_start > start:
+                result.append((start, b_start - 1))
+            start = b_end + 1
+            if start > end:
+                break
+        if start <= end:
+            result.append((start, end))
+    return tuple(result)
+
+
+def _families(profile: Profile) -> tuple[int, ...]:
+    values = profile.global_values("--wf-l3")
+    if not values:
+        return (4, 6)
+    families: set[int] = set()
+    for value in ",".join(values).split(","):
+        family = L3_FAMILIES.get(value.strip().lower())
+        if family is None:
+            raise ValueError(f"Unsupported --wf-l3 value '{value}'")
+        families.add(family)
+    return tuple(sorted(families))
+
+
+def _set_base(paths: tuple[str, ...]) -> str:
+    stems = (os.path.splitext(os.path.basename(path))[0] for path in paths)
+    base = "_".join(re.sub(r"[^A-Za-z0-9]+", "_", stem).strip("_") for stem in stems) or "ipset"
+    return base if base[0].isalpha() else f"set_{base}"
+
+
+def _section_sets(
+    paths: tuple[str, ...],
+    families: tuple[int, ...],
+    sets: dict[str, NftSet],
+    ipsets: dict[tuple[str, ...], AggregateResult],
+) -> list[str]:
+    """Имена множеств для секции (по одному на семейство); пусто, если ipset пуст."""
+    result = ipsets.get(paths)
+    if result is None:
+        result = ipsets[paths] = aggregate(chain.from_iterable(iter_ipset_file(p) for p in paths))
+    names: list[str] = []
+    for family in families:
+        cidrs = result.cidrs[family]
+        if not cidrs:
+            continue
+        existing = next(
+            (s.name for s in sets.values() if s.paths == paths and s.family == family), None
+        )
+        if existing is not None:
+            names.append(existing)
+            continue
+        base, n = f"{_set_base(paths)}_v{family}", 1
+        name = base
+        while name in sets:
+            n += 1
+            name = f"{base}_{n}"
+        bits = 32 if family == 4 else 128
+        intervals = tuple(merge_intervals((s, s + (1 << (bits - p)) - 1) for s, p in cidrs))
+        elements = tuple(
+            line for line in result.lines() if (":" in line) == (family == 6)
+        )
+        sets[name] = NftSet(
+            name, family, elements, intervals, paths, tuple(s for s, _ in intervals)
+        )
+        names.append(name)
+    return names
+
+
+def build_ruleset(
+    profile: Profile,
+    base_dir: str,
+    prefilter: bool = True,
+    qnum: int = DEFAULT_QNUM,
+    ipsets: Optional[dict[tuple[str, ...], AggregateResult]] = None,
+) -> Ruleset:
+    """Переводит профиль в правила nftables.
+
+    prefilter=False дает правила только по портам (как фильтр WinDivert).
+    ipsets — кэш сжатых ipset по путям файлов, общий для нескольких вызовов.
+    """
+    if any(key == "--wf-raw" for key, _ in profile.global_options):
+        raise ValueError("--wf-raw has no nftables equivalent")
+    families = _families(profile)
+    ipsets = {} if ipsets is None else ipsets
+    sets: dict[str, NftSet] = {}
+    port_only: dict[str, list[tuple[int, int]]] = {"tcp": [], "udp": []}
+    by_set: dict[tuple[str, str], list[tuple[int, int]]] = {}
+    for section in profile.sections:
+        ports = section_ports(profile, section)
+        names: list[str] = []
+        if prefilter and section.ipsets:
+            paths = tuple(resolve_path(base_dir, path) for path in section.ipsets)
+            names = _section_sets(paths, families, sets, ipsets)
+        for protocol, ranges in ports.items():
+            if not ranges:
+                continue
+            if names:
+                for name in names:
+                    by_set.setdefault((protocol, name), []).extend(ranges)
+            else:
+                port_only[protocol].extend(ranges)
+
+    family = families[0] if len(families) == 1 else None
+    outbound: list[NftRule] = []
+    merged = {protocol: tuple(merge_intervals(r)) for protocol, r in port_only.items()}
+    for protocol, ranges in merged.items():
+        if ranges:
+            outbound.append(NftRule(HOOK_OUT, protocol, ranges, PACKETS_OUT, family))
+    for (protocol, name), ranges in sorted(by_set.items()):
+        ranges = subtract_ports(tuple(merge_intervals(ranges)), merged[protocol])
+        if ranges:
+            outbound.append(
+                NftRule(HOOK_OUT, protocol, ranges, PACKETS_OUT, sets[name].family, name)
+            )
+    inbound = [
+        NftRule(HOOK_IN, rule.protocol, rule.ports, TCP_PACKETS_IN, rule.family, rule.set_name)
+        for rule in outbound
+        if rule.protocol == "tcp"
+    ]
+    used = {rule.set_name for rule in outbound}
+    return Ruleset(
+        profile.name,
+        {name: nft_set for name, nft_set in sets.items() if name in used},
+        tuple(outbound + inbound),
+        qnum,
+    )
+
+
+def clear_script(table: str = TABLE_NAME) -> str:
+    return f"table {TABLE_FAMILY} {table}\ndelete table {TABLE_FAMILY} {table}\n"
+
+
+class NftFirewall:
+    """Применение таблицы через nft с откатом к предыдущему состоянию."""
+
+    def __init__(self, executable: str = "nft", table: str = TABLE_NAME):
+        self.executable: str = executable
+        self.table: str = table
+        self._previous: Optional[str] = None
+
+    def _nft(self, *args: str, script: Optional[str] = None) -> str:
+        try:
+            completed = subprocess.run(
+                [self.executable, *args],
+                input=script,
+                capture_output=True,
+                text=True,
+                check=False,
+            )
+        except OSError as e:
+            raise RuntimeError(f"{self.executable}: {e}") from e
+        if completed.returncode != 0:
+            raise RuntimeError(completed.stderr.strip() or f"nft exited with {completed.returncode}")
+        return completed.stdout
+
+    def snapshot(self) -> Optional[str]:
+        """Текущая таблица в виде текста для nft -f или None, если ее нет."""
+        try:
+            listing = self._nft("list", "table", TABLE_FAMILY, self.table)
+        except RuntimeError:
+            return None
+        return clear_script(self.table) + listing
+
+    def check(self, script: str) -> None:
+        self._nft("-c", "-f", "-", script=script)
+
+    def apply(self, script: str) -> None:
+        """Проверяет и атомарно применяет таблицу; прежняя сохраняется для rollback."""
+        self.check(script)
+        previous = self.snapshot()
+        self._nft("-f", "-", script=script)
+        self._previous = previous
+
+    def rollback(self) -> None:
+        """Возвращает таблицу, которая была до последнего apply (или удаляет ее)."""
+        previous, self._previous = self._previous, None
+        self._nft("-f", "-", script=previous or clear_script(self.table))
+
+    def clear(self) -> None:
+        self._previous = None
+        self._nft("-f", "-", script=clear_script(self.table))
+
+
+# --- Эталонные файлы
+
+
+def golden_path(golden_dir: str, name: str) -> str:
+    return os.path.join(golden_dir, re.sub(r"[^A-Za-z0-9._-]+", "_", name) + GOLDEN_SUFFIX)
+
+
+def check_golden(golden_dir: str, update: bool = False) -> list[str]:
+    """Сверяет правила профилей из golden_dir/commands.json с эталонами; возвращает расхождения."""
+    commands_path = os.path.join(golden_dir, "commands.json")
+    ipsets: dict[tuple[str, ...], AggregateResult] = {}
+    mismatched: list[str] = []
+    for name, profile in load_profiles(commands_path).items():
+        path = golden_path(golden_dir, name)
+        rendered = build_ruleset(profile, golden_dir, ipsets=ipsets).render()
+        if update:
+            with open(path, "w", encoding="utf-8", newline="\n") as f:
+                f.write(rendered)
+            continue
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                expected = f.read()
+        except OSError:
+            expected = ""
+        if rendered != expected:
+            mismatched.append(name)
+            sys.stdout.writelines(
+                difflib.unified_diff(
+                    expected.splitlines(True), rendered.splitlines(True), path, f"{name} (rendered)"
+                )
+            )
+    return mismatched
+
+
+# --- Оценка нагрузки на очередь
+
+_TCP_SYN: Final[int] = 0x02
+_TCP_ACK: Final[int] = 0x10
+BENCH_TABLE: Final[str] = "zapret_bench"
+BENCH_PORT: Final[int] = 50010
+
+Packet = tuple[str, str, int, int, int, int]
+
+
+def capture_packets(path: str) -> Counter[Packet]:
+    """Пакеты захвата как (хук, протокол, семейство, адрес, порт удаленной стороны, номер в направлении).
+
+    Клиент потока определяется так же, как в traffic_sim; его пакеты
+    проходят postrouting, ответы — prerouting. Номер пакета ограничен
+    сверху, так что одинаковые по смыслу пакеты схлопываются в счетчике.
+    """
+    from src.core.traffic_sim import PROTO_TCP, PROTOCOL_NAMES, iter_packets, parse_frame
+
+    flows: dict[tuple, list] = {}
+    packets: Counter[Packet] = Counter()
+    with open(path, "rb", buffering=0) as f:
+        for _, linktype, frame, _ in iter_packets(f):
+            parsed = parse_frame(linktype, frame)
+            if parsed is None:
+                continue
+            protocol, src, dst, sport, dport, flags, _ = parsed
+            key = (protocol, src, sport, dst, dport) if (src, sport) < (dst, dport) else (protocol, dst, dport, src, sport)
+            flow = flows.get(key)
+            if flow is None:
+                if protocol == PROTO_TCP and flags & _TCP_SYN:
+                    client_is_src = not flags & _TCP_ACK
+                elif protocol == PROTO_TCP:
+                    client_is_src = sport > dport
+                else:
+                    client_is_src = not (sport < 1024 <= dport)
+                flow = flows[key] = [(src, sport) if client_is_src else (dst, dport), 0, 0]
+            if (src, sport) == flow[0]:
+                flow[1] += 1
+                hook, address, port, number = HOOK_OUT, dst, dport, flow[1]
+            else:
+                flow[2] += 1
+                hook, address, port, number = HOOK_IN, src, sport, flow[2]
+            packets[
+                (
+                    hook,
+                    PROTOCOL_NAMES[protocol],
+                    4 if len(address) == 4 else 6,
+                    int.from_bytes(address, "big"),
+                    port,
+                    min(number, _PACKETS_CAP),
+                )
+            ] += 1
+    return packets
+
+
+def queue_load(ruleset: Ruleset, packets: Counter[Packet]) -> int:
+    return sum(count for packet, count in packets.items() if ruleset.queued(*packet))
+
+
+def offline_bench(commands_path: str, capture: str, profiles: Optional[Iterable[str]] = None) -> list[tuple[str, int, int, int]]:
+    """(профиль, пакетов, в очереди без множеств, в очереди с множествами) по профилям."""
+    packets = capture_packets(capture)
+    total = sum(packets.values())
+    base_dir = os.path.dirname(os.path.abspath(commands_path))
+    ipsets: dict[tuple[str, ...], AggregateResult] = {}
+    rows: list[tuple[str, int, int, int]] = []
+    for name, profile in load_profiles(commands_path).items():
+        if profiles and name not in profiles:
+            continue
+        port_only = build_ruleset(profile, base_dir, prefilter=False)
+        prefiltered = build_ruleset(profile, base_dir, ipsets=ipsets)
+        rows.append((name, total, queue_load(port_only, packets), queue_load(prefiltered, packets)))
+    return rows
+
+
+def _live_rulesets(rng: random.Random, subnets: int) -> tuple[Ruleset, Ruleset]:
+    """Правила для loopback: UDP на BENCH_PORT без множества и с множеством подсетей 127/8."""
+    starts = sorted({127 << 24 | rng.randrange(1, 1 << 16) << 8 for _ in range(subnets)})
+    intervals = tuple((start, start + 255) for start in starts)
+    elements = tuple(f"{socket.inet_ntoa(start.to_bytes(4, 'big'))}/24" for start in starts)
+    bench_set = NftSet("bench_v4", 4, elements, intervals, (), tuple(starts))
+    ports = ((BENCH_PORT, BENCH_PORT),)
+    port_only = Ruleset("bench: port only", {}, (NftRule(HOOK_OUT, "udp", ports, PACKETS_OUT, 4),), table=BENCH_TABLE)
+    prefiltered = Ruleset(
+        "bench: prefiltered",
+        {bench_set.name: bench_set},
+        (NftRule(HOOK_OUT, "udp", ports, PACKETS_OUT, 4, bench_set.name),),
+        table=BENCH_TABLE,
+    )
+    return port_only, prefiltered
+
+
+def live_bench(flows: int, packets: int, share: float, seed: int = 0) -> Optional[list[tuple[str, int, int, int, float]]]:
+    """Шлет UDP-потоки на адреса 127/8 через правила с очередью и сверяет счетчики ядра с моделью.
+
+    Возвращает (правила, пакетов, в очереди по модели, в очереди по ядру,
+    время отправки) или None, если nft или права root недоступны.
+    Очередь никто не слушает, bypass пропускает пакеты дальше.
+    """
+    nft = shutil.which("nft")
+    if nft is None or not hasattr(os, "geteuid") or os.geteuid() != 0:
+        return None
+    rng = random.Random(seed)
+    port_only, prefiltered = _live_rulesets(rng, 256)
+    in_set = list(prefiltered.sets["bench_v4"].intervals)
+    targets: list[int] = []
+    for _ in range(flows):
+        if rng.random() < share:
+            start, end = rng.choice(in_set)
+            targets.append(rng.randint(start + 1, end - 1))
+        else:
+            while True:
+                address = 127 << 24 | rng.randrange(1, 1 << 24)
+                if not prefiltered.sets["bench_v4"].contains(address):
+                    break
+            targets.append(address)
+
+    firewall = NftFirewall(nft, BENCH_TABLE)
+    payload = bytes(64)
+    rows: list[tuple[str, int, int, int, float]] = []
+    for ruleset in (port_only, prefiltered):
+        expected = sum(
+            ruleset.queued(HOOK_OUT, "udp", 4, address, BENCH_PORT, min(n, _PACKETS_CAP))
+            for address in targets
+            for n in range(1, packets + 1)
+        )
+        firewall.apply(ruleset.render(counter=True))
+        try:
+            started = time.perf_counter()
+            for address in targets:
+                with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                    target = (socket.inet_ntoa(address.to_bytes(4, "big")), BENCH_PORT)
+                    for _ in range(packets):
+                        sock.sendto(payload, target)
+            elapsed = time.perf_counter() - started
+            listing = firewall._nft("list", "chain", TABLE_FAMILY, BENCH_TABLE, HOOK_OUT)
+            counted = sum(int(n) for n in re.findall(r"counter packets (\d+)", listing))
+        finally:
+            firewall.clear()
+        rows.append((ruleset.profile, len(targets) * packets, expected, counted, elapsed))
+    return rows
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    from src.core.traffic_sim import CaptureError, write_synthetic
+    from src.scripts.commands import COMMANDS_PATH
+
+    parser = argparse.ArgumentParser(description="Translate profiles into nftables rules for nfqws.")
+    parser.add_argument("--commands", default=COMMANDS_PATH)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    render = subparsers.add_parser("render", help="Print the ruleset of a profile")
+    render.add_argument("profile")
+    render.add_argument("--no-prefilter", action="store_true", help="Match ports only, without ipset sets")
+    render.add_argument("--qnum", type=int, default=DEFAULT_QNUM)
+    check = subparsers.add_parser("check", help="Compare generated rulesets with golden files")
+    check.add_argument("--golden-dir", default=GOLDEN_DIR)
+    check.add_argument("--update", action="store_true", help="Rewrite the golden files")
+    bench = subparsers.add_parser("bench", help="Queue load with and without set prefiltering")
+    bench.add_argument("--capture", help="pcap/pcapng capture (default: synthetic)")
+    bench.add_argument("--packets", type=int, default=200000)
+    bench.add_argument("--profile", action="append", dest="profiles")
+    bench.add_argument("--live", action="store_true", help="Also measure on loopback (root and nft required)")
+    bench.add_argument("--flows", type=int, default=2000)
+    bench.add_argument("--flow-packets", type=int, default=20)
+    bench.add_argument("--in-set", type=float, default=0.3, help="Share of loopback flows to set addresses")
+    args = parser.parse_args(argv)
+
+    if args.command == "render":
+        profiles = load_profiles(args.commands)
+        if args.profile not in profiles:
+            parser.error(f"unknown profile: {args.profile}")
+        base_dir = os.path.dirname(os.path.abspath(args.commands))
+        ruleset = build_ruleset(profiles[args.profile], base_dir, not args.no_prefilter, args.qnum)
+        sys.stdout.write(ruleset.render())
+        return 0
+
+    if args.command == "check":
+        mismatched = check_golden(args.golden_dir, args.update)
+        if args.update:
+            print(f"# golden files updated in {args.golden_dir}")
+            return 0
+        # Профили приложения тоже должны переводиться без ошибок.
+        base_dir = os.path.dirname(os.path.abspath(args.commands))
+        ipsets: dict[tuple[str, ...], AggregateResult] = {}
+        for profile in load_profiles(args.commands).values():
+            ruleset = build_ruleset(profile, base_dir, ipsets=ipsets)
+            print(f"{profile.name}\t{len(ruleset.sets)} sets\t{len(ruleset.rules)} rules")
+        nft = shutil.which("nft")
+        if nft is not None and hasattr(os, "geteuid") and os.geteuid() == 0:
+            firewall = NftFirewall(nft)
+            for name in sorted(os.listdir(args.golden_dir)):
+                if name.endswith(GOLDEN_SUFFIX):
+                    with open(os.path.join(args.golden_dir, name), "r", encoding="utf-8") as f:
+                        firewall.check(f.read())
+            print("# golden files accepted by nft -c")
+        else:
+            print("# nft is unavailable (or not root): syntax not checked")
+        if mismatched:
+            print(f"FAIL: rulesets differ from golden files: {', '.join(mismatched)}", file=sys.stderr)
+            return 1
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        capture = args.capture
+        if capture is None:
+            capture = os.path.join(tmp, "bench.pcap")
+            write_synthetic(capture, args.commands, args.packets)
+        started = time.perf_counter()
+        try:
+            rows = offline_bench(args.commands, capture, args.profiles)
+        except CaptureError as e:
+            print(f"Error: {capture}: {e}", file=sys.stderr)
+            return 1
+        elapsed = time.perf_counter() - started
+    print("profile\tpackets\tport_only\tprefiltered\tport_only_pct\tprefiltered_pct")
+    for name, total, port_only, prefiltered in rows:
+        print(
+            f"{name}\t{total}\t{port_only}\t{prefiltered}\t"
+            f"{port_only * 100 / max(total, 1):.2f}\t{prefiltered * 100 / max(total, 1):.2f}"
+        )
+    print(f"# evaluated in {elapsed:.2f} s")
+    if not args.live:
+        return 0
+
+    live = live_bench(args.flows, args.flow_packets, args.in_set)
+    if live is None:
+        print("# live bench skipped: nft and root are required")
+        return 0
+    print("rules\tpackets\tqueued_model\tqueued_kernel\tsend_ms")
+    failed = False
+    for name, total, expected, counted, seconds in live:
+        print(f"{name}\t{total}\t{expected}\t{counted}\t{seconds * 1000:.1f}")
+        failed = failed or expected != counted
+    if failed:
+        print("FAIL: kernel counters differ from the rule model", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+import contextlib
+import os
+import sys
+import tempfile
+from typing import Final, Iterator
+
+
+# Переопределяет каталог данных: бенчмарки не трогают файлы работающего экземпляра.
+DATA_DIR_ENV: Final[str] = "ZAPRET_DATA_DIR"
+
+
+def data_dir() -> str:
+    """Каталог для кэшей и служебных файлов приложения (создается при первом вызове)."""
+    if os.environ.get(DATA_DIR_ENV):
+        path = os.environ[DATA_DIR_ENV]
+    elif sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        path = os.path.join(base, "Zapret")
+    else:
+        path = os.path.join(os.path.expanduser("~"), ".zapret")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+@contextlib.contextmanager
+def isolated_data_dir() -> Iterator[str]:
+    """Временный каталог данных на время блока (для бенчмарков на заглушке).
+
+    Иначе файл блокировки с PID заглушек, манифест проверки и ключ канала
+    управления перезаписали бы файлы работающего экземпляра. ZapretRunner
+    запоминает пути при создании, поэтому создавать его нужно внутри блока.
+    """
+    previous = os.environ.get(DATA_DIR_ENV)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ[DATA_DIR_ENV] = tmp
+        try:
+            yield tmp
+        finally:
+            if previous is None:
+                os.environ.pop(DATA_DIR_ENV, None)
+            else:
+                os.environ[DATA_DIR_ENV] = previous
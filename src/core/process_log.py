@@ -0,0 +1,223 @@
+import argparse
+import logging
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from logging.handlers import RotatingFileHandler
+from typing import IO, Callable, Final, Optional
+
+
+DEFAULT_CAPACITY: Final[int] = 2000
+MAX_LINE_BYTES: Final[int] = 4096
+SEVERITY_ERROR: Final[str] = "ERROR"
+SEVERITY_WARNING: Final[str] = "WARNING"
+SEVERITY_INFO: Final[str] = "INFO"
+_ERROR_MARKERS: Final[tuple[str, ...]] = ("error", "fail", "cannot", "could not")
+_WARNING_MARKERS: Final[tuple[str, ...]] = ("warning", "warn:")
+_LEVELS: Final[dict[str, int]] = {
+    SEVERITY_ERROR: logging.ERROR,
+    SEVERITY_WARNING: logging.WARNING,
+    SEVERITY_INFO: logging.INFO,
+}
+
+
+@dataclass(frozen=True)
+class LogLine:
+    timestamp: float
+    severity: str
+    text: str
+
+
+def classify(text: str) -> str:
+    lowered = text.lower()
+    if any(marker in lowered for marker in _ERROR_MARKERS):
+        return SEVERITY_ERROR
+    if any(marker in lowered for marker in _WARNING_MARKERS):
+        return SEVERITY_WARNING
+    return SEVERITY_INFO
+
+
+class LogBuffer:
+    """Кольцевой буфер строк вывода winws фиксированного размера.
+
+    Подписчики (например, панель лога в интерфейсе) получают каждую новую
+    строку из потока чтения. Дополнительно строки можно писать в файл с
+    ротацией.
+    """
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_CAPACITY,
+        log_path: Optional[str] = None,
+        max_bytes: int = 1 << 20,
+        backup_count: int = 3,
+    ):
+        self._lines: deque[LogLine] = deque(maxlen=capacity)
+        self._lock: threading.Lock = threading.Lock()
+        self._subscribers: list[Callable[[LogLine], None]] = []
+        self._logger: Optional[logging.Logger] = None
+        if log_path:
+            self._logger = logging.getLogger(f"zapret.winws.{id(self)}")
+            self._logger.propagate = False
+            self._logger.setLevel(logging.INFO)
+            handler = RotatingFileHandler(
+                log_path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+            )
+            handler.setFormatter(
+                logging.Formatter("%(asctime)s %(levelname)s %(message)s")
+            )
+            self._logger.addHandler(handler)
+
+    @property
+    def capacity(self) -> int:
+        return self._lines.maxlen or 0
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    def append(self, text: str) -> LogLine:
+        line = LogLine(time.time(), classify(text), text)
+        with self._lock:
+            self._lines.append(line)
+            subscribers = tuple(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(line)
+            except Exception:
+                pass
+        if self._logger:
+            self._logger.log(_LEVELS[line.severity], text)
+        return line
+
+    def snapshot(self) -> list[LogLine]:
+        with self._lock:
+            return list(self._lines)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._lines.clear()
+
+    def subscribe(self, callback: Callable[[LogLine], None]) -> Callable[[], None]:
+        """Подписывает callback на новые строки; возвращает функцию отписки."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe() -> None:
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+
+        return unsubscribe
+
+
+class StderrReader(threading.Thread):
+    """Постоянно вычитывает stderr процесса, чтобы winws не блокировался на записи."""
+
+    def __init__(self, stream: IO[bytes], buffer: LogBuffer):
+        super().__init__(name="zapret-stderr", daemon=True)
+        self._stream: IO[bytes] = stream
+        self._buffer: LogBuffer = buffer
+
+    def run(self) -> None:
+        try:
+            while True:
+                raw = self._stream.readline(MAX_LINE_BYTES)
+                if not raw:
+                    break
+                text = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+                if text:
+                    self._buffer.append(text)
+        except (OSError, ValueError):
+            pass
+        finally:
+            try:
+                self._stream.close()
+            except OSError:
+                pass
+
+
+_FLOOD_STUB: Final[str] = """
+import sys, time
+total, line = int(sys.argv[1]), b"warning: " + b"x" * 110 + b"\\n"
+worst, written, lines, started = 0.0, 0, 0, time.perf_counter()
+while written < total:
+    t = time.perf_counter()
+    sys.stderr.buffer.write(line)
+    sys.stderr.buffer.flush()
+    worst = max(worst, time.perf_counter() - t)
+    written += len(line)
+    lines += 1
+print(f"{time.perf_counter() - started:.6f} {worst:.6f} {lines}", flush=True)
+"""
+
+
+def stress(megabytes: int, capacity: int) -> dict[str, float]:
+    """Заливает stderr заглушки и проверяет, что ее запись не блокируется.
+
+    stderr читает только StderrReader; из stdout берутся итоги заглушки,
+    число записанных ею строк сверяется с числом прочитанных.
+    """
+    buffer = LogBuffer(capacity)
+    received = [0]
+
+    def count(line: LogLine) -> None:
+        received[0] += 1
+
+    buffer.subscribe(count)
+    process = subprocess.Popen(
+        [sys.executable, "-c", _FLOOD_STUB, str(megabytes << 20)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        stdin=subprocess.DEVNULL,
+    )
+    reader = StderrReader(process.stderr, buffer)
+    reader.start()
+    output = process.stdout.read()
+    process.stdout.close()
+    process.wait()
+    reader.join()
+    duration, worst_write, written = output.split()
+    return {
+        "megabytes": float(megabytes),
+        "stub_duration_s": float(duration),
+        "stub_max_write_ms": float(worst_write) * 1000,
+        "written_lines": float(written),
+        "read_lines": float(received[0]),
+        "buffered_lines": float(len(buffer)),
+        "buffer_capacity": float(buffer.capacity),
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="winws stderr buffer tools.")
+    subparsers = parser.add_subparsers(dest="action", required=True)
+    flood = subparsers.add_parser("stress", help="Flood stderr from a stub process")
+    flood.add_argument("--megabytes", type=int, default=64)
+    flood.add_argument("--capacity", type=int, default=DEFAULT_CAPACITY)
+    flood.add_argument("--max-write-ms", type=float, default=100.0)
+    args = parser.parse_args(argv)
+
+    result = stress(args.megabytes, args.capacity)
+    for name, value in result.items():
+        print(f"{name}\t{value:.3f}")
+    if result["read_lines"] != result["written_lines"]:
+        print(
+            f"FAIL: reader saw {result['read_lines']:.0f} of {result['written_lines']:.0f} lines",
+            file=sys.stderr,
+        )
+        return 1
+    if result["stub_max_write_ms"] > args.max_write_ms:
+        print(
+            f"FAIL: stub write blocked for {result['stub_max_write_ms']:.3f} ms "
+            f"(bound {args.max_write_ms} ms)",
+            file=sys.stderr,
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+import ctypes
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Final, Optional
+
+
+_PROCESS_TERMINATE: Final[int] = 0x0001
+_PROCESS_QUERY_LIMITED_INFORMATION: Final[int] = 0x1000
+_STILL_ACTIVE: Final[int] = 259
+_EXIT_POLL_INTERVAL: Final[float] = 0.02
+
+DETACHED_CREATION_FLAGS: Final[int] = (
+    subprocess.CREATE_NO_WINDOW
+    | subprocess.CREATE_NEW_PROCESS_GROUP
+    | subprocess.DETACHED_PROCESS
+    if sys.platform == "win32"
+    else 0
+)
+
+
+def pid_alive(pid: int) -> bool:
+    """Проверяет, существует ли процесс с указанным PID."""
+    if pid <= 0:
+        return False
+    if sys.platform == "win32":
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(_PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return False
+        try:
+            code = ctypes.c_uint32()
+            if not kernel32.GetExitCodeProcess(handle, ctypes.byref(code)):
+                return False
+            return code.value == _STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    # Зомби уже завершился, его только не забрал родитель.
+    return _linux_stat_field(pid, 0) != b"Z"
+
+
+def _linux_stat_field(pid: int, index: int) -> Optional[bytes]:
+    """Поле /proc/<pid>/stat после имени процесса (0 — состояние) или None."""
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    fields = stat[stat.rindex(b")") + 2 :].split()
+    return fields[index] if index < len(fields) else None
+
+
+def process_start_time(pid: int) -> Optional[int]:
+    """Момент запуска процесса в единицах ОС; вместе с PID однозначно задает процесс.
+
+    None, если процесс не найден или платформа не позволяет это узнать.
+    """
+    if sys.platform == "win32":
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(_PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return None
+        try:
+            times = [ctypes.c_uint64() for _ in range(4)]
+            if not kernel32.GetProcessTimes(handle, *(ctypes.byref(t) for t in times)):
+                return None
+            return times[0].value
+        finally:
+            kernel32.CloseHandle(handle)
+    starttime = _linux_stat_field(pid, 19)
+    return int(starttime) if starttime is not None else None
+
+
+def wait_pid_exit(pid: int, timeout: float) -> bool:
+    """Ждет завершения процесса не дольше timeout. True, если процесс завершился."""
+    deadline = time.monotonic() + timeout
+    while pid_alive(pid):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(_EXIT_POLL_INTERVAL)
+    return True
+
+
+def stop_pid(pid: int, graceful_timeout: float, kill_timeout: float) -> bool:
+    """Мягкая остановка, ожидание, затем принудительное завершение. True, если процесс вышел."""
+    try:
+        terminate_pid(pid)
+    except OSError:
+        return not pid_alive(pid)
+    if wait_pid_exit(pid, graceful_timeout):
+        return True
+    try:
+        terminate_pid(pid, force=True)
+    except OSError:
+        pass
+    return wait_pid_exit(pid, kill_timeout)
+
+
+def terminate_pid(pid: int, force: bool = False) -> None:
+    """Завершает процесс по PID (на Windows всегда принудительно)."""
+    if sys.platform == "win32":
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(_PROCESS_TERMINATE, False, pid)
+        if not handle:
+            raise ctypes.WinError()
+        try:
+            if not kernel32.TerminateProcess(handle, 1):
+                raise ctypes.WinError()
+        finally:
+            kernel32.CloseHandle(handle)
+        return
+    os.kill(pid, signal.SIGKILL if force else signal.SIGTERM)
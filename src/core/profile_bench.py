@@ -0,0 +1,346 @@
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import ssl
+import statistics
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Final, Optional
+from urllib.parse import urlsplit
+
+from src.core.backends import WinwsBackend
+from src.core.paths import data_dir, isolated_data_dir
+from src.core.winws_stub import stub_launcher
+from src.scripts.commands import WINWS_EXE_PATH, ZapretRunner
+
+
+DEFAULT_TARGETS: Final[tuple[str, ...]] = (
+    "https://discord.com/",
+    "https://www.youtube.com/",
+)
+DEFAULT_CACHE_PATH: Final[str] = "profile_bench.json"
+READ_CHUNK: Final[int] = 65536
+
+
+@dataclass
+class ProbeResult:
+    target: str
+    ok: bool = False
+    connect_ms: Optional[float] = None
+    tls_ms: Optional[float] = None
+    throughput_kbps: Optional[float] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class ProfileResult:
+    name: str
+    key: str
+    probes: list[ProbeResult] = field(default_factory=list)
+
+    @property
+    def successes(self) -> int:
+        return sum(probe.ok for probe in self.probes)
+
+    def median(self, attribute: str) -> Optional[float]:
+        values = [getattr(p, attribute) for p in self.probes if getattr(p, attribute) is not None]
+        return statistics.median(values) if values else None
+
+    def rank_key(self) -> tuple:
+        tls = self.median("tls_ms")
+        throughput = self.median("throughput_kbps")
+        return (
+            -self.successes,
+            tls if tls is not None else float("inf"),
+            -(throughput or 0.0),
+        )
+
+
+def _ssl_context(insecure: bool) -> ssl.SSLContext:
+    context = ssl.create_default_context()
+    if insecure:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+async def _close(writer: asyncio.StreamWriter) -> None:
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except (OSError, ssl.SSLError):
+        pass
+
+
+async def probe_target(
+    url: str, context: ssl.SSLContext, timeout: float, max_bytes: int
+) -> ProbeResult:
+    """Замеряет TCP connect, TLS handshake и скорость загрузки одного адреса."""
+    result = ProbeResult(url)
+    parts = urlsplit(url)
+    host = parts.hostname or ""
+    use_tls = parts.scheme == "https"
+    port = parts.port or (443 if use_tls else 80)
+    path = parts.path or "/"
+
+    try:
+        started = time.perf_counter()
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        result.connect_ms = (time.perf_counter() - started) * 1000
+        await _close(writer)
+
+        started = time.perf_counter()
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(
+                host,
+                port,
+                ssl=context if use_tls else None,
+                server_hostname=host if use_tls else None,
+            ),
+            timeout,
+        )
+        if use_tls:
+            result.tls_ms = max(
+                (time.perf_counter() - started) * 1000 - result.connect_ms, 0.0
+            )
+
+        request = (
+            f"GET {path} HTTP/1.1\r\nHost: {host}\r\n"
+            f"User-Agent: zapret-bench\r\nConnection: close\r\n\r\n"
+        )
+        started = time.perf_counter()
+        writer.write(request.encode("ascii"))
+        await writer.drain()
+        received = 0
+        while received < max_bytes:
+            chunk = await asyncio.wait_for(reader.read(READ_CHUNK), timeout)
+            if not chunk:
+                break
+            received += len(chunk)
+        elapsed = time.perf_counter() - started
+        await _close(writer)
+
+        if received:
+            result.throughput_kbps = received / 1024 / max(elapsed, 1e-9)
+        result.ok = received > 0
+    except (OSError, ssl.SSLError, asyncio.TimeoutError) as e:
+        result.error = f"{type(e).__name__}: {e}"
+    return result
+
+
+async def probe_all(
+    targets: list[str],
+    context: ssl.SSLContext,
+    timeout: float,
+    max_bytes: int,
+    concurrency: int,
+) -> list[ProbeResult]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(url: str) -> ProbeResult:
+        async with semaphore:
+            return await probe_target(url, context, timeout, max_bytes)
+
+    return list(await asyncio.gather(*(limited(url) for url in targets)))
+
+
+def cache_key(
+    args: str,
+    targets: list[str],
+    max_bytes: int,
+    launcher: tuple[str, ...] = (),
+    backend: str = "",
+) -> str:
+    """Ключ кэша: замеры заглушки или другого бэкенда не выдаются за замеры winws."""
+    payload = json.dumps(
+        [args, sorted(targets), max_bytes, list(launcher), backend], ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def load_cache(path: str) -> dict[str, dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(path: str, cache: dict[str, dict]) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def benchmark_profiles(
+    runner: ZapretRunner,
+    targets: list[str],
+    *,
+    profiles: Optional[list[str]] = None,
+    cache_path: Optional[str] = DEFAULT_CACHE_PATH,
+    settle: float = 1.0,
+    timeout: float = 5.0,
+    max_bytes: int = 1 << 20,
+    concurrency: int = 8,
+    insecure: bool = False,
+) -> list[ProfileResult]:
+    """Поочередно запускает профили и ранжирует их по результатам замеров.
+
+    Профили, у которых не изменились аргументы и набор целей, берутся из кэша
+    без повторного запуска winws.
+    """
+    if cache_path and not os.path.isabs(cache_path):
+        cache_path = os.path.join(data_dir(), cache_path)
+    cache = load_cache(cache_path) if cache_path else {}
+    context = _ssl_context(insecure)
+    results: list[ProfileResult] = []
+
+    for name in profiles or list(runner.registry):
+        key = cache_key(
+            runner.registry.get(name).args,
+            targets,
+            max_bytes,
+            runner.registry.launcher,
+            runner.backend.name,
+        )
+        cached = cache.get(name)
+        if cached and cached.get("key") == key:
+            probes = [ProbeResult(**probe) for probe in cached["probes"]]
+            results.append(ProfileResult(name, key, probes))
+            continue
+
+        runner.run(name)
+        try:
+            time.sleep(settle)
+            probes = asyncio.run(
+                probe_all(targets, context, timeout, max_bytes, concurrency)
+            )
+        finally:
+            runner.terminate()
+
+        results.append(ProfileResult(name, key, probes))
+        cache[name] = {"key": key, "probes": [asdict(probe) for probe in probes]}
+        if cache_path:
+            save_cache(cache_path, cache)
+
+    results.sort(key=ProfileResult.rank_key)
+    return results
+
+
+def format_report(results: list[ProfileResult]) -> str:
+    def fmt(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value:.1f}"
+
+    lines = ["rank\tprofile\tok\tconnect_ms\ttls_ms\tkbps"]
+    for rank, result in enumerate(results, start=1):
+        lines.append(
+            f"{rank}\t{result.name}\t{result.successes}/{len(result.probes)}\t"
+            f"{fmt(result.median('connect_ms'))}\t{fmt(result.median('tls_ms'))}\t"
+            f"{fmt(result.median('throughput_kbps'))}"
+        )
+    return "\n".join(lines)
+
+
+async def serve_standin(
+    host: str, port: int, size: int, certfile: Optional[str], keyfile: Optional[str]
+) -> None:
+    """Локальный HTTP(S)-сервер, отдающий тело заданного размера на любой GET."""
+    context = None
+    if certfile:
+        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        context.load_cert_chain(certfile, keyfile)
+    body = b"\0" * size
+    header = (
+        f"HTTP/1.1 200 OK\r\nContent-Length: {size}\r\n"
+        f"Content-Type: application/octet-stream\r\nConnection: close\r\n\r\n"
+    ).encode("ascii")
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            writer.write(header)
+            writer.write(body)
+            await writer.drain()
+        except (OSError, asyncio.IncompleteReadError, ssl.SSLError):
+            pass
+        finally:
+            await _close(writer)
+
+    server = await asyncio.start_server(handle, host, port, ssl=context)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Rank commands.json profiles by measured latency and throughput."
+    )
+    subparsers = parser.add_subparsers(dest="action", required=True)
+
+    run = subparsers.add_parser("run", help="Benchmark profiles")
+    run.add_argument("--target", action="append", dest="targets", help="URL to probe")
+    run.add_argument("--targets-file", help="File with one URL per line")
+    run.add_argument("--profile", action="append", dest="profiles")
+    run.add_argument("--cache", default=DEFAULT_CACHE_PATH)
+    run.add_argument("--no-cache", action="store_true")
+    run.add_argument("--settle", type=float, default=1.0)
+    run.add_argument("--timeout", type=float, default=5.0)
+    run.add_argument("--max-bytes", type=int, default=1 << 20)
+    run.add_argument("--concurrency", type=int, default=8)
+    run.add_argument("--insecure", action="store_true", help="Skip certificate checks")
+    run.add_argument(
+        "--stub", action="store_true", help="Launch a no-op stub instead of winws"
+    )
+
+    serve = subparsers.add_parser("serve", help="Local stand-in HTTP(S) server")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8443)
+    serve.add_argument("--size", type=int, default=1 << 20)
+    serve.add_argument("--certfile")
+    serve.add_argument("--keyfile")
+    args = parser.parse_args(argv)
+
+    if args.action == "serve":
+        try:
+            asyncio.run(
+                serve_standin(args.host, args.port, args.size, args.certfile, args.keyfile)
+            )
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    targets = list(args.targets or [])
+    if args.targets_file:
+        with open(args.targets_file, "r", encoding="utf-8") as f:
+            targets.extend(line.strip() for line in f if line.strip())
+    targets = targets or list(DEFAULT_TARGETS)
+
+    # Заглушки пишут файл блокировки: при --stub каталог данных временный.
+    with isolated_data_dir() if args.stub else contextlib.nullcontext():
+        runner = ZapretRunner()
+        if args.stub:
+            runner.use_backend(WinwsBackend(WINWS_EXE_PATH))
+            runner.registry.set_launcher(stub_launcher())
+        results = benchmark_profiles(
+            runner,
+            targets,
+            profiles=args.profiles,
+            cache_path=None if args.no_cache else args.cache,
+            settle=args.settle,
+            timeout=args.timeout,
+            max_bytes=args.max_bytes,
+            concurrency=args.concurrency,
+            insecure=args.insecure,
+        )
+    print(format_report(results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,348 @@
+"""Оптимизатор аргументов профилей winws.
+
+Работает на модели из src.core.profiles (глобальные опции и секции) и
+выполняет эквивалентные преобразования:
+
+* сливает пересекающиеся и смежные диапазоны портов в фильтрах;
+* удаляет секции, которые никогда не сработают: без портов внутри
+  --wf-tcp/--wf-udp или перекрытые более ранней секцией с теми же (или
+  без) условиями отбора;
+* объединяет секции с одинаковыми действиями и условиями, если между
+  ними нет секции, перехватывающей те же порты;
+* сужает --wf-tcp/--wf-udp до портов, которые обрабатывает хоть одна
+  секция, уменьшая число пакетов, отправляемых WinDivert в winws.
+
+Результат проверяется: для каждого порта упорядоченный список
+срабатывающих секций (условия и действия) должен остаться прежним.
+"""
+
+import argparse
+import difflib
+import json
+import os
+import shlex
+import sys
+import tempfile
+from dataclasses import dataclass, field
+from typing import Final, Optional
+
+from src.core.lists import merge_intervals
+from src.core.profiles import (
+    SECTION_SEPARATOR,
+    Option,
+    PortRanges,
+    Profile,
+    Section,
+    format_ports,
+    is_file_option,
+    parse_ports,
+    parse_profile,
+)
+from src.core.sharding import WF_PORT_OPTIONS, intersect_ports, section_ports
+
+
+PORT_FILTERS: Final[dict[str, str]] = {"tcp": "--filter-tcp", "udp": "--filter-udp"}
+# Опции, от которых зависит выбор секции (кроме портов).
+SELECTION_OPTIONS: Final[frozenset[str]] = frozenset(
+    {
+        "--filter-l3",
+        "--filter-l7",
+        "--filter-ssid",
+        "--hostlist",
+        "--hostlist-domains",
+        "--hostlist-exclude",
+        "--hostlist-exclude-domains",
+        "--hostlist-auto",
+        "--ipset",
+        "--ipset-ip",
+        "--ipset-exclude",
+        "--ipset-exclude-ip",
+    }
+)
+
+
+class OptimizationError(RuntimeError):
+    """Оптимизированный профиль обрабатывал бы трафик иначе, чем исходный."""
+
+
+@dataclass
+class _Rule:
+    """Секция в удобном для оптимизации виде."""
+
+    ports: dict[str, PortRanges]
+    conditions: tuple[Option, ...]
+    actions: tuple[Option, ...]
+    sources: list[int] = field(default_factory=list)
+    # Секция без --filter-tcp/--filter-udp: принимает оба протокола на всех портах wf.
+    unfiltered: bool = False
+
+
+@dataclass
+class OptimizeResult:
+    name: str
+    original: str
+    optimized: str
+    changes: list[str]
+    diverted_before: dict[str, int]
+    diverted_after: dict[str, int]
+
+    @property
+    def changed(self) -> bool:
+        return self.original != self.optimized
+
+    def diff(self) -> str:
+        def lines(args: str) -> list[str]:
+            return [
+                token + "\n"
+                for token in (_format_token(t) for t in shlex.split(args))
+            ]
+
+        return "".join(
+            difflib.unified_diff(
+                lines(self.original), lines(self.optimized), self.name, self.name + " (optimized)"
+            )
+        )
+
+
+def _count(ranges: PortRanges) -> int:
+    return sum(end - start + 1 for start, end in ranges)
+
+
+def _to_rule(profile: Profile, section: Section) -> _Rule:
+    conditions, actions = [], []
+    for key, value in section.options:
+        if key in PORT_FILTERS.values():
+            continue
+        (conditions if key in SELECTION_OPTIONS else actions).append((key, value))
+    return _Rule(
+        ports=section_ports(profile, section),
+        conditions=tuple(sorted(conditions, key=lambda o: (o[0], o[1] or ""))),
+        actions=tuple(actions),
+        sources=[section.index],
+        unfiltered=section.tcp_ports is None and section.udp_ports is None,
+    )
+
+
+def _covers(outer: PortRanges, inner: PortRanges) -> bool:
+    return intersect_ports(outer, inner) == tuple(merge_intervals(inner))
+
+
+def _shadows(earlier: _Rule, later: _Rule) -> bool:
+    if earlier.conditions and earlier.conditions != later.conditions:
+        return False
+    return all(_covers(earlier.ports[proto], later.ports[proto]) for proto in PORT_FILTERS)
+
+
+def _overlaps(a: _Rule, b: _Rule) -> bool:
+    return any(intersect_ports(a.ports[proto], b.ports[proto]) for proto in PORT_FILTERS)
+
+
+def _decision(rules: list[_Rule], protocol: str, port: int) -> list[tuple]:
+    """Упорядоченные (условия, действия) секций, которые могут обработать пакет."""
+    seen: set[tuple] = set()
+    decision = []
+    for rule in rules:
+        if not any(start <= port <= end for start, end in rule.ports[protocol]):
+            continue
+        if rule.conditions in seen:
+            continue
+        seen.add(rule.conditions)
+        decision.append((rule.conditions, rule.actions))
+        if not rule.conditions:
+            break
+    return decision
+
+
+def _breakpoints(rule_sets: list[list[_Rule]], protocol: str) -> list[int]:
+    points = {0}
+    for rules in rule_sets:
+        for rule in rules:
+            for start, end in rule.ports[protocol]:
+                points.add(start)
+                points.add(end + 1)
+    return sorted(p for p in points if p <= 65535)
+
+
+def equivalent(before: list[_Rule], after: list[_Rule]) -> bool:
+    """Совпадает ли решение для каждого порта (проверяется на границах диапазонов)."""
+    for protocol in PORT_FILTERS:
+        for port in _breakpoints([before, after], protocol):
+            if _decision(before, protocol, port) != _decision(after, protocol, port):
+                return False
+    return True
+
+
+def _format_token(token: str) -> str:
+    """Записывает аргумент так, как это принято в commands.json (пути в кавычках)."""
+    key, sep, value = token.partition("=")
+    if not sep:
+        return shlex.quote(token)
+    if is_file_option(key) and not any(c in value for c in '"\\$`'):
+        return f'{key}="{value}"'
+    return f"{key}={shlex.quote(value)}"
+
+
+def _render(global_options: list[Option], rules: list[_Rule]) -> str:
+    tokens: list[str] = []
+    for key, value in global_options:
+        tokens.append(key if value is None else f"{key}={value}")
+    for n, rule in enumerate(rules):
+        if n:
+            tokens.append(SECTION_SEPARATOR)
+        if not rule.unfiltered:
+            for proto, option in PORT_FILTERS.items():
+                if rule.ports[proto]:
+                    tokens.append(f"{option}={format_ports(rule.ports[proto])}")
+        for key, value in (*rule.conditions, *rule.actions):
+            tokens.append(key if value is None else f"{key}={value}")
+    return " ".join(_format_token(token) for token in tokens)
+
+
+def optimize(profile: Profile) -> OptimizeResult:
+    changes: list[str] = []
+    if any(key == "--wf-raw" for key, _ in profile.global_options):
+        return OptimizeResult(profile.name, profile.args, profile.args, [], {}, {})
+
+    original_rules = [_to_rule(profile, section) for section in profile.sections]
+    rules: list[_Rule] = []
+    for rule in original_rules:
+        if not (rule.ports["tcp"] or rule.ports["udp"]):
+            changes.append(f"drop section {rule.sources[0]}: no ports inside --wf-tcp/--wf-udp")
+            continue
+        shadow = next((r for r in rules if _shadows(r, rule)), None)
+        if shadow is not None:
+            changes.append(
+                f"drop section {rule.sources[0]}: shadowed by section {shadow.sources[0]}"
+            )
+            continue
+        target_index = next(
+            (
+                i
+                for i, r in enumerate(rules)
+                if r.actions == rule.actions
+                and r.conditions == rule.conditions
+                and not r.unfiltered
+                and not rule.unfiltered
+                and not any(_overlaps(between, rule) for between in rules[i + 1:])
+            ),
+            None,
+        )
+        if target_index is not None:
+            target = rules[target_index]
+            for proto in PORT_FILTERS:
+                target.ports[proto] = tuple(
+                    merge_intervals((*target.ports[proto], *rule.ports[proto]))
+                )
+            target.sources.extend(rule.sources)
+            changes.append(
+                f"merge section {rule.sources[0]} into section {target.sources[0]}"
+            )
+            continue
+        rules.append(
+            _Rule(dict(rule.ports), rule.conditions, rule.actions, list(rule.sources), rule.unfiltered)
+        )
+
+    kept = {index for rule in rules for index in rule.sources}
+    for section, rule in zip(profile.sections, original_rules):
+        if section.index not in kept:
+            continue
+        for proto, option in PORT_FILTERS.items():
+            raw = section.values(option)
+            if len(raw) > 1 or (raw and parse_ports(raw[0]) != rule.ports[proto]):
+                changes.append(
+                    f"section {section.index}: {option}={','.join(raw)} -> "
+                    f"{format_ports(rule.ports[proto]) or '(none)'}"
+                )
+
+    wf_before = {"tcp": profile.wf_tcp, "udp": profile.wf_udp}
+    wf_after = {
+        proto: tuple(merge_intervals(r for rule in rules for r in rule.ports[proto]))
+        for proto in PORT_FILTERS
+    }
+    global_options: list[Option] = [
+        (option, format_ports(wf_after[proto]))
+        for proto, option in WF_PORT_OPTIONS.items()
+        if wf_after[proto]
+    ]
+    global_options.extend(
+        (key, value)
+        for key, value in profile.global_options
+        if key not in WF_PORT_OPTIONS.values()
+    )
+    for proto, option in WF_PORT_OPTIONS.items():
+        raw = profile.global_values(option)
+        if wf_after[proto] != wf_before[proto] or len(raw) > 1:
+            changes.append(
+                f"{option}={','.join(raw) or '(none)'} -> {format_ports(wf_after[proto]) or '(none)'}"
+            )
+
+    if not changes:
+        optimized = profile.args
+    else:
+        optimized = _render(global_options, rules)
+        if not equivalent(original_rules, rules):
+            raise OptimizationError(f"Optimization of '{profile.name}' changed its behaviour")
+    return OptimizeResult(
+        profile.name,
+        profile.args,
+        optimized,
+        changes,
+        {proto: _count(ranges) for proto, ranges in wf_before.items()},
+        {proto: _count(ranges) for proto, ranges in wf_after.items()},
+    )
+
+
+def optimize_args(name: str, args: str) -> OptimizeResult:
+    return optimize(parse_profile(name, args))
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    from src.scripts.commands import COMMANDS_PATH
+
+    parser = argparse.ArgumentParser(description="Minimize winws arguments of commands.json profiles.")
+    parser.add_argument("--commands", default=COMMANDS_PATH)
+    parser.add_argument("--profile", action="append", dest="profiles")
+    parser.add_argument("--write", action="store_true", help="Rewrite commands.json in place")
+    args = parser.parse_args(argv)
+
+    with open(args.commands, "r", encoding="utf-8") as f:
+        commands = json.load(f)
+
+    changed = False
+    for name, data in commands.items():
+        if args.profiles and name not in args.profiles:
+            continue
+        try:
+            result = optimize_args(name, data["args"])
+        except (OptimizationError, ValueError) as e:
+            # Ни один профиль не записывается, если хоть один не прошел проверку
+            # или не разобрался (например, некорректный фильтр портов).
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        before = sum(result.diverted_before.values())
+        after = sum(result.diverted_after.values())
+        print(f"{name}: {len(result.changes)} change(s), diverted ports {before} -> {after}")
+        for change in result.changes:
+            print(f"  {change}")
+        if result.changed:
+            print(result.diff(), end="")
+            data["args"] = result.optimized
+            changed = True
+
+    if args.write and changed:
+        # Через временный файл: сбой посреди записи не испортит commands.json.
+        directory = os.path.dirname(os.path.abspath(args.commands))
+        fd, partial = tempfile.mkstemp(prefix=os.path.basename(args.commands), dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(commands, f, ensure_ascii=False, indent=2)
+            os.chmod(partial, os.stat(args.commands).st_mode & 0o7777)
+            os.replace(partial, args.commands)
+        except BaseException:
+            os.unlink(partial)
+            raise
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
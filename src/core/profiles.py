@@ -0,0 +1,205 @@
+import json
+import os
+import shlex
+from dataclasses import dataclass, field
+from typing import Final, Optional
+
+
+SECTION_SEPARATOR: Final[str] = "--new"
+GLOBAL_OPTIONS: Final[frozenset[str]] = frozenset(
+    {"--wf-tcp", "--wf-udp", "--wf-l3", "--wf-raw", "--wf-save", "--wf-iface"}
+)
+LIST_OPTIONS: Final[frozenset[str]] = frozenset(
+    {"--hostlist", "--hostlist-exclude", "--ipset", "--ipset-exclude"}
+)
+FILE_OPTION_PREFIXES: Final[tuple[str, ...]] = (
+    "--dpi-desync-fake-",
+    "--dpi-desync-split-seqovl-pattern",
+)
+PORT_MIN: Final[int] = 0
+PORT_MAX: Final[int] = 65535
+
+PortRanges = tuple[tuple[int, int], ...]
+Option = tuple[str, Optional[str]]
+
+
+def parse_ports(value: str) -> PortRanges:
+    """Разбирает строку портов вида "80,443,50000-50100" в отсортированные диапазоны.
+
+    Элементы с "~" (--filter-tcp=~80) winws понимает как отрицание: такой
+    список задает все порты, кроме перечисленных. Смешивать обычные и
+    отрицательные элементы в одном фильтре нельзя.
+    """
+    ranges: list[tuple[int, int]] = []
+    negated: set[bool] = set()
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        negated.add(part.startswith("~"))
+        body = part.lstrip("~")
+        if body == "*":
+            ranges.append((PORT_MIN, PORT_MAX))
+            continue
+        low, _, high = body.partition("-")
+        try:
+            start = int(low)
+            end = int(high) if high else start
+        except ValueError:
+            raise ValueError(f"Invalid port range '{part}'") from None
+        if not (PORT_MIN <= start <= end <= PORT_MAX):
+            raise ValueError(f"Invalid port range '{part}'")
+        ranges.append((start, end))
+    if len(negated) > 1:
+        raise ValueError(f"Mixed negated and plain ports in '{value}'")
+    if negated == {True}:
+        return _complement(ranges)
+    return tuple(sorted(ranges))
+
+
+def _complement(ranges: list[tuple[int, int]]) -> PortRanges:
+    result: list[tuple[int, int]] = []
+    next_port = PORT_MIN
+    for start, end in sorted(ranges):
+        if start > next_port:
+            result.append((next_port, start - 1))
+        next_port = max(next_port, end + 1)
+    if next_port <= PORT_MAX:
+        result.append((next_port, PORT_MAX))
+    return tuple(result)
+
+
+def ports_contain(ranges: PortRanges, port: int) -> bool:
+    return any(start <= port <= end for start, end in ranges)
+
+
+def format_ports(ranges: PortRanges) -> str:
+    return ",".join(
+        str(start) if start == end else f"{start}-{end}" for start, end in ranges
+    )
+
+
+def is_file_option(key: str) -> bool:
+    """Принимает ли опция winws путь к файлу (списки и fake-пакеты)."""
+    return key in LIST_OPTIONS or key.startswith(FILE_OPTION_PREFIXES)
+
+
+def _split_option(token: str) -> Option:
+    if not token.startswith("--"):
+        raise ValueError(f"Unexpected positional argument '{token}'")
+    key, sep, value = token.partition("=")
+    return key, (value if sep else None)
+
+
+@dataclass(frozen=True)
+class Section:
+    """Один блок аргументов winws между разделителями --new."""
+
+    index: int
+    options: tuple[Option, ...]
+
+    def values(self, key: str) -> tuple[str, ...]:
+        return tuple(value for k, value in self.options if k == key and value)
+
+    def has(self, key: str) -> bool:
+        return any(k == key for k, _ in self.options)
+
+    @property
+    def tcp_ports(self) -> Optional[PortRanges]:
+        values = self.values("--filter-tcp")
+        return parse_ports(",".join(values)) if values else None
+
+    @property
+    def udp_ports(self) -> Optional[PortRanges]:
+        values = self.values("--filter-udp")
+        return parse_ports(",".join(values)) if values else None
+
+    @property
+    def hostlists(self) -> tuple[str, ...]:
+        return self.values("--hostlist")
+
+    @property
+    def ipsets(self) -> tuple[str, ...]:
+        return self.values("--ipset")
+
+    def matches_port(self, protocol: str, port: int) -> bool:
+        """Проверяет фильтры --filter-tcp/--filter-udp секции.
+
+        Секция без фильтров принимает оба протокола; если задан фильтр
+        только для одного протокола, второй секцией не обрабатывается.
+        """
+        tcp, udp = self.tcp_ports, self.udp_ports
+        if tcp is None and udp is None:
+            return True
+        ranges = tcp if protocol == "tcp" else udp
+        return ranges is not None and ports_contain(ranges, port)
+
+
+@dataclass(frozen=True)
+class Profile:
+    """Профиль из commands.json, разобранный на глобальные опции и секции."""
+
+    name: str
+    args: str
+    global_options: tuple[Option, ...]
+    sections: tuple[Section, ...] = field(default_factory=tuple)
+
+    def global_values(self, key: str) -> tuple[str, ...]:
+        return tuple(value for k, value in self.global_options if k == key and value)
+
+    @property
+    def wf_tcp(self) -> PortRanges:
+        return parse_ports(",".join(self.global_values("--wf-tcp")))
+
+    @property
+    def wf_udp(self) -> PortRanges:
+        return parse_ports(",".join(self.global_values("--wf-udp")))
+
+    def intercepts(self, protocol: str, port: int) -> bool:
+        """Попадает ли пакет в фильтр WinDivert (--wf-tcp/--wf-udp) профиля."""
+        ranges = self.wf_tcp if protocol == "tcp" else self.wf_udp
+        return ports_contain(ranges, port)
+
+    def referenced_files(self) -> tuple[str, ...]:
+        """Все файлы, на которые ссылаются секции, в порядке первого упоминания."""
+        seen: dict[str, None] = {}
+        for section in self.sections:
+            for key, value in section.options:
+                if value and is_file_option(key):
+                    seen.setdefault(value, None)
+        return tuple(seen)
+
+
+def parse_profile(
+    name: str, args: str, tokens: Optional[list[str]] = None
+) -> Profile:
+    global_options: list[Option] = []
+    sections: list[Section] = []
+    current: list[Option] = []
+
+    for token in shlex.split(args) if tokens is None else tokens:
+        if token == SECTION_SEPARATOR:
+            sections.append(Section(len(sections), tuple(current)))
+            current = []
+            continue
+        option = _split_option(token)
+        if option[0] in GLOBAL_OPTIONS:
+            global_options.append(option)
+        else:
+            current.append(option)
+    sections.append(Section(len(sections), tuple(current)))
+
+    return Profile(name, args, tuple(global_options), tuple(sections))
+
+
+def load_profiles(commands_path: str) -> dict[str, Profile]:
+    """Читает commands.json и разбирает каждый профиль."""
+    with open(commands_path, "r", encoding="utf-8") as f:
+        commands_data = json.load(f)
+    return {
+        name: parse_profile(name, data["args"]) for name, data in commands_data.items()
+    }
+
+
+def resolve_path(base_dir: str, path: str) -> str:
+    return path if os.path.isabs(path) else os.path.normpath(os.path.join(base_dir, path))
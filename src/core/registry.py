@@ -0,0 +1,249 @@
+import argparse
+import hashlib
+import json
+import os
+import shlex
+import sys
+import time
+from dataclasses import dataclass
+from typing import Final, Iterator, Optional
+
+from src.core.profiles import (
+    PortRanges,
+    Profile,
+    is_file_option,
+    parse_profile,
+    resolve_path,
+)
+from src.core.sharding import shard_tokens
+
+
+# Диапазоны шире этого не разворачиваются в индекс по портам.
+MAX_EXPANDED_RANGE: Final[int] = 4096
+
+
+@dataclass(frozen=True)
+class ProfileEntry:
+    name: str
+    args: str
+    argv: tuple[str, ...]
+    profile: Profile
+    files: tuple[str, ...]
+    # argv для режима с несколькими процессами; один элемент, если делить нечего.
+    shards: tuple[tuple[str, ...], ...] = ()
+
+
+class ProfileRegistry:
+    """Реестр профилей commands.json с заранее собранными argv.
+
+    Файл перечитывается только при изменении mtime/размера, а разбор
+    выполняется заново только если изменился его SHA-256.
+    """
+
+    def __init__(self, commands_path: str, script_dir: str, launcher: tuple[str, ...]):
+        self.commands_path: str = commands_path
+        self.script_dir: str = script_dir
+        self.launcher: tuple[str, ...] = launcher
+        self._signature: Optional[tuple[int, int]] = None
+        self._digest: Optional[str] = None
+        self._entries: dict[str, ProfileEntry] = {}
+        self._by_protocol: dict[str, tuple[str, ...]] = {}
+        self._by_port: dict[tuple[str, int], tuple[str, ...]] = {}
+        self._wide_ranges: list[tuple[str, int, int, str]] = []
+        self._by_file: dict[str, tuple[str, ...]] = {}
+        self.refresh()
+
+    def set_launcher(self, launcher: tuple[str, ...]) -> None:
+        """Подменяет исполняемый файл winws (например, заглушкой) и пересобирает argv."""
+        self.launcher = launcher
+        self._signature = None
+        self._digest = None
+        self.refresh()
+
+    def refresh(self) -> bool:
+        """Перезагружает реестр, если файл изменился. Возвращает True при перестроении."""
+        try:
+            stat = os.stat(self.commands_path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if signature == self._signature:
+                return False
+            with open(self.commands_path, "rb") as f:
+                raw = f.read()
+            digest = hashlib.sha256(raw).hexdigest()
+            if digest == self._digest:
+                self._signature = signature
+                return False
+            commands_data = json.loads(raw.decode("utf-8"))
+            entries = {
+                name: self._compile(name, data["args"])
+                for name, data in commands_data.items()
+            }
+        except Exception as e:
+            raise RuntimeError(f"Failed to load commands: {str(e)}")
+
+        # Подпись запоминается только после разбора: файл с ошибкой будет
+        # прочитан снова при следующем refresh, а не сочтен загруженным.
+        self._signature = signature
+        self._digest = digest
+        self._entries = entries
+        self._build_indexes()
+        return True
+
+    def _compile(self, name: str, args: str) -> ProfileEntry:
+        tokens = shlex.split(args)
+        profile = parse_profile(name, args, tokens)
+        argv: list[str] = list(self.launcher)
+        files: list[str] = []
+        for token in tokens:
+            key, sep, value = token.partition("=")
+            if sep and value and is_file_option(key):
+                value = resolve_path(self.script_dir, value)
+                files.append(value)
+                token = f"{key}={value}"
+            argv.append(token)
+        shards = tuple(
+            (*self.launcher, *shard)
+            for shard in shard_tokens(profile, argv[len(self.launcher):])
+        )
+        return ProfileEntry(
+            name, args, tuple(argv), profile, tuple(dict.fromkeys(files)), shards
+        )
+
+    def _build_indexes(self) -> None:
+        by_protocol: dict[str, list[str]] = {"tcp": [], "udp": []}
+        by_port: dict[tuple[str, int], list[str]] = {}
+        wide_ranges: list[tuple[str, int, int, str]] = []
+        by_file: dict[str, list[str]] = {}
+
+        for name, entry in self._entries.items():
+            port_sets: dict[str, PortRanges] = {
+                "tcp": entry.profile.wf_tcp,
+                "udp": entry.profile.wf_udp,
+            }
+            for protocol, ranges in port_sets.items():
+                if ranges:
+                    by_protocol[protocol].append(name)
+                for start, end in ranges:
+                    if end - start >= MAX_EXPANDED_RANGE:
+                        wide_ranges.append((protocol, start, end, name))
+                        continue
+                    for port in range(start, end + 1):
+                        names = by_port.setdefault((protocol, port), [])
+                        if not names or names[-1] != name:
+                            names.append(name)
+            for path in entry.files:
+                by_file.setdefault(os.path.normcase(path), []).append(name)
+
+        self._by_protocol = {k: tuple(v) for k, v in by_protocol.items()}
+        self._by_port = {k: tuple(v) for k, v in by_port.items()}
+        self._wide_ranges = wide_ranges
+        self._by_file = {k: tuple(v) for k, v in by_file.items()}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, name: str) -> ProfileEntry:
+        entry = self._entries.get(name)
+        if entry is None:
+            raise ValueError(f"Command '{name}' not found")
+        return entry
+
+    @property
+    def commands(self) -> dict[str, str]:
+        return {name: entry.args for name, entry in self._entries.items()}
+
+    def by_protocol(self, protocol: str) -> tuple[str, ...]:
+        return self._by_protocol.get(protocol, ())
+
+    def by_port(self, protocol: str, port: int) -> tuple[str, ...]:
+        names = self._by_port.get((protocol, port), ())
+        wide = [
+            name
+            for proto, start, end, name in self._wide_ranges
+            if proto == protocol and start <= port <= end and name not in names
+        ]
+        if not wide:
+            return names
+        order = {name: i for i, name in enumerate(self._entries)}
+        return tuple(sorted((*names, *wide), key=order.__getitem__))
+
+    def by_file(self, path: str) -> tuple[str, ...]:
+        full_path = resolve_path(self.script_dir, path)
+        return self._by_file.get(os.path.normcase(full_path), ())
+
+
+def _legacy_argv(commands_path: str, script_dir: str, name: str) -> list[str]:
+    with open(commands_path, "r", encoding="utf-8") as f:
+        commands = {n: data["args"] for n, data in json.load(f).items()}
+    return [os.path.join(script_dir, "bin", "winws.exe")] + shlex.split(commands[name])
+
+
+def benchmark(registry: ProfileRegistry, iterations: int = 2000) -> dict[str, float]:
+    """Сравнивает старый путь (разбор commands.json и shlex на каждый запуск)
+    с выдачей готового argv из реестра."""
+    names = list(registry)
+    results: dict[str, float] = {}
+
+    started = time.perf_counter()
+    for i in range(iterations):
+        _legacy_argv(registry.commands_path, registry.script_dir, names[i % len(names)])
+    results["legacy_launch_us"] = (time.perf_counter() - started) / iterations * 1e6
+
+    started = time.perf_counter()
+    for _ in range(max(iterations // 20, 1)):
+        ProfileRegistry(registry.commands_path, registry.script_dir, registry.launcher)
+    results["cold_load_us"] = (
+        (time.perf_counter() - started) / max(iterations // 20, 1) * 1e6
+    )
+
+    started = time.perf_counter()
+    for i in range(iterations):
+        registry.refresh()
+        registry.get(names[i % len(names)]).argv
+    results["hot_launch_us"] = (time.perf_counter() - started) / iterations * 1e6
+    return results
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    from src.scripts.commands import ZapretRunner
+
+    parser = argparse.ArgumentParser(description="Profile registry tools.")
+    subparsers = parser.add_subparsers(dest="action", required=True)
+    find = subparsers.add_parser("find", help="Filter profiles by port, protocol or file")
+    find.add_argument("--protocol", choices=("tcp", "udp"))
+    find.add_argument("--port", type=int)
+    find.add_argument("--file")
+    bench = subparsers.add_parser("bench", help="Cold-load and hot-launch micro-benchmark")
+    bench.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    registry = ZapretRunner().registry
+    if args.action == "bench":
+        for name, value in benchmark(registry, args.iterations).items():
+            print(f"{name}\t{value:.3f}")
+        return 0
+
+    names: list[str] = list(registry)
+    if args.port is not None:
+        protocols = [args.protocol] if args.protocol else ["tcp", "udp"]
+        matched = {n for p in protocols for n in registry.by_port(p, args.port)}
+        names = [n for n in names if n in matched]
+    elif args.protocol:
+        matched = set(registry.by_protocol(args.protocol))
+        names = [n for n in names if n in matched]
+    if args.file:
+        matched = set(registry.by_file(args.file))
+        names = [n for n in names if n in matched]
+    for name in names:
+        print(name)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,461 @@
+import argparse
+import ctypes
+import os
+import subprocess
+import sys
+import threading
+import time
+from array import array
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Final, Iterable, Optional, Sequence
+
+
+DEFAULT_CAPACITY: Final[int] = 720
+DEFAULT_INTERVAL: Final[float] = 5.0
+METRICS_HOST: Final[str] = "127.0.0.1"
+METRICS_PORT: Final[int] = 9178
+COLUMNS: Final[tuple[str, ...]] = (
+    "timestamp",
+    "cpu_seconds",
+    "rss_bytes",
+    "handles",
+    "threads",
+    "uptime_seconds",
+)
+
+
+class _ProcReader:
+    """Чтение /proc/<pid> в заранее выделенные буферы через pread.
+
+    Числа разбираются прямо в буфере по смещениям, без срезов и списков
+    полей; дескрипторы считаются обходом os.scandir без списка имен.
+    """
+
+    def __init__(self, pid: int):
+        self._pid: int = pid
+        self._stat_fd: int = os.open(f"/proc/{pid}/stat", os.O_RDONLY)
+        self._statm_fd: int = os.open(f"/proc/{pid}/statm", os.O_RDONLY)
+        self._uptime_fd: int = os.open("/proc/uptime", os.O_RDONLY)
+        self._fd_dir: str = f"/proc/{pid}/fd"
+        self._buffer: bytearray = bytearray(1024)
+        self._views: list[memoryview] = [memoryview(self._buffer)]
+        self._ticks: int = os.sysconf("SC_CLK_TCK")
+        self._page_size: int = os.sysconf("SC_PAGE_SIZE")
+
+    def _read(self, fd: int) -> int:
+        return os.preadv(fd, self._views, 0)
+
+    def _skip(self, pos: int, end: int, fields: int) -> int:
+        """Смещение начала поля, которое на fields полей правее pos."""
+        for _ in range(fields):
+            pos = self._buffer.find(32, pos, end) + 1
+            if not pos:
+                raise ValueError("truncated /proc record")
+        return pos
+
+    def _uint(self, pos: int, end: int) -> int:
+        buffer = self._buffer
+        value = 0
+        while pos < end and 48 <= buffer[pos] <= 57:
+            value = value * 10 + buffer[pos] - 48
+            pos += 1
+        return value
+
+    def _seconds(self, pos: int, end: int) -> float:
+        """Разбирает "123.45" из /proc/uptime."""
+        buffer = self._buffer
+        whole = self._uint(pos, end)
+        dot = buffer.find(46, pos, end)
+        if dot < 0:
+            return float(whole)
+        fraction, scale = 0, 1
+        pos = dot + 1
+        while pos < end and 48 <= buffer[pos] <= 57:
+            fraction = fraction * 10 + buffer[pos] - 48
+            scale *= 10
+            pos += 1
+        return whole + fraction / scale
+
+    def _count_fds(self) -> int:
+        count = 0
+        with os.scandir(self._fd_dir) as entries:
+            for _ in entries:
+                count += 1
+        return count
+
+    def sample(self) -> tuple[float, float, float, float, float]:
+        end = self._read(self._stat_fd)
+        # Имя процесса в скобках может содержать пробелы: поля считаются от ")".
+        pos = self._buffer.rfind(41, 0, end) + 2
+        pos = self._skip(pos, end, 11)
+        utime = self._uint(pos, end)
+        pos = self._skip(pos, end, 1)
+        cpu = (utime + self._uint(pos, end)) / self._ticks
+        pos = self._skip(pos, end, 5)
+        threads = float(self._uint(pos, end))
+        pos = self._skip(pos, end, 2)
+        started = self._uint(pos, end) / self._ticks
+        end = self._read(self._statm_fd)
+        rss = float(self._uint(self._skip(0, end, 1), end) * self._page_size)
+        end = self._read(self._uptime_fd)
+        uptime = self._seconds(0, end) - started
+        try:
+            handles = float(self._count_fds())
+        except OSError:
+            handles = 0.0
+        return cpu, rss, handles, threads, uptime
+
+    def close(self) -> None:
+        for fd in (self._stat_fd, self._statm_fd, self._uptime_fd):
+            os.close(fd)
+
+
+class _FILETIME(ctypes.Structure):
+    _fields_ = [("low", ctypes.c_uint32), ("high", ctypes.c_uint32)]
+
+    @property
+    def value(self) -> int:
+        return (self.high << 32) | self.low
+
+
+class _PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+    _fields_ = [
+        ("cb", ctypes.c_uint32),
+        ("PageFaultCount", ctypes.c_uint32),
+        ("PeakWorkingSetSize", ctypes.c_size_t),
+        ("WorkingSetSize", ctypes.c_size_t),
+        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+        ("PagefileUsage", ctypes.c_size_t),
+        ("PeakPagefileUsage", ctypes.c_size_t),
+    ]
+
+
+class _THREADENTRY32(ctypes.Structure):
+    _fields_ = [
+        ("dwSize", ctypes.c_uint32),
+        ("cntUsage", ctypes.c_uint32),
+        ("th32ThreadID", ctypes.c_uint32),
+        ("th32OwnerProcessID", ctypes.c_uint32),
+        ("tpBasePri", ctypes.c_long),
+        ("tpDeltaPri", ctypes.c_long),
+        ("dwFlags", ctypes.c_uint32),
+    ]
+
+
+class _WinReader:
+    """Аналог _ProcReader на WinAPI с переиспользуемыми структурами ctypes."""
+
+    PROCESS_QUERY_LIMITED_INFORMATION: Final[int] = 0x1000
+    TH32CS_SNAPTHREAD: Final[int] = 0x4
+    FILETIME_TICKS: Final[float] = 1e7
+
+    def __init__(self, pid: int):
+        self._kernel32 = ctypes.windll.kernel32
+        self._pid: int = pid
+        self._handle = self._kernel32.OpenProcess(
+            self.PROCESS_QUERY_LIMITED_INFORMATION, False, pid
+        )
+        if not self._handle:
+            raise ctypes.WinError()
+        self._creation, self._exit = _FILETIME(), _FILETIME()
+        self._kernel, self._user, self._now = _FILETIME(), _FILETIME(), _FILETIME()
+        self._memory = _PROCESS_MEMORY_COUNTERS()
+        self._memory.cb = ctypes.sizeof(_PROCESS_MEMORY_COUNTERS)
+        self._handle_count = ctypes.c_uint32()
+        self._thread_entry = _THREADENTRY32()
+
+    def _count_threads(self) -> int:
+        snapshot = self._kernel32.CreateToolhelp32Snapshot(self.TH32CS_SNAPTHREAD, 0)
+        if snapshot in (0, -1):
+            return 0
+        count = 0
+        entry = self._thread_entry
+        entry.dwSize = ctypes.sizeof(_THREADENTRY32)
+        try:
+            ok = self._kernel32.Thread32First(snapshot, ctypes.byref(entry))
+            while ok:
+                if entry.th32OwnerProcessID == self._pid:
+                    count += 1
+                ok = self._kernel32.Thread32Next(snapshot, ctypes.byref(entry))
+        finally:
+            self._kernel32.CloseHandle(snapshot)
+        return count
+
+    def sample(self) -> tuple[float, float, float, float, float]:
+        k32 = self._kernel32
+        k32.GetProcessTimes(
+            self._handle,
+            ctypes.byref(self._creation),
+            ctypes.byref(self._exit),
+            ctypes.byref(self._kernel),
+            ctypes.byref(self._user),
+        )
+        k32.K32GetProcessMemoryInfo(
+            self._handle, ctypes.byref(self._memory), self._memory.cb
+        )
+        k32.GetProcessHandleCount(self._handle, ctypes.byref(self._handle_count))
+        k32.GetSystemTimeAsFileTime(ctypes.byref(self._now))
+        cpu = (self._kernel.value + self._user.value) / self.FILETIME_TICKS
+        uptime = (self._now.value - self._creation.value) / self.FILETIME_TICKS
+        return (
+            cpu,
+            float(self._memory.WorkingSetSize),
+            float(self._handle_count.value),
+            float(self._count_threads()),
+            uptime,
+        )
+
+    def close(self) -> None:
+        self._kernel32.CloseHandle(self._handle)
+
+
+def open_reader(pid: int):
+    """Читатель счетчиков процесса: sample() -> (cpu, rss, handles, threads, uptime)."""
+    return _WinReader(pid) if sys.platform == "win32" else _ProcReader(pid)
+
+
+class ResourceSampler:
+    """Периодически снимает потребление ресурсов процессами winws.
+
+    Значения хранятся в заранее выделенных массивах фиксированного размера
+    (кольцевой буфер), поэтому память не растет со временем работы.
+    Собственная стоимость каждого замера тоже учитывается. В режиме шардов
+    счетчики процессов суммируются (время работы — по старейшему).
+    """
+
+    def __init__(
+        self,
+        processes_getter: Callable[[], Sequence[subprocess.Popen]],
+        interval: float = DEFAULT_INTERVAL,
+        capacity: int = DEFAULT_CAPACITY,
+    ):
+        self._processes_getter = processes_getter
+        self._interval: float = interval
+        self._capacity: int = capacity
+        self._columns: dict[str, array] = {
+            name: array("d", bytes(8 * capacity)) for name in COLUMNS
+        }
+        self._count: int = 0
+        self._lock: threading.Lock = threading.Lock()
+        self._stop: threading.Event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._readers: dict = {}
+        self.sample_count: int = 0
+        self.sample_cost_total: float = 0.0
+
+    @property
+    def pids(self) -> tuple[int, ...]:
+        return tuple(self._readers)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name="zapret-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self._detach()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            self.sample_once()
+
+    def _close(self, pid: int) -> None:
+        try:
+            self._readers.pop(pid).close()
+        except OSError:
+            pass
+
+    def _detach(self) -> None:
+        for pid in tuple(self._readers):
+            self._close(pid)
+
+    def _attach(self) -> None:
+        """Держит по читателю на каждый живой процесс профиля."""
+        processes = self._processes_getter()
+        if len(processes) == len(self._readers):
+            for process in processes:
+                if process.pid not in self._readers or process.poll() is not None:
+                    break
+            else:
+                return
+        alive = {process.pid for process in processes if process.poll() is None}
+        for pid in tuple(self._readers):
+            if pid not in alive:
+                self._close(pid)
+        for pid in alive:
+            if pid not in self._readers:
+                try:
+                    self._readers[pid] = open_reader(pid)
+                except OSError:
+                    pass
+
+    def sample_once(self) -> bool:
+        started = time.perf_counter()
+        self._attach()
+        if not self._readers:
+            return False
+        cpu = rss = handles = threads = uptime = 0.0
+        for pid, reader in tuple(self._readers.items()):
+            try:
+                values = reader.sample()
+            except (OSError, ValueError, IndexError):
+                self._close(pid)
+                return False
+            cpu += values[0]
+            rss += values[1]
+            handles += values[2]
+            threads += values[3]
+            uptime = max(uptime, values[4])
+
+        with self._lock:
+            slot = self._count % self._capacity
+            columns = self._columns
+            columns["timestamp"][slot] = time.time()
+            columns["cpu_seconds"][slot] = cpu
+            columns["rss_bytes"][slot] = rss
+            columns["handles"][slot] = handles
+            columns["threads"][slot] = threads
+            columns["uptime_seconds"][slot] = uptime
+            self._count += 1
+        self.sample_count += 1
+        self.sample_cost_total += time.perf_counter() - started
+        return True
+
+    @property
+    def mean_sample_cost(self) -> float:
+        return self.sample_cost_total / self.sample_count if self.sample_count else 0.0
+
+    def latest(self) -> Optional[dict[str, float]]:
+        with self._lock:
+            if not self._count or not self._readers:
+                return None
+            slot = (self._count - 1) % self._capacity
+            return {name: column[slot] for name, column in self._columns.items()}
+
+    def cpu_percent(self) -> Optional[float]:
+        """Загрузка CPU между двумя последними замерами, в процентах одного ядра."""
+        with self._lock:
+            if self._count < 2 or not self._readers:
+                return None
+            last = (self._count - 1) % self._capacity
+            prev = (self._count - 2) % self._capacity
+            times, cpu = self._columns["timestamp"], self._columns["cpu_seconds"]
+            elapsed = times[last] - times[prev]
+            if elapsed <= 0 or cpu[last] < cpu[prev]:
+                return None
+            return (cpu[last] - cpu[prev]) / elapsed * 100
+
+    def series(self, name: str) -> list[float]:
+        with self._lock:
+            column = self._columns[name]
+            if self._count <= self._capacity:
+                return column[: self._count].tolist()
+            slot = self._count % self._capacity
+            return (column[slot:] + column[:slot]).tolist()
+
+    def render_openmetrics(self, extra: Iterable[str] = ()) -> str:
+        """Текст в формате OpenMetrics; строки extra добавляются перед "# EOF"."""
+        latest = self.latest()
+        lines: list[str] = []
+
+        def metric(name: str, kind: str, help_text: str, value: float, suffix: str = "") -> None:
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"{name}{suffix} {value}")
+
+        metric("zapret_winws_up", "gauge", "Whether winws is running.", 1 if latest else 0)
+        if latest:
+            metric("zapret_winws_cpu_seconds", "counter", "CPU time used by winws.",
+                   latest["cpu_seconds"], "_total")
+            metric("zapret_winws_resident_memory_bytes", "gauge", "Resident set size.",
+                   latest["rss_bytes"])
+            metric("zapret_winws_open_handles", "gauge", "Open handles or file descriptors.",
+                   latest["handles"])
+            metric("zapret_winws_threads", "gauge", "Thread count.", latest["threads"])
+            metric("zapret_winws_uptime_seconds", "gauge", "Process uptime.",
+                   latest["uptime_seconds"])
+        metric("zapret_sampler_samples", "counter", "Samples taken.", self.sample_count, "_total")
+        metric("zapret_sampler_cost_seconds", "gauge", "Mean cost of a single sample.",
+               self.mean_sample_cost)
+        lines.extend(extra)
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """HTTP-эндпоинт /metrics в формате OpenMetrics только на localhost."""
+
+    CONTENT_TYPE: Final[str] = (
+        "application/openmetrics-text; version=1.0.0; charset=utf-8"
+    )
+
+    def __init__(
+        self,
+        sampler: ResourceSampler,
+        host: str = METRICS_HOST,
+        port: int = METRICS_PORT,
+        extra: Optional[Callable[[], Iterable[str]]] = None,
+    ):
+        sampler_ref = sampler
+        extra_ref = extra or (lambda: ())
+        content_type = self.CONTENT_TYPE
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = sampler_ref.render_openmetrics(extra_ref()).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        self._server: ThreadingHTTPServer = ThreadingHTTPServer((host, port), Handler)
+        self._thread: threading.Thread = threading.Thread(
+            target=self._server.serve_forever, name="zapret-metrics", daemon=True
+        )
+
+    @property
+    def address(self) -> tuple[str, int]:
+        return self._server.server_address[:2]
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure resource sampler overhead.")
+    parser.add_argument("--samples", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    stub = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(3600)"])
+    sampler = ResourceSampler(lambda: (stub,), capacity=256)
+    try:
+        for _ in range(args.samples):
+            sampler.sample_once()
+    finally:
+        stub.kill()
+        stub.wait()
+    print(f"samples\t{sampler.sample_count}")
+    print(f"mean_sample_cost_us\t{sampler.mean_sample_cost * 1e6:.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""Сравнение одного процесса winws и пула шардов на заглушке.
+
+``python -m src.core.shard_bench --packets 400000`` строит синтетическую
+трассу пакетов по портам профиля и прогоняет ее через заглушку winws
+сначала одним процессом, затем пулом шардов. Каждая заглушка хеширует
+пакеты, попавшие в ее --wf-tcp/--wf-udp, поэтому время отражает
+распределение нагрузки между процессами. Проверяется также, что шарды
+вместе обработали ровно те же пакеты, что и один процесс.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Optional
+
+from src.core.backends import WinwsBackend
+from src.core.paths import isolated_data_dir
+from src.core.profiles import Profile
+from src.core.winws_stub import stub_launcher, write_trace
+from src.scripts.commands import WINWS_EXE_PATH, ZapretRunner
+
+
+def synthetic_trace(profile: Profile, packets: int, seed: int = 0) -> list[tuple[int, int]]:
+    """Пакеты, равномерно распределенные по диапазонам --wf-tcp/--wf-udp профиля."""
+    rng = random.Random(seed)
+    ranges = [(0, r) for r in profile.wf_tcp] + [(1, r) for r in profile.wf_udp]
+    trace = []
+    for _ in range(packets):
+        protocol, (start, end) = rng.choice(ranges)
+        trace.append((protocol, rng.randint(start, end)))
+    return trace
+
+
+def run_mode(
+    runner: ZapretRunner, profile: str, sharded: bool, trace_path: str, timeout: float
+) -> dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp:
+        result_file = os.path.join(tmp, "results.jsonl")
+        runner.registry.set_launcher(stub_launcher(trace=trace_path, result_file=result_file))
+        runner.sharded = sharded
+        started = time.perf_counter()
+        runner.run(profile)
+        processes = len(runner.processes)
+        try:
+            results: list[dict[str, Any]] = []
+            while len(results) < processes:
+                if time.perf_counter() - started > timeout:
+                    raise TimeoutError("stub processes did not finish the trace")
+                time.sleep(0.005)
+                if os.path.exists(result_file):
+                    with open(result_file, "r", encoding="utf-8") as f:
+                        results = [json.loads(line) for line in f if line.endswith("\n")]
+            elapsed = time.perf_counter() - started
+        finally:
+            running = runner.processes
+            runner.terminate()
+            for process in running:
+                process.wait()
+    handled = sum(result["packets"] for result in results)
+    return {
+        "processes": processes,
+        "packets": handled,
+        "wall_s": elapsed,
+        "packets_per_s": handled / elapsed if elapsed else 0.0,
+        "busiest_s": max(result["seconds"] for result in results),
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare single-process and sharded winws.")
+    parser.add_argument("--profile")
+    parser.add_argument("--packets", type=int, default=400_000)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    # Каталог данных временный: PID шардов-заглушек не попадут в файл
+    # блокировки работающего экземпляра.
+    with isolated_data_dir() as tmp:
+        runner = ZapretRunner()
+        # Заглушка ведет себя как winws: шарды и фильтр по --wf-*.
+        runner.use_backend(WinwsBackend(WINWS_EXE_PATH))
+        name = args.profile or next(iter(runner.registry))
+        entry = runner.registry.get(name)
+        launcher, sharded = runner.registry.launcher, runner.sharded
+
+        trace_path = os.path.join(tmp, "trace.bin")
+        write_trace(trace_path, synthetic_trace(entry.profile, args.packets, args.seed))
+        try:
+            single = run_mode(runner, name, False, trace_path, args.timeout)
+            pool = run_mode(runner, name, True, trace_path, args.timeout)
+        finally:
+            runner.registry.set_launcher(launcher)
+            runner.sharded = sharded
+
+    print("mode\tprocesses\tpackets\twall_s\tpackets_per_s\tbusiest_s")
+    for mode, result in (("single", single), ("sharded", pool)):
+        print(
+            f"{mode}\t{result['processes']}\t{result['packets']}\t{result['wall_s']:.3f}\t"
+            f"{result['packets_per_s']:.0f}\t{result['busiest_s']:.3f}"
+        )
+    print(f"speedup\t{single['wall_s'] / pool['wall_s']:.2f}")
+    if single["packets"] != pool["packets"]:
+        print("FAIL: shards handled a different set of packets", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
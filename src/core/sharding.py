@@ -0,0 +1,130 @@
+"""Разбиение профиля winws на независимые шарды по портам.
+
+Секции, чьи множества портов (фильтр секции в пересечении с --wf-tcp/
+--wf-udp) пересекаются, остаются в одном шарде в исходном порядке,
+поэтому правило "срабатывает первая подходящая секция" сохраняется.
+Каждый шард получает собственные --wf-tcp/--wf-udp только со своими
+портами, так что пакет перехватывает ровно один процесс winws.
+"""
+
+from typing import Final
+
+from src.core.lists import merge_intervals
+from src.core.profiles import (
+    GLOBAL_OPTIONS,
+    SECTION_SEPARATOR,
+    PortRanges,
+    Profile,
+    Section,
+    format_ports,
+)
+
+
+WF_PORT_OPTIONS: Final[dict[str, str]] = {"tcp": "--wf-tcp", "udp": "--wf-udp"}
+# С сырым фильтром WinDivert порты шардов вычислить нельзя.
+UNSHARDABLE_OPTIONS: Final[frozenset[str]] = frozenset({"--wf-raw"})
+
+
+def intersect_ports(a: PortRanges, b: PortRanges) -> PortRanges:
+    result: list[tuple[int, int]] = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        start, end = max(a[i][0], b[j][0]), min(a[i][1], b[j][1])
+        if start <= end:
+            result.append((start, end))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return tuple(merge_intervals(result))
+
+
+def section_ports(profile: Profile, section: Section) -> dict[str, PortRanges]:
+    """Порты, пакеты которых может обработать секция, по протоколам."""
+    wf = {"tcp": profile.wf_tcp, "udp": profile.wf_udp}
+    tcp, udp = section.tcp_ports, section.udp_ports
+    if tcp is None and udp is None:
+        return wf
+    return {
+        "tcp": intersect_ports(tcp, wf["tcp"]) if tcp is not None else (),
+        "udp": intersect_ports(udp, wf["udp"]) if udp is not None else (),
+    }
+
+
+def _overlap(a: PortRanges, b: PortRanges) -> bool:
+    return bool(intersect_ports(a, b))
+
+
+def partition(profile: Profile) -> list[list[Section]]:
+    """Группирует секции с пересекающимися портами. Секции без портов отбрасываются."""
+    ports = [section_ports(profile, section) for section in profile.sections]
+    live = [i for i, p in enumerate(ports) if p["tcp"] or p["udp"]]
+    parent = {i: i for i in live}
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for n, i in enumerate(live):
+        for j in live[n + 1:]:
+            if any(_overlap(ports[i][proto], ports[j][proto]) for proto in WF_PORT_OPTIONS):
+                parent[find(j)] = find(i)
+
+    groups: dict[int, list[Section]] = {}
+    for i in live:
+        groups.setdefault(find(i), []).append(profile.sections[i])
+    return list(groups.values())
+
+
+def _split_tokens(tokens: list[str]) -> list[list[str]]:
+    sections: list[list[str]] = [[]]
+    for token in tokens:
+        if token == SECTION_SEPARATOR:
+            sections.append([])
+        else:
+            sections[-1].append(token)
+    return sections
+
+
+def shard_tokens(profile: Profile, tokens: list[str]) -> list[list[str]]:
+    """Аргументы winws для каждого шарда; один элемент, если делить нечего.
+
+    tokens — те же аргументы, из которых разобран profile (например, уже с
+    абсолютными путями к файлам), чтобы шарды ссылались на те же файлы.
+    """
+    keys = {token.partition("=")[0] for token in tokens}
+    if keys & UNSHARDABLE_OPTIONS:
+        return [tokens]
+    groups = partition(profile)
+    if len(groups) < 2:
+        return [tokens]
+
+    section_tokens = _split_tokens(tokens)
+    global_tokens: list[str] = []
+    for index, section in enumerate(section_tokens):
+        kept = []
+        for token in section:
+            key = token.partition("=")[0]
+            if key not in GLOBAL_OPTIONS:
+                kept.append(token)
+            elif key not in WF_PORT_OPTIONS.values():
+                global_tokens.append(token)
+        section_tokens[index] = kept
+
+    shards: list[list[str]] = []
+    for group in groups:
+        args = list(global_tokens)
+        for proto, option in WF_PORT_OPTIONS.items():
+            ranges = merge_intervals(
+                r for section in group for r in section_ports(profile, section)[proto]
+            )
+            if ranges:
+                args.append(f"{option}={format_ports(ranges)}")
+        for n, section in enumerate(group):
+            if n:
+                args.append(SECTION_SEPARATOR)
+            args.extend(section_tokens[section.index])
+        shards.append(args)
+    return shards
@@ -0,0 +1,143 @@
+"""Проверка остановки winws за ограниченное время на заглушке.
+
+``python -m src.core.stop_bench --runs 10`` запускает и останавливает
+профиль в трех режимах заглушки: обычный выход по SIGTERM, выход с
+задержкой и полное игнорирование SIGTERM (срабатывает kill). Затем
+оставляет "осиротевший" процесс в lock-файле и проверяет, что
+reap_orphans его останавливает, а процесс с тем же PID, но другим
+временем запуска не трогает. Код выхода 1, если какая-то остановка не
+подтвердилась или заняла больше срока.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Optional
+
+from src.core.backends import WinwsBackend
+from src.core.latency import LatencyRecorder
+from src.core.process_utils import DETACHED_CREATION_FLAGS, pid_alive, process_start_time
+from src.core.winws_stub import stub_launcher
+from src.scripts.commands import WINWS_EXE_PATH, ZapretRunner
+
+
+# Имя сценария -> конфигурация заглушки.
+SCENARIOS: dict[str, dict[str, Any]] = {
+    "graceful": {},
+    "term_delay": {"term_delay": 0.2},
+    "ignore_term": {"ignore_term": True},
+}
+
+
+def run_scenario(runner: ZapretRunner, profile: str, config: dict[str, Any], runs: int) -> int:
+    """Запускает и останавливает профиль runs раз; возвращает число неудачных остановок."""
+    runner.registry.set_launcher(stub_launcher(**config))
+    runner.stop_latency = LatencyRecorder()
+    failures = 0
+    for _ in range(runs):
+        runner.run(profile)
+        # Заглушка должна успеть поставить обработчик SIGTERM.
+        time.sleep(0.1)
+        processes = list(runner._processes)
+        try:
+            runner.terminate()
+        except RuntimeError as e:
+            print(f"stop failed: {e}", file=sys.stderr)
+            failures += 1
+        if any(process.poll() is None for process in processes):
+            failures += 1
+    return failures
+
+
+def check_reaping(runner: ZapretRunner) -> bool:
+    """Осиротевший процесс останавливается, чужой с тем же PID — нет."""
+    orphan = subprocess.Popen(
+        stub_launcher(ignore_term=True),
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        creationflags=DETACHED_CREATION_FLAGS,
+    )
+    try:
+        time.sleep(0.2)
+        start = process_start_time(orphan.pid)
+        if start is None:
+            print("# process start time is unavailable on this platform", file=sys.stderr)
+            return True
+        # Владелец lock-файла уже завершился.
+        owner = subprocess.Popen([sys.executable, "-c", "pass"])
+        owner.wait()
+
+        def write_lock(entry_start: int) -> None:
+            with open(runner.lock_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "owner": {"pid": owner.pid, "start": 0},
+                        "processes": [{"pid": orphan.pid, "start": entry_start}],
+                    },
+                    f,
+                )
+
+        write_lock(start + 1)
+        if runner.reap_orphans() or not pid_alive(orphan.pid):
+            print("FAIL: a process with a different start time was stopped", file=sys.stderr)
+            return False
+        write_lock(start)
+        started = time.perf_counter()
+        reaped = runner.reap_orphans()
+        elapsed = time.perf_counter() - started
+        print(f"# orphans reaped: {len(reaped)} in {elapsed * 1000:.1f} ms")
+        if reaped != [orphan.pid] or pid_alive(orphan.pid) or os.path.exists(runner.lock_path):
+            print("FAIL: orphaned process was not reaped", file=sys.stderr)
+            return False
+        return True
+    finally:
+        if orphan.poll() is None:
+            orphan.kill()
+        orphan.wait()
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure bounded process termination.")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--graceful-timeout", type=float, default=0.5)
+    parser.add_argument("--kill-timeout", type=float, default=1.0)
+    parser.add_argument("--profile")
+    args = parser.parse_args(argv)
+
+    runner = ZapretRunner()
+    # Заглушка ведет себя как winws.
+    runner.use_backend(WinwsBackend(WINWS_EXE_PATH))
+    runner.graceful_timeout = args.graceful_timeout
+    runner.kill_timeout = args.kill_timeout
+    profile = args.profile or next(iter(runner.registry))
+    bound = args.graceful_timeout + args.kill_timeout + 0.5
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        runner.lock_path = os.path.join(tmp, "winws.lock")
+        print("scenario\tstops\tfailed\tp50_ms\tp95_ms\tp99_ms\tmax_ms")
+        for name, config in SCENARIOS.items():
+            failures = run_scenario(runner, profile, config, args.runs)
+            stats = runner.stop_latency.summary()
+            print(
+                f"{name}\t{int(stats['count'])}\t{failures}\t"
+                + "\t".join(f"{stats[q] * 1000:.1f}" for q in ("p50", "p95", "p99", "max"))
+            )
+            if failures or stats["max"] > bound:
+                failed = True
+        if not check_reaping(runner):
+            failed = True
+
+    if failed:
+        print(f"FAIL: a stop was not confirmed within {bound:.1f} s", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
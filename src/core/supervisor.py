@@ -0,0 +1,342 @@
+import asyncio
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Final, Optional
+
+from src.core import lifecycle
+from src.core.latency import LatencyRecorder
+from src.core.registry import ProfileEntry
+from src.gui.translations import translator
+from src.scripts.commands import ZapretRunner
+
+
+STATE_STOPPED: Final[str] = "stopped"
+STATE_STARTING: Final[str] = "starting"
+STATE_RUNNING: Final[str] = "running"
+STATE_STOPPING: Final[str] = "stopping"
+STATE_RESTARTING: Final[str] = "restarting"
+
+
+@dataclass(frozen=True)
+class SupervisorState:
+    status: str
+    profile: Optional[str] = None
+    error: Optional[str] = None
+
+
+class ProcessSupervisor:
+    """Долгоживущий владелец процесса winws.
+
+    Работает на собственном asyncio-цикле в отдельном потоке. Команды
+    интерфейса только задают желаемое состояние: серия быстрых нажатий
+    схлопывается в последнее. Если процесс неожиданно завершился, профиль
+    перезапускается с экспоненциальной задержкой. При переключении новый
+    профиль сначала подготавливается (проверка argv, чтение списков), и
+    только затем старый процесс останавливается и сразу запускается новый;
+    длительность этого окна записывается в switch_gaps. Все изменения состояния
+    передаются в один обработчик listener (вызывается из потока супервизора).
+    """
+
+    def __init__(
+        self,
+        runner: ZapretRunner,
+        listener: Callable[[SupervisorState], None],
+        *,
+        backoff_initial: float = 0.5,
+        backoff_max: float = 30.0,
+        max_restarts: int = 5,
+        stable_after: float = 10.0,
+    ):
+        self._runner: ZapretRunner = runner
+        self._listener: Callable[[SupervisorState], None] = listener
+        self._backoff_initial: float = backoff_initial
+        self._backoff_max: float = backoff_max
+        self._max_restarts: int = max_restarts
+        self._stable_after: float = stable_after
+
+        self._loop: asyncio.AbstractEventLoop = asyncio.new_event_loop()
+        self._thread: threading.Thread = threading.Thread(
+            target=self._run_loop, name="zapret-supervisor", daemon=True
+        )
+        self._wakeup: Optional[asyncio.Event] = None
+        self._reconciler: Optional[asyncio.Task] = None
+        # Ожидания выхода процессов, которые остановлены в обход _supervise.
+        self._exit_watchers: set[asyncio.Future] = set()
+        self._desired: Optional[str] = None
+        self._actual: Optional[str] = None
+        # Запрошен перезапуск текущего профиля (например, изменились его списки).
+        self._stale: bool = False
+        self._state: SupervisorState = SupervisorState(STATE_STOPPED)
+        self._state_changed: threading.Condition = threading.Condition()
+        self._generation: int = 0
+        self.switch_gaps: LatencyRecorder = LatencyRecorder()
+
+    @property
+    def state(self) -> SupervisorState:
+        return self._state
+
+    @property
+    def desired(self) -> Optional[str]:
+        return self._desired
+
+    def start(self) -> None:
+        ready = threading.Event()
+        self._loop.call_soon(ready.set)
+        self._thread.start()
+        ready.wait()
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._wakeup = asyncio.Event()
+        self._reconciler = self._loop.create_task(self._reconcile())
+        self._loop.run_forever()
+
+    def request(self, profile: Optional[str]) -> None:
+        """Задает желаемый профиль (None — остановить). Потокобезопасно."""
+        self._loop.call_soon_threadsafe(self._set_desired, profile)
+
+    def toggle(self, profile: str) -> None:
+        """Останавливает профиль, если он желаемый, иначе переключается на него."""
+        self._loop.call_soon_threadsafe(
+            lambda: self._set_desired(None if self._desired == profile else profile)
+        )
+
+    def _set_desired(self, profile: Optional[str]) -> None:
+        self._desired = profile
+        self._wakeup.set()
+
+    def reload(self) -> None:
+        """Перезапускает текущий профиль с перечитанными файлами (make-before-break)."""
+        self._loop.call_soon_threadsafe(self._mark_stale)
+
+    def _mark_stale(self) -> None:
+        if self._actual is not None and self._desired == self._actual:
+            self._stale = True
+            self._wakeup.set()
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Останавливает процесс и цикл супервизора."""
+        if not self._thread.is_alive():
+            return
+        future = asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop)
+        try:
+            future.result(timeout)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            self._loop.close()
+
+    async def _shutdown(self) -> None:
+        if self._reconciler:
+            self._reconciler.cancel()
+            await asyncio.gather(self._reconciler, return_exceptions=True)
+        self._desired = None
+        if self._actual is not None:
+            await self._stop()
+        if self._exit_watchers:
+            await asyncio.wait(self._exit_watchers, timeout=1.0)
+
+    @property
+    def generation(self) -> int:
+        """Счетчик изменений состояния; используется вместе с wait_until_settled."""
+        return self._generation
+
+    def wait_until_settled(
+        self, profile: Optional[str], timeout: float, since: int = -1
+    ) -> SupervisorState:
+        """Ждет, пока профиль запустится (или процесс остановится при profile=None).
+
+        Ошибка запуска учитывается, только если она произошла после
+        изменения состояния с номером since.
+        """
+
+        def settled() -> bool:
+            state = self._state
+            if state.error and self._generation > since:
+                return state.status in (STATE_RUNNING, STATE_STOPPED)
+            if state.status == STATE_RUNNING:
+                return state.profile == profile
+            return state.status == STATE_STOPPED and profile is None
+
+        with self._state_changed:
+            self._state_changed.wait_for(settled, timeout)
+            return self._state
+
+    def _emit(self, status: str, profile: Optional[str] = None, error: Optional[str] = None) -> None:
+        with self._state_changed:
+            self._state = SupervisorState(status, profile, error)
+            self._generation += 1
+            self._state_changed.notify_all()
+        try:
+            self._listener(self._state)
+        except Exception:
+            pass
+
+    async def _reconcile(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._desired != self._actual or self._stale:
+                self._stale = False
+                target = self._desired
+                if target is None:
+                    await self._stop()
+                    continue
+                # Make-before-break: текущий профиль работает, пока готовится новый.
+                lifecycle.mark("start_requested", target)
+                try:
+                    entry = await asyncio.to_thread(self._runner.prepare, target)
+                    lifecycle.mark("argv_built", target)
+                except Exception as e:
+                    if self._desired == target:
+                        self._desired = self._actual
+                    if self._actual is not None:
+                        self._emit(STATE_RUNNING, self._actual, str(e))
+                        # Прежние процессы продолжают работать под наблюдением.
+                        await self._watch(self._actual)
+                    else:
+                        self._emit(STATE_STOPPED, None, str(e))
+                    continue
+                if target == self._desired:
+                    await self._supervise(target, entry)
+
+    async def _stop(self) -> None:
+        profile = self._actual
+        lifecycle.mark("stop_requested", profile)
+        self._emit(STATE_STOPPING, profile)
+        error: Optional[str] = None
+        try:
+            await asyncio.to_thread(self._runner.terminate)
+        except RuntimeError as e:
+            error = str(e)
+        self._actual = None
+        self._emit(STATE_STOPPED, None, error)
+        lifecycle.mark("stopped", profile)
+
+    def _launch(self, entry: ProfileEntry, replace: bool) -> None:
+        """Останавливает текущий процесс (если replace) и сразу запускает новый."""
+        if not replace:
+            self._runner.spawn(entry)
+            return
+        started = time.perf_counter()
+        lifecycle.mark("stop_requested", self._actual)
+        try:
+            self._runner.terminate()
+        except RuntimeError:
+            pass
+        self._runner.spawn(entry)
+        self.switch_gaps.record(time.perf_counter() - started)
+
+    async def _start(
+        self, profile: str, entry: Optional[ProfileEntry] = None
+    ) -> Optional[subprocess.Popen]:
+        try:
+            if entry is None:
+                entry = await asyncio.to_thread(self._runner.prepare, profile)
+            await asyncio.to_thread(self._launch, entry, self._actual is not None)
+        except Exception as e:
+            self._actual = None
+            self._emit(STATE_STOPPED, None, str(e))
+            return None
+        self._actual = profile
+        self._emit(STATE_RUNNING, profile)
+        lifecycle.mark("started", profile)
+        return self._runner.current_process
+
+    async def _supervise(self, profile: str, entry: Optional[ProfileEntry] = None) -> None:
+        """Запускает профиль и, пока он желаемый, перезапускает упавшие процессы.
+
+        В режиме шардов перезапускается только упавший шард, остальные
+        продолжают работать; для внешнего мира профиль остается одним целым.
+        """
+        self._emit(STATE_STARTING, profile)
+        if await self._start(profile, entry) is None:
+            if self._desired == profile:
+                self._desired = None
+            return
+        await self._watch(profile)
+
+    async def _watch(self, profile: str) -> None:
+        """Следит за процессами профиля и перезапускает упавшие шарды."""
+        restarts: dict[int, int] = {}
+        watchers: dict[asyncio.Future, tuple[int, float]] = {}
+
+        def watch(index: int) -> None:
+            exit_wait = asyncio.ensure_future(
+                asyncio.to_thread(self._runner.processes[index].wait)
+            )
+            self._exit_watchers.add(exit_wait)
+            exit_wait.add_done_callback(self._exit_watchers.discard)
+            watchers[exit_wait] = (index, time.monotonic())
+
+        for index in range(len(self._runner.processes)):
+            watch(index)
+
+        while self._desired == profile:
+            wakeup_wait = asyncio.ensure_future(self._wakeup.wait())
+            try:
+                done, _ = await asyncio.wait(
+                    {*watchers, wakeup_wait}, return_when=asyncio.FIRST_COMPLETED
+                )
+            finally:
+                wakeup_wait.cancel()
+            exit_wait = next((future for future in done if future in watchers), None)
+            if exit_wait is None:
+                if self._desired != profile or self._stale:
+                    # Остановку, переключение или перезапуск выполнит _reconcile.
+                    return
+                self._wakeup.clear()
+                continue
+
+            index, started = watchers.pop(exit_wait)
+            if time.monotonic() - started >= self._stable_after:
+                restarts[index] = 0
+            restarts[index] = restarts.get(index, 0) + 1
+            message = translator.translate(
+                "process_crashed", "Zapret process exited unexpectedly. Exit code: {code}"
+            ).format(code=exit_wait.result())
+            if restarts[index] > self._max_restarts:
+                await self._abandon(profile, message)
+                return
+
+            self._emit(STATE_RESTARTING, profile, message)
+            if not await self._backoff(profile, restarts[index]):
+                return
+            try:
+                await asyncio.to_thread(self._runner.respawn, index)
+            except Exception as e:
+                await self._abandon(profile, str(e))
+                return
+            watch(index)
+            self._emit(STATE_RUNNING, profile)
+
+    async def _backoff(self, profile: str, attempt: int) -> bool:
+        """Выжидает задержку перед перезапуском. False, если профиль больше не нужен."""
+        delay = min(self._backoff_initial * 2 ** (attempt - 1), self._backoff_max)
+        deadline = time.monotonic() + delay
+        while self._desired == profile:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+            if self._desired == profile:
+                self._wakeup.clear()
+        return self._desired == profile
+
+    async def _abandon(self, profile: str, message: str) -> None:
+        """Останавливает все процессы профиля, который не удалось удержать."""
+        if self._desired == profile:
+            self._desired = None
+        try:
+            await asyncio.to_thread(self._runner.terminate)
+        except RuntimeError:
+            pass
+        self._actual = None
+        self._emit(STATE_STOPPED, None, message)
@@ -0,0 +1,77 @@
+"""Стресс-тест переключения профилей под супервизором на заглушке winws.
+
+``python -m src.core.switch_bench --switches 2000 --max-gap-ms 50``
+переключает профили по кругу и завершается с кодом 1, если окно без
+запущенного процесса (switch gap) хотя бы раз превысило порог или
+какое-то переключение не завершилось.
+"""
+
+import argparse
+import sys
+import time
+from typing import Optional
+
+from src.core.backends import WinwsBackend
+from src.core.paths import isolated_data_dir
+from src.core.supervisor import STATE_RUNNING, ProcessSupervisor
+from src.core.winws_stub import stub_launcher
+from src.scripts.commands import WINWS_EXE_PATH, ZapretRunner
+
+
+def run_switches(
+    supervisor: ProcessSupervisor, profiles: list[str], switches: int, timeout: float
+) -> int:
+    """Выполняет switches переключений и возвращает число неудачных."""
+    failures = 0
+    for i in range(switches):
+        profile = profiles[i % len(profiles)]
+        since = supervisor.generation
+        supervisor.request(profile)
+        state = supervisor.wait_until_settled(profile, timeout, since)
+        if state.status != STATE_RUNNING or state.profile != profile:
+            failures += 1
+    return failures
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure the profile switch gap.")
+    parser.add_argument("--switches", type=int, default=2000)
+    parser.add_argument("--max-gap-ms", type=float, default=50.0)
+    parser.add_argument("--profile", action="append", dest="profiles")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    args = parser.parse_args(argv)
+
+    # Файлы заглушек не должны попасть в каталог данных работающего экземпляра.
+    with isolated_data_dir():
+        runner = ZapretRunner()
+        # Заглушка ведет себя как winws.
+        runner.use_backend(WinwsBackend(WINWS_EXE_PATH))
+        runner.registry.set_launcher(stub_launcher())
+        profiles = args.profiles or list(runner.registry)[:2]
+        if len(profiles) < 2:
+            parser.error("at least two profiles are required")
+
+        supervisor = ProcessSupervisor(runner, lambda state: None)
+        supervisor.start()
+        started = time.perf_counter()
+        try:
+            failures = run_switches(supervisor, profiles, args.switches, args.timeout)
+        finally:
+            supervisor.shutdown()
+        elapsed = time.perf_counter() - started
+
+        summary = supervisor.switch_gaps.summary()
+        print(f"switches\t{args.switches}\tfailed\t{failures}\telapsed_s\t{elapsed:.2f}")
+        for key, value in summary.items():
+            print(f"gap_{key}" + ("" if key == "count" else "_ms") + "\t"
+                  + (f"{int(value)}" if key == "count" else f"{value * 1000:.3f}"))
+
+        if failures or summary["max"] * 1000 > args.max_gap_ms:
+            print(f"FAIL: switch gap bound {args.max_gap_ms} ms exceeded or switches failed",
+                  file=sys.stderr)
+            return 1
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
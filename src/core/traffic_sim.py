@@ -0,0 +1,1128 @@
+"""Офлайн-оценка того, сколько трафика профиль отправит в winws.
+
+Захват pcap или pcapng читается потоково, блоками в один буфер;
+записи разбираются через memoryview без копирования. Для каждого
+пакета извлекается 5-tuple, для первых пакетов потока — имя хоста:
+SNI из TLS ClientHello (в том числе разбитого на несколько сегментов),
+Host из HTTP-запроса и SNI из QUIC Initial. Initial расшифровывается
+ключами, выведенными из DCID по RFC 9001.
+
+Пакет потока перехватывается профилем, если порт сервера входит в
+--wf-tcp/--wf-udp. Исходящий пакет обрабатывается первой секцией,
+которая подходит по --filter-*, --hostlist и --ipset (как в
+CoverageIndex). Пока имя хоста не известно, секции с --hostlist не
+подходят. Решение принимается один раз на поток и пересчитывается,
+только когда стало известно имя хоста. Сами пакеты лишь увеличивают
+счетчик класса потока (набора ячеек профилей и секций).
+
+``python -m src.core.traffic_sim run capture.pcapng`` печатает по каждому
+профилю и секции число пакетов, байты, долю от всего трафика и
+среднюю/пиковую частоту пакетов в секунду.
+"""
+
+import argparse
+import hmac
+import os
+import random
+import socket
+import struct
+import sys
+import tempfile
+import time
+from hashlib import sha256
+from itertools import islice
+from typing import Final, Iterator, Optional
+
+from src.core.coverage import CoverageIndex
+from src.core.lists import iter_list_file
+from src.core.profiles import load_profiles, ports_contain, resolve_path
+
+
+READ_CHUNK: Final[int] = 8 << 20
+PCAP_MAGIC_US: Final[int] = 0xA1B2C3D4
+PCAP_MAGIC_NS: Final[int] = 0xA1B23C4D
+PCAPNG_SHB: Final[int] = 0x0A0D0D0A
+PCAPNG_BYTE_ORDER: Final[int] = 0x1A2B3C4D
+PCAPNG_IDB: Final[int] = 1
+PCAPNG_SPB: Final[int] = 3
+PCAPNG_EPB: Final[int] = 6
+IDB_TSRESOL: Final[int] = 9
+
+LINKTYPE_NULL: Final[int] = 0
+LINKTYPE_ETHERNET: Final[int] = 1
+LINKTYPE_RAW: Final[int] = 101
+LINKTYPE_LOOP: Final[int] = 108
+LINKTYPE_LINUX_SLL: Final[int] = 113
+LINKTYPE_IPV4: Final[int] = 228
+LINKTYPE_IPV6: Final[int] = 229
+LINKTYPE_LINUX_SLL2: Final[int] = 276
+# Смещение IP-заголовка для типов канального уровня без ethertype.
+_LINK_OFFSETS: Final[dict[int, int]] = {
+    LINKTYPE_NULL: 4,
+    LINKTYPE_LOOP: 4,
+    LINKTYPE_RAW: 0,
+    12: 0,
+    14: 0,
+    LINKTYPE_IPV4: 0,
+    LINKTYPE_IPV6: 0,
+    LINKTYPE_LINUX_SLL: 16,
+    LINKTYPE_LINUX_SLL2: 20,
+}
+_ETHERTYPE_IPV4: Final[int] = 0x0800
+_ETHERTYPE_IPV6: Final[int] = 0x86DD
+_ETHERTYPE_VLAN: Final[frozenset[int]] = frozenset({0x8100, 0x88A8, 0x9100})
+_IPV6_EXTENSIONS: Final[frozenset[int]] = frozenset({0, 43, 60})
+_IPV6_FRAGMENT: Final[int] = 44
+
+PROTO_TCP: Final[int] = 6
+PROTO_UDP: Final[int] = 17
+PROTOCOL_NAMES: Final[dict[int, str]] = {PROTO_TCP: "tcp", PROTO_UDP: "udp"}
+_TCP_SYN: Final[int] = 0x02
+_TCP_ACK: Final[int] = 0x10
+
+# Сколько исходящих пакетов с данными потока просматривать в поисках имени хоста.
+HOST_ATTEMPTS: Final[int] = 4
+PENDING_LIMIT: Final[int] = 16384
+HTTP_HEAD_LIMIT: Final[int] = 4096
+DEFAULT_MAX_FLOWS: Final[int] = 1 << 20
+_HTTP_METHODS: Final[tuple[bytes, ...]] = (
+    b"GET ", b"POST ", b"HEAD ", b"PUT ", b"DELETE ", b"OPTIONS ", b"CONNECT ", b"PATCH ",
+)
+
+QUIC_V1: Final[int] = 1
+QUIC_V1_SALT: Final[bytes] = bytes.fromhex("38762cf7f55934b34d179ae6a4c80cadccbb7f0a")
+_QUIC_TAG: Final[int] = 16
+_QUIC_FRAME_PING: Final[int] = 0x01
+_QUIC_FRAME_ACK: Final[frozenset[int]] = frozenset({0x02, 0x03})
+_QUIC_FRAME_CRYPTO: Final[int] = 0x06
+
+HOST_TLS: Final[str] = "tls"
+HOST_HTTP: Final[str] = "http"
+HOST_QUIC: Final[str] = "quic"
+
+
+# --- AES-128 (только шифрование блока: его достаточно для CTR и защиты заголовка QUIC)
+
+_aes_tables: Optional[tuple[list[int], list[list[int]]]] = None
+
+
+def _rotl8(value: int, shift: int) -> int:
+    return ((value << shift) | (value >> (8 - shift))) & 0xFF
+
+
+def _build_aes_tables() -> tuple[list[int], list[list[int]]]:
+    global _aes_tables
+    if _aes_tables is not None:
+        return _aes_tables
+    sbox = [0] * 256
+    p = q = 1
+    while True:
+        # p умножается на 3, q делится на 3 в GF(2^8): q = p^-1.
+        p ^= ((p << 1) ^ (0x1B if p & 0x80 else 0)) & 0xFF
+        q ^= q << 1
+        q ^= q << 2
+        q ^= q << 4
+        q &= 0xFF
+        if q & 0x80:
+            q ^= 0x09
+        sbox[p] = q ^ _rotl8(q, 1) ^ _rotl8(q, 2) ^ _rotl8(q, 3) ^ _rotl8(q, 4) ^ 0x63
+        if p == 1:
+            break
+    sbox[0] = 0x63
+    t0 = []
+    for s in sbox:
+        s2 = ((s << 1) ^ (0x1B if s & 0x80 else 0)) & 0xFF
+        t0.append(s2 << 24 | s << 16 | s << 8 | (s2 ^ s))
+    tables = [t0]
+    for _ in range(3):
+        tables.append([(t >> 8) | ((t & 0xFF) << 24) for t in tables[-1]])
+    _aes_tables = (sbox, tables)
+    return _aes_tables
+
+
+class Aes128:
+    """Блочное шифрование AES-128 на T-таблицах, без зависимостей."""
+
+    def __init__(self, key: bytes):
+        sbox, self._tables = _build_aes_tables()
+        self._sbox: list[int] = sbox
+        words = list(struct.unpack(">4I", key))
+        rcon = 1
+        for i in range(4, 44):
+            temp = words[i - 1]
+            if i % 4 == 0:
+                temp = ((temp << 8) | (temp >> 24)) & 0xFFFFFFFF
+                temp = (
+                    sbox[temp >> 24] << 24 | sbox[temp >> 16 & 255] << 16
+                    | sbox[temp >> 8 & 255] << 8 | sbox[temp & 255]
+                ) ^ (rcon << 24)
+                rcon = ((rcon << 1) ^ (0x1B if rcon & 0x80 else 0)) & 0xFF
+            words.append(words[i - 4] ^ temp)
+        self._round_keys: list[int] = words
+
+    def encrypt_block(self, block: bytes) -> bytes:
+        t0, t1, t2, t3 = self._tables
+        sbox, rk = self._sbox, self._round_keys
+        s0, s1, s2, s3 = struct.unpack(">4I", block)
+        s0, s1, s2, s3 = s0 ^ rk[0], s1 ^ rk[1], s2 ^ rk[2], s3 ^ rk[3]
+        for r in range(4, 40, 4):
+            s0, s1, s2, s3 = (
+                t0[s0 >> 24] ^ t1[s1 >> 16 & 255] ^ t2[s2 >> 8 & 255] ^ t3[s3 & 255] ^ rk[r],
+                t0[s1 >> 24] ^ t1[s2 >> 16 & 255] ^ t2[s3 >> 8 & 255] ^ t3[s0 & 255] ^ rk[r + 1],
+                t0[s2 >> 24] ^ t1[s3 >> 16 & 255] ^ t2[s0 >> 8 & 255] ^ t3[s1 & 255] ^ rk[r + 2],
+                t0[s3 >> 24] ^ t1[s0 >> 16 & 255] ^ t2[s1 >> 8 & 255] ^ t3[s2 & 255] ^ rk[r + 3],
+            )
+        return struct.pack(
+            ">4I",
+            (sbox[s0 >> 24] << 24 | sbox[s1 >> 16 & 255] << 16 | sbox[s2 >> 8 & 255] << 8 | sbox[s3 & 255]) ^ rk[40],
+            (sbox[s1 >> 24] << 24 | sbox[s2 >> 16 & 255] << 16 | sbox[s3 >> 8 & 255] << 8 | sbox[s0 & 255]) ^ rk[41],
+            (sbox[s2 >> 24] << 24 | sbox[s3 >> 16 & 255] << 16 | sbox[s0 >> 8 & 255] << 8 | sbox[s1 & 255]) ^ rk[42],
+            (sbox[s3 >> 24] << 24 | sbox[s0 >> 16 & 255] << 16 | sbox[s1 >> 8 & 255] << 8 | sbox[s2 & 255]) ^ rk[43],
+        )
+
+    def ctr_xor(self, nonce: bytes, data: bytes, first_counter: int = 2) -> bytes:
+        """AES-CTR в режиме GCM (счетчик 32 бита после 96-битного nonce)."""
+        blocks = (len(data) + 15) // 16
+        stream = b"".join(
+            self.encrypt_block(nonce + (first_counter + i).to_bytes(4, "big")) for i in range(blocks)
+        )
+        size = len(data)
+        return (int.from_bytes(data, "big") ^ int.from_bytes(stream[:size], "big")).to_bytes(size, "big")
+
+
+# --- QUIC Initial (RFC 9000, RFC 9001)
+
+
+def hkdf_expand_label(secret: bytes, label: str, length: int) -> bytes:
+    full_label = b"tls13 " + label.encode("ascii")
+    info = struct.pack("!HB", length, len(full_label)) + full_label + b"\x00"
+    return hmac.new(secret, info + b"\x01", sha256).digest()[:length]
+
+
+def quic_initial_keys(dcid: bytes) -> tuple[bytes, bytes, bytes]:
+    """Ключ, IV и ключ защиты заголовка клиентских Initial-пакетов QUIC v1."""
+    initial_secret = hmac.new(QUIC_V1_SALT, dcid, sha256).digest()
+    client_secret = hkdf_expand_label(initial_secret, "client in", 32)
+    return (
+        hkdf_expand_label(client_secret, "quic key", 16),
+        hkdf_expand_label(client_secret, "quic iv", 12),
+        hkdf_expand_label(client_secret, "quic hp", 16),
+    )
+
+
+def _read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    first = data[pos]
+    size = 1 << (first >> 6)
+    value = first & 0x3F
+    for byte in data[pos + 1:pos + size]:
+        value = value << 8 | byte
+    if pos + size > len(data):
+        raise IndexError("truncated varint")
+    return value, pos + size
+
+
+def encode_varint(value: int) -> bytes:
+    for size, prefix in ((1, 0), (2, 0x40), (4, 0x80), (8, 0xC0)):
+        if value < 1 << (size * 8 - 2):
+            return (value | prefix << (size * 8 - 8)).to_bytes(size, "big")
+    raise ValueError(f"{value} does not fit a QUIC varint")
+
+
+def is_quic_initial(payload) -> bool:
+    return (
+        len(payload) >= 7
+        and payload[0] & 0xF0 == 0xC0
+        and int.from_bytes(payload[1:5], "big") == QUIC_V1
+    )
+
+
+def decrypt_initial(datagram: bytes) -> Optional[list[tuple[int, bytes]]]:
+    """CRYPTO-фреймы (смещение, данные) первого Initial-пакета датаграммы клиента."""
+    try:
+        dcid_len = datagram[5]
+        dcid = datagram[6:6 + dcid_len]
+        pos = 6 + dcid_len
+        pos += 1 + datagram[pos]
+        token_len, pos = _read_varint(datagram, pos)
+        length, pos = _read_varint(datagram, pos + token_len)
+        if pos + length > len(datagram) or length < 20:
+            return None
+        key, iv, hp = quic_initial_keys(dcid)
+        mask = Aes128(hp).encrypt_block(datagram[pos + 4:pos + 20])
+        first = datagram[0] ^ (mask[0] & 0x0F)
+        pn_len = (first & 0x03) + 1
+        packet_number = int.from_bytes(
+            bytes(b ^ m for b, m in zip(datagram[pos:pos + pn_len], mask[1:1 + pn_len])), "big"
+        )
+        nonce = (int.from_bytes(iv, "big") ^ packet_number).to_bytes(12, "big")
+        ciphertext = datagram[pos + pn_len:pos + length - _QUIC_TAG]
+        # Тег GCM не проверяется: для оценки достаточно расшифровать.
+        plain = Aes128(key).ctr_xor(nonce, ciphertext)
+    except IndexError:
+        return None
+    frames: list[tuple[int, bytes]] = []
+    pos = 0
+    try:
+        while pos < len(plain):
+            if not plain[pos]:
+                # Серия PADDING-фреймов.
+                pos = len(plain) - len(plain[pos:].lstrip(b"\0"))
+                continue
+            frame_type, pos = _read_varint(plain, pos)
+            if frame_type == _QUIC_FRAME_PING:
+                continue
+            if frame_type == _QUIC_FRAME_CRYPTO:
+                offset, pos = _read_varint(plain, pos)
+                size, pos = _read_varint(plain, pos)
+                frames.append((offset, plain[pos:pos + size]))
+                pos += size
+            elif frame_type in _QUIC_FRAME_ACK:
+                _, pos = _read_varint(plain, pos)
+                _, pos = _read_varint(plain, pos)
+                ranges, pos = _read_varint(plain, pos)
+                for _ in range(ranges * 2 + 1 + (3 if frame_type == 0x03 else 0)):
+                    _, pos = _read_varint(plain, pos)
+            else:
+                break
+    except IndexError:
+        pass
+    return frames
+
+
+def build_initial(dcid: bytes, frames: list[tuple[int, bytes]], packet_number: int, pad_to: int = 1200) -> bytes:
+    """Защищенный Initial-пакет клиента с заданными CRYPTO-фреймами (для синтетических захватов)."""
+    key, iv, hp = quic_initial_keys(dcid)
+    pn_len = 2
+    header = bytes((0xC0 | (pn_len - 1),)) + QUIC_V1.to_bytes(4, "big") + bytes((len(dcid),)) + dcid + b"\x00\x00"
+    payload = b"".join(
+        bytes((_QUIC_FRAME_CRYPTO,)) + encode_varint(offset) + encode_varint(len(data)) + data
+        for offset, data in frames
+    )
+    overhead = len(header) + 2 + pn_len + _QUIC_TAG
+    payload += bytes(max(0, pad_to - overhead - len(payload)))
+    header += (0x4000 | (pn_len + len(payload) + _QUIC_TAG)).to_bytes(2, "big")
+    nonce = (int.from_bytes(iv, "big") ^ packet_number).to_bytes(12, "big")
+    body = Aes128(key).ctr_xor(nonce, payload) + bytes(_QUIC_TAG)
+    pn_offset = len(header)
+    packet = bytearray(header + packet_number.to_bytes(pn_len, "big") + body)
+    mask = Aes128(hp).encrypt_block(bytes(packet[pn_offset + 4:pn_offset + 20]))
+    packet[0] ^= mask[0] & 0x0F
+    for i in range(pn_len):
+        packet[pn_offset + i] ^= mask[1 + i]
+    return bytes(packet)
+
+
+# --- Имена хостов
+
+
+def client_hello_sni(handshake: bytes) -> Optional[str]:
+    """SNI из сообщения ClientHello; None, если его нет или данных пока недостаточно."""
+    try:
+        if handshake[0] != 1:
+            return None
+        end = min(len(handshake), 4 + int.from_bytes(handshake[1:4], "big"))
+        pos = 4 + 2 + 32
+        pos += 1 + handshake[pos]
+        pos += 2 + int.from_bytes(handshake[pos:pos + 2], "big")
+        pos += 1 + handshake[pos]
+        extensions_end = min(end, pos + 2 + int.from_bytes(handshake[pos:pos + 2], "big"))
+        pos += 2
+        while pos + 4 <= extensions_end:
+            ext_type = int.from_bytes(handshake[pos:pos + 2], "big")
+            ext_len = int.from_bytes(handshake[pos + 2:pos + 4], "big")
+            pos += 4
+            if ext_type == 0:
+                if pos + ext_len > extensions_end:
+                    return None
+                name_len = int.from_bytes(handshake[pos + 3:pos + 5], "big")
+                name = bytes(handshake[pos + 5:pos + 5 + name_len])
+                return name.decode("ascii", "replace").lower() or None
+            pos += ext_len
+    except IndexError:
+        pass
+    return None
+
+
+def tls_handshake(stream: bytes) -> bytes:
+    """Содержимое подряд идущих TLS-записей handshake (последняя может быть неполной)."""
+    parts: list[bytes] = []
+    pos = 0
+    while pos + 5 <= len(stream) and stream[pos] == 0x16:
+        length = int.from_bytes(stream[pos + 3:pos + 5], "big")
+        parts.append(stream[pos + 5:pos + 5 + length])
+        pos += 5 + length
+    return b"".join(parts)
+
+
+def http_host(payload) -> Optional[str]:
+    head = bytes(payload[:HTTP_HEAD_LIMIT])
+    if not head.startswith(_HTTP_METHODS):
+        return None
+    start = head.lower().find(b"\r\nhost:")
+    if start < 0:
+        return None
+    start += len(b"\r\nhost:")
+    end = head.find(b"\r\n", start)
+    host = head[start:end if end >= 0 else len(head)].strip().decode("ascii", "replace").lower()
+    if host.startswith("["):
+        host = host[1:host.find("]")] if "]" in host else host
+    elif host.count(":") == 1:
+        host = host.partition(":")[0]
+    return host or None
+
+
+# --- Чтение захвата
+
+
+class CaptureError(ValueError):
+    """Поврежденный или неподдерживаемый файл захвата; offset — смещение в байтах."""
+
+    def __init__(self, message: str, offset: int):
+        super().__init__(f"{message} (at byte {offset})")
+        self.offset: int = offset
+
+
+class _Stream:
+    """Последовательное чтение файла через один переиспользуемый буфер."""
+
+    def __init__(self, f, size: int = READ_CHUNK):
+        self._f = f
+        self._buffer: bytearray = bytearray(size)
+        self._view: memoryview = memoryview(self._buffer)
+        self._start: int = 0
+        self._end: int = 0
+        # Смещение следующего непрочитанного байта от начала файла.
+        self.position: int = 0
+
+    def take(self, n: int) -> Optional[memoryview]:
+        """Следующие n байт как memoryview; действителен до следующего вызова."""
+        if self._end - self._start < n and not self._fill(n):
+            return None
+        start = self._start
+        self._start += n
+        self.position += n
+        return self._view[start:start + n]
+
+    def _fill(self, n: int) -> bool:
+        if n > len(self._buffer):
+            raise CaptureError(f"Capture record of {n} bytes exceeds the read buffer", self.position)
+        remaining = self._end - self._start
+        self._buffer[:remaining] = self._buffer[self._start:self._end]
+        self._start, self._end = 0, remaining
+        while self._end < n:
+            read = self._f.readinto(self._view[self._end:])
+            if not read:
+                return False
+            self._end += read
+        return True
+
+
+def _iter_pcap(stream: _Stream, header: memoryview) -> Iterator[tuple[float, int, memoryview, int]]:
+    magic = int.from_bytes(header[:4], "little")
+    endian = "<" if magic in (PCAP_MAGIC_US, PCAP_MAGIC_NS) else ">"
+    magic = struct.unpack_from(endian + "I", header)[0]
+    if magic not in (PCAP_MAGIC_US, PCAP_MAGIC_NS):
+        raise ValueError("Not a pcap or pcapng file")
+    scale = 1e-9 if magic == PCAP_MAGIC_NS else 1e-6
+    linktype = struct.unpack_from(endian + "I", header, 20)[0] & 0x0FFFFFFF
+    record = struct.Struct(endian + "IIII")
+    while True:
+        head = stream.take(16)
+        if head is None:
+            return
+        seconds, fraction, captured, wire = record.unpack(head)
+        data = stream.take(captured)
+        if data is None:
+            return
+        yield seconds + fraction * scale, linktype, data, wire
+
+
+def _iter_pcapng(stream: _Stream, first: memoryview) -> Iterator[tuple[float, int, memoryview, int]]:
+    endian = "<"
+    interfaces: list[tuple[int, float, int]] = []
+    pending: Optional[memoryview] = first
+    while True:
+        head = pending if pending is not None else stream.take(8)
+        pending = None
+        if head is None:
+            return
+        offset = stream.position - 8
+        block_type = struct.unpack_from(endian + "I", head)[0]
+        if block_type == PCAPNG_SHB:
+            order = stream.take(4)
+            if order is None:
+                return
+            endian = "<" if int.from_bytes(order, "little") == PCAPNG_BYTE_ORDER else ">"
+            length = struct.unpack_from(endian + "I", head, 4)[0]
+            if length < 16:
+                raise CaptureError(f"Section header block of {length} bytes", offset)
+            if stream.take(length - 12) is None:
+                return
+            interfaces = []
+            continue
+        length = struct.unpack_from(endian + "I", head, 4)[0]
+        # Минимальный блок: тип, длина и повтор длины.
+        if length < 12:
+            raise CaptureError(f"Block of {length} bytes", offset)
+        body = stream.take(length - 8)
+        if body is None:
+            return
+        if block_type == PCAPNG_EPB:
+            if length < 32:
+                raise CaptureError(f"Enhanced packet block of {length} bytes", offset)
+            interface, high, low, captured, wire = struct.unpack_from(endian + "5I", body)
+            if interface >= len(interfaces):
+                raise CaptureError(f"Packet on undeclared interface {interface}", offset)
+            linktype, scale, _ = interfaces[interface]
+            yield (high << 32 | low) * scale, linktype, body[20:20 + captured], wire
+        elif block_type == PCAPNG_SPB:
+            if not interfaces or length < 16:
+                raise CaptureError("Simple packet block without an interface", offset)
+            linktype, _, snaplen = interfaces[0]
+            wire = struct.unpack_from(endian + "I", body)[0]
+            captured = min(wire, length - 16, snaplen or wire)
+            yield 0.0, linktype, body[4:4 + captured], wire
+        elif block_type == PCAPNG_IDB:
+            if length < 20:
+                raise CaptureError(f"Interface description block of {length} bytes", offset)
+            linktype, _, snaplen = struct.unpack_from(endian + "HHI", body)
+            scale = 1e-6
+            pos = 8
+            while pos + 4 <= len(body) - 4:
+                code, size = struct.unpack_from(endian + "HH", body, pos)
+                if code == 0:
+                    break
+                if code == IDB_TSRESOL and size >= 1:
+                    value = body[pos + 4]
+                    scale = 2.0 ** -(value & 0x7F) if value & 0x80 else 10.0 ** -value
+                pos += 4 + (size + 3) // 4 * 4
+            interfaces.append((linktype, scale, snaplen))
+
+
+def iter_packets(f) -> Iterator[tuple[float, int, memoryview, int]]:
+    """(время, тип канального уровня, кадр, длина на проводе) для pcap и pcapng.
+
+    Ошибки разбора приходят как CaptureError со смещением в файле.
+    """
+    stream = _Stream(f)
+    try:
+        first = stream.take(8)
+        if first is None:
+            return
+        if struct.unpack_from("<I", first)[0] == PCAPNG_SHB:
+            yield from _iter_pcapng(stream, first)
+            return
+        rest = stream.take(16)
+        if rest is None:
+            return
+        yield from _iter_pcap(stream, memoryview(bytes(first) + bytes(rest)))
+    except CaptureError:
+        raise
+    except (ValueError, struct.error, IndexError) as e:
+        raise CaptureError(str(e), stream.position) from e
+
+
+def parse_frame(linktype: int, frame: memoryview) -> Optional[tuple[int, bytes, bytes, int, int, int, memoryview]]:
+    """(протокол, адрес источника, адрес назначения, порты, флаги TCP, данные) или None."""
+    try:
+        if linktype == LINKTYPE_ETHERNET:
+            offset = 12
+            ethertype = frame[12] << 8 | frame[13]
+            while ethertype in _ETHERTYPE_VLAN:
+                offset += 4
+                ethertype = frame[offset] << 8 | frame[offset + 1]
+            if ethertype not in (_ETHERTYPE_IPV4, _ETHERTYPE_IPV6):
+                return None
+            offset += 2
+        else:
+            offset = _LINK_OFFSETS.get(linktype, -1)
+            if offset < 0:
+                return None
+        version = frame[offset] >> 4
+        if version == 4:
+            header_len = (frame[offset] & 0x0F) * 4
+            if (frame[offset + 6] & 0x1F) | frame[offset + 7]:
+                return None  # не первый фрагмент: портов нет
+            protocol = frame[offset + 9]
+            total = frame[offset + 2] << 8 | frame[offset + 3]
+            src = bytes(frame[offset + 12:offset + 16])
+            dst = bytes(frame[offset + 16:offset + 20])
+            end = offset + total if total else len(frame)
+            offset += header_len
+        elif version == 6:
+            protocol = frame[offset + 6]
+            end = offset + 40 + (frame[offset + 4] << 8 | frame[offset + 5])
+            src = bytes(frame[offset + 8:offset + 24])
+            dst = bytes(frame[offset + 24:offset + 40])
+            offset += 40
+            while protocol in _IPV6_EXTENSIONS or protocol == _IPV6_FRAGMENT:
+                if protocol == _IPV6_FRAGMENT:
+                    if (frame[offset + 2] << 8 | frame[offset + 3]) & 0xFFF8:
+                        return None
+                    protocol, offset = frame[offset], offset + 8
+                else:
+                    protocol, offset = frame[offset], offset + (frame[offset + 1] + 1) * 8
+        else:
+            return None
+        if protocol == PROTO_TCP:
+            sport, dport = struct.unpack_from("!HH", frame, offset)
+            flags = frame[offset + 13]
+            payload = frame[offset + (frame[offset + 12] >> 4) * 4:end]
+        elif protocol == PROTO_UDP:
+            sport, dport = struct.unpack_from("!HH", frame, offset)
+            flags = 0
+            payload = frame[offset + 8:end]
+        else:
+            return None
+    except (IndexError, struct.error):
+        return None
+    return protocol, src, dst, sport, dport, flags, payload
+
+
+# --- Симуляция
+
+
+class Flow:
+    __slots__ = (
+        "protocol", "client", "server_ip", "server_port", "host",
+        "out_class", "in_class", "pending", "attempts",
+    )
+
+    def __init__(self, protocol: int, client: tuple[bytes, int], server_ip: bytes, server_port: int):
+        self.protocol: int = protocol
+        self.client: tuple[bytes, int] = client
+        self.server_ip: bytes = server_ip
+        self.server_port: int = server_port
+        self.host: Optional[str] = None
+        self.out_class: int = 0
+        self.in_class: int = 0
+        self.pending = None
+        self.attempts: int = 0
+
+
+class TrafficSimulator:
+    """Счетчики пакетов и байт по профилям и секциям.
+
+    Ячейка (profile, None) — все пакеты, перехваченные фильтром WinDivert
+    профиля в обе стороны; (profile, section) — исходящие пакеты, которые
+    обработает эта секция. Пакет увеличивает счетчик своего класса —
+    набора ячеек, общего для многих потоков; по ячейкам классы
+    раскладываются раз в секунду захвата и в finish().
+    """
+
+    def __init__(
+        self,
+        index: CoverageIndex,
+        profiles: Optional[list[str]] = None,
+        max_flows: int = DEFAULT_MAX_FLOWS,
+    ):
+        self.index: CoverageIndex = index
+        self.profiles: list[str] = profiles or list(index.profiles)
+        self.max_flows: int = max_flows
+        self.slots: list[tuple[str, Optional[int]]] = []
+        self._profile_slots: list[int] = []
+        self._section_slots: list[dict[int, int]] = []
+        hostlists: dict[int, object] = {}
+        ipsets: dict[int, object] = {}
+        for name in self.profiles:
+            self._profile_slots.append(len(self.slots))
+            self.slots.append((name, None))
+            sections = {}
+            for section in index.profiles[name].sections:
+                sections[section.index] = len(self.slots)
+                self.slots.append((name, section.index))
+                for trie in section.hostlists + section.hostlist_excludes:
+                    hostlists[id(trie)] = trie
+                for cidrs in section.ipsets + section.ipset_excludes:
+                    ipsets[id(cidrs)] = cidrs
+            self._section_slots.append(sections)
+        # Решение секций зависит от хоста и адреса только через членство в списках.
+        self._hostlists: list = list(hostlists.values())
+        self._ipsets: list = list(ipsets.values())
+        self._verdicts: dict[tuple, tuple[int, int]] = {}
+        self._class_ids: dict[tuple[int, ...], int] = {}
+        self._class_slots: list[tuple[int, ...]] = []
+        self._class_packets: list[int] = []
+        self._class_bytes: list[int] = []
+        self._class_current: list[int] = []
+        size = len(self.slots)
+        self.packets: list[int] = [0] * size
+        self.bytes: list[int] = [0] * size
+        self.peak_pps: list[int] = [0] * size
+        self._second: Optional[int] = None
+        self._flows: dict[tuple, Flow] = {}
+        self.total_packets: int = 0
+        self.total_bytes: int = 0
+        self.skipped: int = 0
+        self.flows_seen: int = 0
+        self.hosts: dict[str, int] = {HOST_TLS: 0, HOST_HTTP: 0, HOST_QUIC: 0}
+        self.first_ts: Optional[float] = None
+        self.last_ts: float = 0.0
+
+    def slots_for(self, protocol: int, server_ip: bytes, port: int, host: Optional[str]) -> tuple[tuple[int, ...], tuple[int, ...]]:
+        """Номера ячеек для исходящих и входящих пакетов потока."""
+        family = socket.AF_INET if len(server_ip) == 4 else socket.AF_INET6
+        ip = socket.inet_ntop(family, server_ip)
+        name = PROTOCOL_NAMES[protocol]
+        outbound: list[int] = []
+        inbound: list[int] = []
+        for i, profile_name in enumerate(self.profiles):
+            profile = self.index.profiles[profile_name]
+            if not ports_contain(profile.wf_tcp if protocol == PROTO_TCP else profile.wf_udp, port):
+                continue
+            outbound.append(self._profile_slots[i])
+            inbound.append(self._profile_slots[i])
+            section = self.index.lookup(profile_name, name, port, host, ip)
+            if section is not None:
+                outbound.append(self._section_slots[i][section.index])
+        return tuple(outbound), tuple(inbound)
+
+    def _class_id(self, slots: tuple[int, ...]) -> int:
+        class_id = self._class_ids.get(slots)
+        if class_id is None:
+            class_id = self._class_ids[slots] = len(self._class_slots)
+            self._class_slots.append(slots)
+            self._class_packets.append(0)
+            self._class_bytes.append(0)
+            self._class_current.append(0)
+        return class_id
+
+    def _classify(self, flow: Flow) -> None:
+        version = 4 if len(flow.server_ip) == 4 else 6
+        value = int.from_bytes(flow.server_ip, "big")
+        key = (
+            flow.protocol,
+            flow.server_port,
+            flow.host is not None,
+            tuple(flow.host in trie for trie in self._hostlists) if flow.host else (),
+            tuple(cidrs.contains_value(version, value) for cidrs in self._ipsets),
+        )
+        verdict = self._verdicts.get(key)
+        if verdict is None:
+            outbound, inbound = self.slots_for(flow.protocol, flow.server_ip, flow.server_port, flow.host)
+            verdict = self._verdicts[key] = (self._class_id(outbound), self._class_id(inbound))
+        flow.out_class, flow.in_class = verdict
+
+    def _new_flow(self, key: tuple, protocol: int, src: bytes, dst: bytes, sport: int, dport: int, flags: int) -> Flow:
+        if protocol == PROTO_TCP and flags & _TCP_SYN:
+            client_is_src = not flags & _TCP_ACK
+        elif protocol == PROTO_TCP:
+            client_is_src = sport > dport
+        else:
+            # Для UDP клиент — первый отправитель, если это не ответ с известного порта.
+            client_is_src = not (sport < 1024 <= dport)
+        if client_is_src:
+            flow = Flow(protocol, (src, sport), dst, dport)
+        else:
+            flow = Flow(protocol, (dst, dport), src, sport)
+        self._classify(flow)
+        if len(self._flows) >= self.max_flows:
+            for stale in list(islice(self._flows, self.max_flows // 4)):
+                del self._flows[stale]
+        self._flows[key] = flow
+        self.flows_seen += 1
+        return flow
+
+    def _extract_host(self, flow: Flow, payload: memoryview) -> None:
+        flow.attempts += 1
+        host: Optional[str] = None
+        source = ""
+        if flow.protocol == PROTO_TCP:
+            if flow.pending is None:
+                if payload[0] == 0x16:
+                    flow.pending = bytearray(payload[:PENDING_LIMIT])
+                else:
+                    host, source = http_host(payload), HOST_HTTP
+                    flow.attempts = HOST_ATTEMPTS
+            elif len(flow.pending) < PENDING_LIMIT:
+                flow.pending += payload[:PENDING_LIMIT - len(flow.pending)]
+            if flow.pending is not None:
+                host, source = client_hello_sni(tls_handshake(bytes(flow.pending))), HOST_TLS
+        elif is_quic_initial(payload):
+            frames = decrypt_initial(bytes(payload))
+            if frames:
+                if flow.pending is None:
+                    flow.pending = {}
+                flow.pending.update(frames)
+                data = b""
+                while len(data) in flow.pending:
+                    data += flow.pending[len(data)]
+                host, source = client_hello_sni(data), HOST_QUIC
+        else:
+            flow.attempts = HOST_ATTEMPTS
+        if host:
+            flow.host = host
+            self.hosts[source] += 1
+            self._classify(flow)
+        if host or flow.attempts >= HOST_ATTEMPTS:
+            flow.pending = None
+            flow.attempts = HOST_ATTEMPTS
+
+    def _roll(self, second: int) -> None:
+        per_slot = [0] * len(self.slots)
+        current = self._class_current
+        for class_id, count in enumerate(current):
+            if count:
+                for slot in self._class_slots[class_id]:
+                    per_slot[slot] += count
+                current[class_id] = 0
+        peaks = self.peak_pps
+        for slot, count in enumerate(per_slot):
+            if count > peaks[slot]:
+                peaks[slot] = count
+        self._second = second
+
+    def feed(
+        self,
+        ts: float,
+        wire_len: int,
+        protocol: int,
+        src: bytes,
+        dst: bytes,
+        sport: int,
+        dport: int,
+        flags: int,
+        payload: memoryview,
+    ) -> None:
+        second = int(ts)
+        if second != self._second:
+            if self.first_ts is None:
+                self.first_ts = ts
+            self._roll(second)
+        self.last_ts = ts
+        a, b = (src, sport), (dst, dport)
+        key = (protocol, a, b) if a <= b else (protocol, b, a)
+        flow = self._flows.get(key)
+        if flow is None:
+            flow = self._new_flow(key, protocol, src, dst, sport, dport, flags)
+        if a == flow.client:
+            if flow.attempts < HOST_ATTEMPTS and payload:
+                self._extract_host(flow, payload)
+            class_id = flow.out_class
+        else:
+            class_id = flow.in_class
+        self._class_packets[class_id] += 1
+        self._class_bytes[class_id] += wire_len
+        self._class_current[class_id] += 1
+        self.total_packets += 1
+        self.total_bytes += wire_len
+
+    def finish(self) -> None:
+        """Раскладывает счетчики классов по ячейкам."""
+        self._roll(self._second or 0)
+        self.packets = [0] * len(self.slots)
+        self.bytes = [0] * len(self.slots)
+        for class_id, slots in enumerate(self._class_slots):
+            for slot in slots:
+                self.packets[slot] += self._class_packets[class_id]
+                self.bytes[slot] += self._class_bytes[class_id]
+
+    @property
+    def duration(self) -> float:
+        return max(self.last_ts - (self.first_ts or 0.0), 1e-9)
+
+    def rows(self) -> Iterator[tuple[str, str, int, int, float, float, int]]:
+        """(профиль, секция или "*", пакеты, байты, доля пакетов %, средний pps, пиковый pps)."""
+        total = max(self.total_packets, 1)
+        for slot, (name, section) in enumerate(self.slots):
+            packets = self.packets[slot]
+            yield (
+                name,
+                "*" if section is None else str(section),
+                packets,
+                self.bytes[slot],
+                packets * 100.0 / total,
+                packets / self.duration,
+                self.peak_pps[slot],
+            )
+
+
+def simulate(path: str, simulator: TrafficSimulator) -> TrafficSimulator:
+    with open(path, "rb", buffering=0) as f:
+        feed = simulator.feed
+        for ts, linktype, frame, wire_len in iter_packets(f):
+            parsed = parse_frame(linktype, frame)
+            if parsed is None:
+                simulator.skipped += 1
+                simulator.total_packets += 1
+                simulator.total_bytes += wire_len
+                continue
+            feed(ts, wire_len, *parsed)
+    simulator.finish()
+    return simulator
+
+
+# --- Синтетический захват
+
+
+def _client_hello(host: str, padding: int = 0) -> bytes:
+    name = host.encode("ascii")
+    server_name = struct.pack("!HBH", len(name) + 3, 0, len(name)) + name
+    extensions = b""
+    if padding:
+        # Как у Chrome: SNI не обязательно первое расширение.
+        extensions += struct.pack("!HH", 21, padding) + bytes(padding)
+    extensions += struct.pack("!HH", 0, len(server_name)) + server_name
+    body = (
+        b"\x03\x03" + bytes(32) + b"\x00" + b"\x00\x02\x13\x01" + b"\x01\x00"
+        + struct.pack("!H", len(extensions)) + extensions
+    )
+    return b"\x01" + len(body).to_bytes(3, "big") + body
+
+
+class _CaptureWriter:
+    """Пишет Ethernet-кадры в pcap или pcapng."""
+
+    def __init__(self, f, pcapng: bool):
+        self._f = f
+        self._pcapng: bool = pcapng
+        if pcapng:
+            shb_body = struct.pack("<IHHq", PCAPNG_BYTE_ORDER, 1, 0, -1)
+            f.write(struct.pack("<II", PCAPNG_SHB, 12 + len(shb_body)) + shb_body + struct.pack("<I", 12 + len(shb_body)))
+            idb_body = struct.pack("<HHI", LINKTYPE_ETHERNET, 0, 65535)
+            f.write(struct.pack("<II", PCAPNG_IDB, 12 + len(idb_body)) + idb_body + struct.pack("<I", 12 + len(idb_body)))
+        else:
+            f.write(struct.pack("<IHHiIII", PCAP_MAGIC_US, 2, 4, 0, 0, 65535, LINKTYPE_ETHERNET))
+
+    def write(self, ts: float, frame: bytes) -> None:
+        micros = int(ts * 1e6)
+        if self._pcapng:
+            padded = frame + bytes(-len(frame) % 4)
+            length = 32 + len(padded)
+            self._f.write(
+                struct.pack("<IIIIIII", PCAPNG_EPB, length, 0, micros >> 32, micros & 0xFFFFFFFF, len(frame), len(frame))
+                + padded + struct.pack("<I", length)
+            )
+        else:
+            self._f.write(struct.pack("<IIII", micros // 1000000, micros % 1000000, len(frame), len(frame)) + frame)
+
+
+def _frame(src: bytes, dst: bytes, protocol: int, sport: int, dport: int, payload: bytes, flags: int = _TCP_ACK) -> bytes:
+    if protocol == PROTO_TCP:
+        l4 = struct.pack("!HHIIBBHHH", sport, dport, 0, 0, 5 << 4, flags, 65535, 0, 0) + payload
+    else:
+        l4 = struct.pack("!HHHH", sport, dport, 8 + len(payload), 0) + payload
+    if len(src) == 4:
+        ip = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 20 + len(l4), 0, 0x4000, 64, protocol, 0, src, dst)
+        ethertype = _ETHERTYPE_IPV4
+    else:
+        ip = struct.pack("!IHBB16s16s", 6 << 28, len(l4), protocol, 64, src, dst)
+        ethertype = _ETHERTYPE_IPV6
+    return b"\x02\x00\x00\x00\x00\x01\x02\x00\x00\x00\x00\x02" + struct.pack("!H", ethertype) + ip + l4
+
+
+def _sample_lists(commands_path: str) -> tuple[list[str], list[bytes]]:
+    """Хосты из hostlist'ов и адреса из ipset'ов профилей (для синтетического трафика)."""
+    base_dir = os.path.dirname(os.path.abspath(commands_path))
+    hosts: dict[str, None] = {}
+    addresses: dict[bytes, None] = {}
+    for profile in load_profiles(commands_path).values():
+        for section in profile.sections:
+            for path in section.hostlists:
+                hosts.update(dict.fromkeys(iter_list_file(resolve_path(base_dir, path))))
+            for path in section.ipsets:
+                for entry in iter_list_file(resolve_path(base_dir, path)):
+                    address = entry.partition("/")[0]
+                    if ":" not in address:
+                        addresses[socket.inet_aton(address)] = None
+    return list(hosts), list(addresses)
+
+
+def write_synthetic(path: str, commands_path: str, packets: int, seed: int = 0, pcapng: bool = False) -> dict[str, int]:
+    """Пишет захват примерно из packets пакетов; возвращает ожидаемое число потоков с хостом по видам."""
+    rng = random.Random(seed)
+    hosts, ipset_addresses = _sample_lists(commands_path)
+    expected = {HOST_TLS: 0, HOST_HTTP: 0, HOST_QUIC: 0}
+    client_v4 = socket.inet_aton("192.168.1.10")
+    client_v6 = socket.inet_pton(socket.AF_INET6, "2001:db8::10")
+    ts = 1_700_000_000.0
+    written = 0
+    with open(path, "wb") as f:
+        writer = _CaptureWriter(f, pcapng)
+
+        def emit(frame: bytes) -> None:
+            nonlocal ts, written
+            ts += rng.expovariate(20000.0)
+            writer.write(ts, frame)
+            written += 1
+
+        while written < packets:
+            kind = rng.random()
+            v6 = rng.random() < 0.1
+            client = client_v6 if v6 else client_v4
+            server = (
+                socket.inet_pton(socket.AF_INET6, f"2001:db8:{rng.randrange(1 << 16):x}::{rng.randrange(1 << 16):x}")
+                if v6
+                else rng.randbytes(4)
+            )
+            host = rng.choice(hosts) if hosts and rng.random() < 0.5 else f"host{rng.randrange(10**6)}.example.org"
+            cport = rng.randrange(49152, 65536)
+            data_packets = rng.randrange(5, 60)
+            if kind < 0.45:
+                # TLS: рукопожатие TCP, ClientHello (иногда на два сегмента), данные.
+                emit(_frame(client, server, PROTO_TCP, cport, 443, b"", _TCP_SYN))
+                emit(_frame(server, client, PROTO_TCP, 443, cport, b"", _TCP_SYN | _TCP_ACK))
+                hello = _client_hello(host, 1500 if rng.random() < 0.3 else 0)
+                record = b"\x16\x03\x01" + len(hello).to_bytes(2, "big") + hello
+                for start in range(0, len(record), 1400):
+                    emit(_frame(client, server, PROTO_TCP, cport, 443, record[start:start + 1400]))
+                expected[HOST_TLS] += 1
+                for _ in range(data_packets):
+                    outbound = rng.random() < 0.3
+                    size = rng.randrange(40, 1400)
+                    if outbound:
+                        emit(_frame(client, server, PROTO_TCP, cport, 443, b"\x17\x03\x03" + bytes(size)))
+                    else:
+                        emit(_frame(server, client, PROTO_TCP, 443, cport, b"\x17\x03\x03" + bytes(size)))
+            elif kind < 0.6:
+                emit(_frame(client, server, PROTO_TCP, cport, 80, b"", _TCP_SYN))
+                request = f"GET / HTTP/1.1\r\nHost: {host}\r\nUser-Agent: sim\r\n\r\n".encode("ascii")
+                emit(_frame(client, server, PROTO_TCP, cport, 80, request))
+                expected[HOST_HTTP] += 1
+                for _ in range(data_packets // 2):
+                    emit(_frame(server, client, PROTO_TCP, 80, cport, bytes(rng.randrange(40, 1400))))
+            elif kind < 0.8:
+                # QUIC: ClientHello в двух CRYPTO-фреймах в обратном порядке, иногда в двух пакетах.
+                dcid = rng.randbytes(8)
+                hello = _client_hello(host, 1400 if rng.random() < 0.3 else 0)
+                middle = len(hello) // 2
+                if len(hello) > 1000:
+                    emit(_frame(client, server, PROTO_UDP, cport, 443, build_initial(dcid, [(0, hello[:middle])], 0)))
+                    emit(_frame(client, server, PROTO_UDP, cport, 443, build_initial(dcid, [(middle, hello[middle:])], 1)))
+                else:
+                    frames = [(middle, hello[middle:]), (0, hello[:middle])]
+                    emit(_frame(client, server, PROTO_UDP, cport, 443, build_initial(dcid, frames, 0)))
+                expected[HOST_QUIC] += 1
+                for _ in range(data_packets):
+                    size = rng.randrange(40, 1300)
+                    if rng.random() < 0.3:
+                        emit(_frame(client, server, PROTO_UDP, cport, 443, b"\x40" + bytes(size)))
+                    else:
+                        emit(_frame(server, client, PROTO_UDP, 443, cport, b"\x40" + bytes(size)))
+            elif kind < 0.9:
+                # Голос Discord: UDP 50000-50100, адрес из ipset или случайный.
+                voice = rng.choice(ipset_addresses) if ipset_addresses and rng.random() < 0.7 else rng.randbytes(4)
+                port = rng.randrange(50000, 50101)
+                for _ in range(data_packets):
+                    if rng.random() < 0.5:
+                        emit(_frame(client_v4, voice, PROTO_UDP, cport, port, bytes(rng.randrange(60, 200))))
+                    else:
+                        emit(_frame(voice, client_v4, PROTO_UDP, port, cport, bytes(rng.randrange(60, 200))))
+            else:
+                # Трафик, который профили не перехватывают: DNS и SSH.
+                emit(_frame(client, server, PROTO_UDP, cport, 53, bytes(40)))
+                emit(_frame(server, client, PROTO_UDP, 53, cport, bytes(120)))
+                emit(_frame(client, server, PROTO_TCP, cport, 22, b"", _TCP_SYN))
+                for _ in range(data_packets // 4):
+                    emit(_frame(server, client, PROTO_TCP, 22, cport, bytes(rng.randrange(40, 1400))))
+    return expected
+
+
+# --- Командная строка
+
+
+def _print_report(simulator: TrafficSimulator, elapsed: float, size: int) -> None:
+    print("profile\tsection\tpackets\tbytes\tshare_pct\tavg_pps\tpeak_pps")
+    for name, section, packets, sizes, share, avg, peak in simulator.rows():
+        print(f"{name}\t{section}\t{packets}\t{sizes}\t{share:.2f}\t{avg:.1f}\t{peak}")
+    rate = size / max(elapsed, 1e-9) / 2**20
+    print(
+        f"# {simulator.total_packets} packets ({simulator.skipped} not TCP/UDP), "
+        f"{simulator.total_bytes} bytes, {simulator.flows_seen} flows over {simulator.duration:.1f} s of capture"
+    )
+    print(
+        "# hosts: " + ", ".join(f"{kind} {count}" for kind, count in simulator.hosts.items())
+        + f"; parsed in {elapsed:.2f} s, {rate:.1f} MB/s, "
+        f"{simulator.total_packets / max(elapsed, 1e-9):.0f} packets/s"
+    )
+
+
+def selftest(commands_path: str) -> int:
+    """Проверяет ключи QUIC по RFC 9001, AES по FIPS-197 и разбор синтетических захватов."""
+    failures: list[str] = []
+    vector = Aes128(bytes(range(16))).encrypt_block(bytes.fromhex("00112233445566778899aabbccddeeff"))
+    if vector.hex() != "69c4e0d86a7b0430d8cdb78070b4c55a":
+        failures.append("AES-128 FIPS-197 vector")
+    key, iv, hp = quic_initial_keys(bytes.fromhex("8394c8f03e515708"))
+    if (key.hex(), iv.hex(), hp.hex()) != (
+        "1f369613dd76d5467730efcbe3b1a22d",
+        "fa044b2f42a3fd3b46fb255c",
+        "9f50449e04a0e810283a1e9933adedd2",
+    ):
+        failures.append("RFC 9001 initial keys")
+    mask = Aes128(hp).encrypt_block(bytes.fromhex("d1b1c98dd7689fb8ec11d242b123dc9b"))
+    if mask[:5].hex() != "437b9aec36":
+        failures.append("RFC 9001 header protection mask")
+
+    index = CoverageIndex.from_commands(commands_path)
+    reports = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for pcapng in (False, True):
+            path = os.path.join(tmp, "capture.pcapng" if pcapng else "capture.pcap")
+            expected = write_synthetic(path, commands_path, 20000, seed=1, pcapng=pcapng)
+            simulator = simulate(path, TrafficSimulator(index))
+            if simulator.hosts != expected:
+                failures.append(f"hosts {simulator.hosts} != {expected} ({os.path.basename(path)})")
+            reports.append((simulator.packets, simulator.bytes, simulator.peak_pps))
+    if reports[0] != reports[1]:
+        failures.append("pcap and pcapng results differ")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    if not failures:
+        print(f"selftest ok: {sum(expected.values())} flows with host names matched")
+    return 1 if failures else 0
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    from src.scripts.commands import COMMANDS_PATH
+
+    parser = argparse.ArgumentParser(description="Estimate per-profile diverted traffic from a capture.")
+    parser.add_argument("--commands", default=COMMANDS_PATH)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run = subparsers.add_parser("run", help="Simulate profiles on a pcap/pcapng capture")
+    run.add_argument("capture")
+    run.add_argument("--profile", action="append", dest="profiles")
+    run.add_argument("--max-flows", type=int, default=DEFAULT_MAX_FLOWS)
+    synth = subparsers.add_parser("synth", help="Write a synthetic capture")
+    synth.add_argument("output")
+    synth.add_argument("--packets", type=int, default=100000)
+    synth.add_argument("--seed", type=int, default=0)
+    synth.add_argument("--pcapng", action="store_true")
+    bench = subparsers.add_parser("bench", help="Simulate on a generated capture and report throughput")
+    bench.add_argument("--packets", type=int, default=1000000)
+    bench.add_argument("--pcapng", action="store_true")
+    subparsers.add_parser("selftest", help="Check crypto vectors and synthetic captures")
+    args = parser.parse_args(argv)
+
+    if args.command == "selftest":
+        return selftest(args.commands)
+    if args.command == "synth":
+        expected = write_synthetic(args.output, args.commands, args.packets, args.seed, args.pcapng)
+        print(f"{args.output}: flows with host names {expected}")
+        return 0
+
+    index = CoverageIndex.from_commands(args.commands)
+    unknown = [name for name in args.profiles or () if name not in index.profiles] if args.command == "run" else []
+    if unknown:
+        parser.error(f"unknown profile: {', '.join(unknown)}")
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.command == "bench":
+            path = os.path.join(tmp, "bench.pcapng" if args.pcapng else "bench.pcap")
+            write_synthetic(path, args.commands, args.packets, pcapng=args.pcapng)
+            simulator = TrafficSimulator(index)
+        else:
+            path = args.capture
+            simulator = TrafficSimulator(index, args.profiles, args.max_flows)
+        started = time.perf_counter()
+        try:
+            simulate(path, simulator)
+        except (ValueError, struct.error, IndexError) as e:
+            print(f"Error: {path}: {e}", file=sys.stderr)
+            return 1
+        elapsed = time.perf_counter() - started
+        _print_report(simulator, elapsed, os.path.getsize(path))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
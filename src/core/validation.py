@@ -0,0 +1,333 @@
+"""Проверка файлов профилей перед запуском winws.
+
+Из профиля извлекаются все файлы, на которые он ссылается (--hostlist,
+--ipset, --dpi-desync-fake-* и т.д.). Для каждого проверяется, что он
+существует и не пуст, а его содержимое разбирается: записи ipset —
+как CIDR, hostlist — как имена хостов, fake-пакеты TLS и QUIC — по
+заголовку. Без проверки опечатка в commands.json проявляется только
+выходом winws, который легко пропустить.
+
+Результаты хранятся в манифесте по (путь, размер, mtime), поэтому
+неизмененный файл при следующих проверках стоит одного stat(). Файлы,
+которых нет в манифесте, разбираются параллельно в пуле потоков.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Final, Iterable, Optional
+
+from src.core.lists import iter_list_file, normalize_domain, parse_cidr
+from src.core.profiles import LIST_OPTIONS, resolve_path
+from src.core.registry import ProfileEntry, ProfileRegistry
+
+
+MANIFEST_NAME: Final[str] = "validation.json"
+MANIFEST_VERSION: Final[int] = 1
+DEFAULT_WORKERS: Final[int] = min(8, (os.cpu_count() or 1) + 4)
+IPSET_OPTIONS: Final[frozenset[str]] = frozenset({"--ipset", "--ipset-exclude"})
+
+KIND_HOSTLIST: Final[str] = "hostlist"
+KIND_IPSET: Final[str] = "ipset"
+KIND_BINARY: Final[str] = "binary"
+KIND_FAKE_TLS: Final[str] = "fake-tls"
+KIND_FAKE_QUIC: Final[str] = "fake-quic"
+# Бинарные опции, содержимое которых можно проверить по заголовку.
+FAKE_KINDS: Final[dict[str, str]] = {
+    "--dpi-desync-fake-tls": KIND_FAKE_TLS,
+    "--dpi-desync-fake-quic": KIND_FAKE_QUIC,
+}
+
+PROBLEM_MISSING: Final[str] = "missing"
+PROBLEM_UNREADABLE: Final[str] = "unreadable"
+PROBLEM_EMPTY: Final[str] = "empty"
+PROBLEM_INVALID_ENTRIES: Final[str] = "invalid_entries"
+PROBLEM_BAD_HEADER: Final[str] = "bad_header"
+
+_HOST_RE: Final[re.Pattern] = re.compile(r"^[\w*-]+(\.[\w*-]+)*$")
+_TLS_HANDSHAKE: Final[int] = 0x16
+_QUIC_LONG_HEADER: Final[int] = 0x80
+
+
+@dataclass(frozen=True)
+class Issue:
+    path: str
+    problem: str
+    detail: str = ""
+    # Неустранимые для запуска: winws с таким файлом не стартует или работает не так.
+    fatal: bool = True
+
+    def __str__(self) -> str:
+        return f"{self.path}: {self.problem}" + (f" ({self.detail})" if self.detail else "")
+
+
+def referenced_files(entry: ProfileEntry, script_dir: str) -> dict[str, str]:
+    """Абсолютные пути файлов профиля и их вид (hostlist, ipset или binary)."""
+    files: dict[str, str] = {}
+    for section in entry.profile.sections:
+        for key, value in section.options:
+            if not value:
+                continue
+            path = resolve_path(script_dir, value)
+            if path not in entry.files:
+                continue
+            if key in IPSET_OPTIONS:
+                files[path] = KIND_IPSET
+            elif key in LIST_OPTIONS:
+                files[path] = KIND_HOSTLIST
+            else:
+                files.setdefault(path, KIND_BINARY)
+    return files
+
+
+def _checked_kinds(entry: ProfileEntry, script_dir: str) -> dict[str, str]:
+    """referenced_files с уточненным видом fake-пакетов TLS и QUIC."""
+    files = referenced_files(entry, script_dir)
+    for section in entry.profile.sections:
+        for key, value in section.options:
+            kind = FAKE_KINDS.get(key)
+            if kind and value and files.get(resolve_path(script_dir, value)) == KIND_BINARY:
+                files[resolve_path(script_dir, value)] = kind
+    return files
+
+
+def _check_list(path: str, kind: str) -> list[Issue]:
+    entries = invalid = 0
+    first_invalid = ""
+    for entry in iter_list_file(path):
+        entries += 1
+        if kind == KIND_IPSET:
+            try:
+                parse_cidr(entry)
+                continue
+            except (OSError, ValueError):
+                pass
+        elif _HOST_RE.match(normalize_domain(entry)):
+            continue
+        invalid += 1
+        first_invalid = first_invalid or entry
+    if not entries:
+        return [Issue(path, PROBLEM_EMPTY, fatal=False)]
+    if invalid:
+        # Нечитаемый ipset winws не загружает; лишние строки hostlist просто не совпадут.
+        return [
+            Issue(
+                path,
+                PROBLEM_INVALID_ENTRIES,
+                f"{invalid} of {entries}, first: {first_invalid[:64]}",
+                fatal=kind == KIND_IPSET,
+            )
+        ]
+    return []
+
+
+def _check_binary(path: str, kind: str, size: int) -> list[Issue]:
+    if not size:
+        return [Issue(path, PROBLEM_EMPTY)]
+    with open(path, "rb") as f:
+        head = f.read(5)
+    if kind == KIND_FAKE_TLS:
+        # Запись TLS: тип handshake, версия 3.x, длина не больше файла.
+        record = int.from_bytes(head[3:5], "big") if len(head) == 5 else 0
+        if head[:1] != bytes((_TLS_HANDSHAKE,)) or head[1:2] != b"\x03" or 5 + record > size:
+            return [Issue(path, PROBLEM_BAD_HEADER, "not a TLS handshake record", fatal=False)]
+    elif kind == KIND_FAKE_QUIC and not head[0] & _QUIC_LONG_HEADER:
+        return [Issue(path, PROBLEM_BAD_HEADER, "not a QUIC long header packet", fatal=False)]
+    return []
+
+
+def check_file(path: str, kind: str) -> tuple[Optional[tuple[int, int]], list[Issue]]:
+    """Проверяет один файл; возвращает его (размер, mtime_ns) и найденные проблемы."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None, [Issue(path, PROBLEM_MISSING)]
+    signature = (stat.st_size, stat.st_mtime_ns)
+    try:
+        if kind in (KIND_HOSTLIST, KIND_IPSET):
+            return signature, _check_list(path, kind)
+        return signature, _check_binary(path, kind, stat.st_size)
+    except (OSError, UnicodeDecodeError) as e:
+        return signature, [Issue(path, PROBLEM_UNREADABLE, str(e))]
+
+
+class ProfileValidator:
+    """Проверка файлов профилей с манифестом результатов на диске.
+
+    Потокобезопасен: вызывается и из фоновой проверки при старте, и из
+    ZapretRunner.prepare.
+    """
+
+    def __init__(
+        self,
+        registry: ProfileRegistry,
+        manifest_path: Optional[str] = None,
+        workers: int = DEFAULT_WORKERS,
+    ):
+        self.registry: ProfileRegistry = registry
+        self.manifest_path: Optional[str] = manifest_path
+        self.workers: int = workers
+        self._lock: threading.Lock = threading.Lock()
+        self._manifest: dict[str, dict[str, Any]] = self._load()
+        self._dirty: bool = False
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def _load(self) -> dict[str, dict[str, Any]]:
+        if not self.manifest_path:
+            return {}
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+            return {}
+        return data.get("files", {})
+
+    def save(self) -> None:
+        """Записывает манифест, если он изменился (атомарно, через временный файл)."""
+        with self._lock:
+            if not self.manifest_path or not self._dirty:
+                return
+            data = {"version": MANIFEST_VERSION, "files": dict(self._manifest)}
+            self._dirty = False
+        try:
+            directory = os.path.dirname(os.path.abspath(self.manifest_path))
+            fd, partial = tempfile.mkstemp(prefix=MANIFEST_NAME, dir=directory)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(partial, self.manifest_path)
+        except OSError as e:
+            print(f"Warning: Failed to save validation manifest: {e}", file=sys.stderr)
+
+    def _cached(self, path: str, kind: str) -> Optional[list[Issue]]:
+        record = self._manifest.get(path)
+        if record is None or record["kind"] != kind:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if [stat.st_size, stat.st_mtime_ns] != record["signature"]:
+            return None
+        return [Issue(path, *issue) for issue in record["issues"]]
+
+    def _check(self, path: str, kind: str) -> list[Issue]:
+        signature, issues = check_file(path, kind)
+        with self._lock:
+            if signature is None:
+                self._manifest.pop(path, None)
+            else:
+                self._manifest[path] = {
+                    "kind": kind,
+                    "signature": list(signature),
+                    "issues": [[i.problem, i.detail, i.fatal] for i in issues],
+                }
+            self._dirty = True
+        return issues
+
+    def check_files(self, files: dict[str, str]) -> dict[str, list[Issue]]:
+        """Проблемы по каждому файлу; непроверенные ранее файлы разбираются параллельно."""
+        results: dict[str, list[Issue]] = {}
+        pending: list[tuple[str, str]] = []
+        for path, kind in files.items():
+            cached = self._cached(path, kind)
+            if cached is None:
+                pending.append((path, kind))
+            else:
+                results[path] = cached
+        self.hits += len(results)
+        self.misses += len(pending)
+        if len(pending) == 1 or self.workers <= 1:
+            for path, kind in pending:
+                results[path] = self._check(path, kind)
+        elif pending:
+            with ThreadPoolExecutor(min(self.workers, len(pending)), "zapret-validate") as pool:
+                checked = pool.map(lambda item: self._check(*item), pending)
+                for (path, _), issues in zip(pending, checked):
+                    results[path] = issues
+        return results
+
+    def validate(self, names: Optional[Iterable[str]] = None) -> dict[str, list[Issue]]:
+        """Проблемы по профилям (все профили реестра, если names не задан)."""
+        self.registry.refresh()
+        names = list(self.registry) if names is None else list(names)
+        kinds = {name: _checked_kinds(self.registry.get(name), self.registry.script_dir) for name in names}
+        files: dict[str, str] = {}
+        for profile_files in kinds.values():
+            files.update(profile_files)
+        results = self.check_files(files)
+        return {name: [issue for path in kinds[name] for issue in results[path]] for name in names}
+
+
+def default_manifest_path() -> str:
+    from src.core.paths import data_dir
+
+    return os.path.join(data_dir(), MANIFEST_NAME)
+
+
+def _bench(registry: ProfileRegistry, runs: int) -> list[tuple[str, float]]:
+    timings: list[tuple[str, float]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode, workers in (("cold_serial", 1), ("cold_parallel", DEFAULT_WORKERS)):
+            best = float("inf")
+            for run in range(runs):
+                validator = ProfileValidator(registry, os.path.join(tmp, f"{mode}-{run}.json"), workers)
+                started = time.perf_counter()
+                validator.validate()
+                best = min(best, time.perf_counter() - started)
+                validator.save()
+            timings.append((mode, best))
+        best = float("inf")
+        for _ in range(runs):
+            # Новый экземпляр, как при следующем запуске приложения.
+            validator = ProfileValidator(registry, os.path.join(tmp, "cold_parallel-0.json"))
+            started = time.perf_counter()
+            validator.validate()
+            best = min(best, time.perf_counter() - started)
+            assert validator.misses == 0, validator.misses
+        timings.append(("warm", best))
+    return timings
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    from src.scripts.commands import COMMANDS_PATH, SCRIPT_DIR, default_launcher
+
+    parser = argparse.ArgumentParser(description="Validate files referenced by profiles.")
+    parser.add_argument("--profile", action="append", dest="profiles")
+    parser.add_argument("--commands", default=COMMANDS_PATH)
+    parser.add_argument("--script-dir", default=SCRIPT_DIR)
+    parser.add_argument("--bench", type=int, metavar="RUNS", help="Compare cold and warm validation")
+    args = parser.parse_args(argv)
+
+    try:
+        registry = ProfileRegistry(args.commands, args.script_dir, default_launcher())
+        if args.bench:
+            print("mode\tbest_ms")
+            for mode, elapsed in _bench(registry, args.bench):
+                print(f"{mode}\t{elapsed * 1000:.3f}")
+            return 0
+        results = ProfileValidator(registry).validate(args.profiles)
+    except (RuntimeError, ValueError, KeyError) as e:
+        # Сломанный commands.json или неизвестный профиль — сообщение, а не traceback.
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    fatal = 0
+    for name, issues in results.items():
+        for issue in issues:
+            fatal += issue.fatal
+            print(f"{name}\t{'error' if issue.fatal else 'warning'}\t{issue}")
+    print(f"# {len(results)} profiles, {fatal} errors")
+    return 1 if fatal else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
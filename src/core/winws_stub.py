@@ -0,0 +1,154 @@
+"""Заглушка winws для тестов производительности и отказов.
+
+Запускается вместо winws.exe: ``python winws_stub.py --stub-config=<json> <аргументы winws>``.
+Аргументы с префиксом ``--stub-`` читает сама заглушка, остальные
+записываются в журнал argv (JSON lines), если он задан. Модуль не
+импортирует ничего из проекта, чтобы заглушка стартовала как можно быстрее.
+
+Параметры конфигурации (все необязательные):
+    argv_log        путь журнала argv
+    start_delay     задержка перед "инициализацией", секунды
+    ready_file      файл, который создается по окончании "инициализации"
+    exit_code       немедленный выход с этим кодом
+    crash_after     аварийный выход через N секунд (код crash_code, по умолчанию 1)
+    stderr_bytes    сколько байт записать в stderr после старта
+    term_delay      задержка выхода после SIGTERM (на Windows terminate()
+                    вызывает TerminateProcess, и задержка не действует)
+    ignore_term     игнорировать SIGTERM: остановить заглушку можно только kill
+    trace           файл трассы пакетов (см. write_trace): заглушка
+                    "обрабатывает" пакеты, попавшие в ее --wf-tcp/--wf-udp,
+                    хешируя packet_bytes байт на пакет
+    result_file     куда дописать {"pid", "packets", "seconds"} после трассы
+"""
+
+import hashlib
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from array import array
+from typing import Any, Final, Optional
+
+
+CONFIG_PREFIX: Final[str] = "--stub-config="
+STDERR_LINE: Final[bytes] = b"!impossible to resolve : stub stderr flood line padding padding\n"
+
+
+def stub_launcher(python: Optional[str] = None, **config: Any) -> tuple[str, ...]:
+    """Команда запуска заглушки для ProfileRegistry.set_launcher."""
+    launcher = [python or sys.executable, os.path.abspath(__file__)]
+    if config:
+        launcher.append(CONFIG_PREFIX + json.dumps(config, separators=(",", ":")))
+    return tuple(launcher)
+
+
+def _split_argv(argv: list[str]) -> tuple[dict[str, Any], list[str]]:
+    config: dict[str, Any] = {}
+    winws_args: list[str] = []
+    for arg in argv:
+        if arg.startswith(CONFIG_PREFIX):
+            config.update(json.loads(arg[len(CONFIG_PREFIX):]))
+        else:
+            winws_args.append(arg)
+    return config, winws_args
+
+
+def write_trace(path: str, packets: list[tuple[int, int]]) -> None:
+    """Сохраняет трассу пакетов (протокол: 0 — tcp, 1 — udp; порт)."""
+    protocols = array("B", (protocol for protocol, _ in packets))
+    ports = array("H", (port for _, port in packets))
+    with open(path, "wb") as f:
+        f.write(len(packets).to_bytes(8, "little"))
+        protocols.tofile(f)
+        ports.tofile(f)
+
+
+def _read_trace(path: str) -> tuple[array, array]:
+    with open(path, "rb") as f:
+        count = int.from_bytes(f.read(8), "little")
+        protocols, ports = array("B"), array("H")
+        protocols.fromfile(f, count)
+        ports.fromfile(f, count)
+    return protocols, ports
+
+
+def _wf_ports(winws_args: list[str], option: str) -> set[int]:
+    ports: set[int] = set()
+    for arg in winws_args:
+        key, _, value = arg.partition("=")
+        if key != option:
+            continue
+        for part in value.split(","):
+            low, _, high = part.partition("-")
+            ports.update(range(int(low), int(high or low) + 1))
+    return ports
+
+
+def _process_trace(config: dict[str, Any], winws_args: list[str]) -> None:
+    protocols, ports = _read_trace(config["trace"])
+    accepted = (_wf_ports(winws_args, "--wf-tcp"), _wf_ports(winws_args, "--wf-udp"))
+    payload = b"\0" * int(config.get("packet_bytes", 1400))
+    started = time.perf_counter()
+    handled = 0
+    for protocol, port in zip(protocols, ports):
+        if port in accepted[protocol]:
+            hashlib.sha256(payload).digest()
+            handled += 1
+    elapsed = time.perf_counter() - started
+    with open(config["result_file"], "a", encoding="utf-8") as f:
+        f.write(json.dumps({"pid": os.getpid(), "packets": handled, "seconds": elapsed}) + "\n")
+
+
+def _flood_stderr(size: int) -> None:
+    stream = sys.stderr.buffer
+    written = 0
+    while written < size:
+        stream.write(STDERR_LINE)
+        written += len(STDERR_LINE)
+    stream.flush()
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    config, winws_args = _split_argv(sys.argv[1:] if argv is None else argv)
+
+    if config.get("argv_log"):
+        with open(config["argv_log"], "a", encoding="utf-8") as f:
+            f.write(json.dumps({"pid": os.getpid(), "argv": winws_args}, ensure_ascii=False) + "\n")
+
+    if "exit_code" in config:
+        return int(config["exit_code"])
+
+    stopping = threading.Event()
+    term_delay = float(config.get("term_delay", 0))
+
+    def on_term(signum, frame) -> None:
+        if term_delay:
+            time.sleep(term_delay)
+        stopping.set()
+
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, signal.SIG_IGN if config.get("ignore_term") else on_term)
+
+    time.sleep(float(config.get("start_delay", 0)))
+    if config.get("ready_file"):
+        open(config["ready_file"], "w").close()
+    if config.get("stderr_bytes"):
+        _flood_stderr(int(config["stderr_bytes"]))
+    if config.get("trace"):
+        _process_trace(config, winws_args)
+
+    crash_after = config.get("crash_after")
+    if crash_after is not None:
+        if not stopping.wait(float(crash_after)):
+            sys.stderr.flush()
+            os._exit(int(config.get("crash_code", 1)))
+        return 0
+    while not stopping.wait(3600):
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
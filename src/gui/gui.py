@@ -1,65 +1,49 @@
 import os
+import threading
 from typing import Optional
 
 from PyQt6.QtWidgets import (
     QWidget,
     QVBoxLayout,
-    QPushButton,
     QMessageBox,
     QLabel,
-    QScrollArea,
     QSystemTrayIcon,
     QMenu,
     QApplication,
 )
-from PyQt6.QtCore import QObject, QThread, pyqtSignal, QTimer, Qt, QEvent
+from PyQt6.QtCore import QObject, pyqtSignal, QTimer, Qt, QEvent
 from PyQt6.QtGui import QCloseEvent, QAction, QIcon
 
+from src.core import lifecycle
+from src.core.control import ControlServer
+from src.core.file_watcher import FileWatchService
+from src.core.profiles import LIST_OPTIONS
+from src.core.resource_sampler import MetricsServer, ResourceSampler
+from src.core.supervisor import (
+    ProcessSupervisor,
+    SupervisorState,
+    STATE_RESTARTING,
+    STATE_RUNNING,
+    STATE_STOPPED,
+)
+from src.gui.profile_list import ProfileListWidget
 from src.gui.resource_utils import resource_path
 from src.scripts.commands import ZapretRunner
 from src.gui.translations import translator
 
 
-class CommandWorker(QObject):
-    command_started: pyqtSignal = pyqtSignal(str)
-    process_stopped: pyqtSignal = pyqtSignal(str)
-    error_occurred: pyqtSignal = pyqtSignal(str, str)
-    finished: pyqtSignal = pyqtSignal()
-
-    def __init__(self, zapret_runner: ZapretRunner, command_name: Optional[str] = None):
-        super().__init__()
-        self._zapret_runner: ZapretRunner = zapret_runner
-        self._command_name: Optional[str] = command_name
+class SupervisorBridge(QObject):
+    """Переносит изменения состояния супервизора в поток интерфейса."""
 
-    def run_command(self) -> None:
-        if self._command_name is None:
-            self.finished.emit()
-            return
-        try:
-            self._zapret_runner.run(self._command_name)
-            self.command_started.emit(self._command_name)
-        except Exception as e:
-            self.error_occurred.emit(str(e), self._command_name)
-        finally:
-            self.finished.emit()
-
-    def stop_command(self) -> None:
-        try:
-            self._zapret_runner.terminate()
-            self.process_stopped.emit(
-                translator.translate("process_completed", "Process completed")
-            )
-        except RuntimeError as e:
-            self.error_occurred.emit(str(e), None)
-        finally:
-            self.finished.emit()
+    state_changed: pyqtSignal = pyqtSignal(object)
+    # Результат фоновой проверки файлов профилей: {профиль: [Issue]}.
+    profiles_validated: pyqtSignal = pyqtSignal(object)
 
 
 class CommandRunnerApp(QWidget):
-    RUNNING_STYLE: str = "background-color: lightgreen; color: black;"
-    DEFAULT_STYLE: str = ""
-
-    def __init__(self):
+    def __init__(self, services: bool = True):
+        """services=False запускает окно без уборки осиротевших winws,
+        метрик, канала управления и слежения за файлами (для бенчмарков)."""
         super().__init__()
 
         icon_path: str = resource_path("icon.ico")
@@ -78,15 +62,12 @@ class CommandRunnerApp(QWidget):
                 background-color: #2d2d2d;
                 color: #ffffff;
             }
-            QPushButton {
+            QLineEdit {
                 background-color: #3a3a3a;
                 border: 1px solid #4a4a4a;
                 color: white;
             }
-            QPushButton:hover {
-                background-color: #4a4a4a;
-            }
-            QScrollArea {
+            QListView {
                 border: 1px solid #3a3a3a;
             }
         """
@@ -99,39 +80,63 @@ class CommandRunnerApp(QWidget):
         )
 
         self.main_layout: QVBoxLayout = QVBoxLayout(self)
-        self._active_threads: set[QThread] = set()
-        self._command_buttons: dict[str, QPushButton] = {}
         self._running_command_name: Optional[str] = None
-        self._pending_command: Optional[str] = None
+        self._busy_command_name: Optional[str] = None
         self.zapret_runner: ZapretRunner = ZapretRunner()
+        if services:
+            # winws, оставшиеся после аварийного завершения, держат WinDivert.
+            self.zapret_runner.reap_orphans()
+
+        self._bridge: SupervisorBridge = SupervisorBridge(self)
+        self._bridge.state_changed.connect(self._on_supervisor_state)
+        self._bridge.profiles_validated.connect(self._on_profiles_validated)
+        self.supervisor: ProcessSupervisor = ProcessSupervisor(
+            self.zapret_runner, self._bridge.state_changed.emit
+        )
+        self.supervisor.start()
 
-        cmd_buttons_widget: QWidget = QWidget()
-        cmd_layout: QVBoxLayout = QVBoxLayout()
-        cmd_buttons_widget.setLayout(cmd_layout)
-        cmd_layout.addWidget(
+        self.sampler: ResourceSampler = ResourceSampler(
+            lambda: self.zapret_runner.processes
+        )
+        self.sampler.start()
+        self.metrics_server: Optional[MetricsServer] = None
+        self.control_server: Optional[ControlServer] = None
+        self.file_watcher: Optional[FileWatchService] = None
+        self._services_stopped: bool = False
+        if services:
+            self._start_services()
+
+        self.main_layout.addWidget(
             QLabel(translator.translate("profile_start", "Profile start"))
         )
-
-        if hasattr(self.zapret_runner, "commands") and self.zapret_runner.commands:
-            for command_name in self.zapret_runner.commands.keys():
-                button: QPushButton = QPushButton(command_name)
-                button.setStyleSheet(self.DEFAULT_STYLE)
-                button.setMinimumHeight(30)
-                button.clicked.connect(
-                    lambda checked, name=command_name: self.handle_command_button(name)
-                )
-                cmd_layout.addWidget(button)
-                self._command_buttons[command_name] = button
+        self.profile_list: ProfileListWidget = ProfileListWidget(
+            translator.translate("profile_search", "Search by profile or list name")
+        )
+        self.profile_list.profile_clicked.connect(self.handle_command_button)
+        registry = self.zapret_runner.registry
+        if not len(registry):
+            self.main_layout.addWidget(
+                QLabel(translator.translate("no_commands_loaded", "No commands found."))
+            )
+            self.profile_list.hide()
         else:
-            no_commands_label = QLabel(
-                translator.translate("no_commands_loaded", "No commands found.")
+            self.profile_list.model.set_profiles(
+                (
+                    name,
+                    [
+                        os.path.basename(value)
+                        for section in registry.get(name).profile.sections
+                        for key, value in section.options
+                        if key in LIST_OPTIONS and value
+                    ],
+                )
+                for name in registry
             )
-            cmd_layout.addWidget(no_commands_label)
+        self.main_layout.addWidget(self.profile_list)
 
-        scroll: QScrollArea = QScrollArea()
-        scroll.setWidgetResizable(True)
-        scroll.setWidget(cmd_buttons_widget)
-        self.main_layout.addWidget(scroll)
+        threading.Thread(
+            target=self._validate_profiles, name="zapret-validate", daemon=True
+        ).start()
 
         tray_menu: QMenu = QMenu()
         restore_action: QAction = QAction(
@@ -148,8 +153,36 @@ class CommandRunnerApp(QWidget):
         self.tray_icon.show()
         self.tray_icon.activated.connect(self.tray_icon_clicked)
 
+        self._tooltip_timer: QTimer = QTimer(self)
+        self._tooltip_timer.timeout.connect(self._update_tray_tooltip)
+        self._tooltip_timer.start(5000)
+        self._update_tray_tooltip()
+
         self._set_ui_state_can_start()
 
+    def _start_services(self) -> None:
+        try:
+            self.metrics_server = MetricsServer(
+                self.sampler,
+                extra=lambda: self.supervisor.switch_gaps.render_openmetrics(
+                    "zapret_switch_gap_seconds",
+                    "Time without a running winws while switching profiles.",
+                ),
+            )
+            self.metrics_server.start()
+        except OSError as e:
+            print(f"Warning: Metrics endpoint is unavailable: {e}")
+        try:
+            self.control_server = ControlServer(self.supervisor, self.zapret_runner.registry)
+            self.control_server.start()
+        except OSError as e:
+            self.control_server = None
+            print(f"Warning: Control channel is unavailable: {e}")
+        self.file_watcher = FileWatchService(
+            self.supervisor, self.zapret_runner.registry
+        )
+        self.file_watcher.start()
+
     def show_normal(self) -> None:
         self.show()
         self.setWindowState(
@@ -165,102 +198,96 @@ class CommandRunnerApp(QWidget):
     def changeEvent(self, event: Optional[QEvent]) -> None:
         super().changeEvent(event)
 
+    def _update_tray_tooltip(self) -> None:
+        latest: Optional[dict[str, float]] = self.sampler.latest()
+        if not self._running_command_name or latest is None:
+            self.tray_icon.setToolTip("Zapret")
+            return
+        cpu: Optional[float] = self.sampler.cpu_percent()
+        cpu_text: str = f"{cpu:.1f}%" if cpu is not None else "-"
+        self.tray_icon.setToolTip(
+            f"Zapret: {self._running_command_name}\n"
+            f"CPU {cpu_text}, RSS {latest['rss_bytes'] / 2**20:.1f} MB, "
+            f"{int(latest['threads'])} threads, {int(latest['handles'])} handles\n"
+            f"Uptime {int(latest['uptime_seconds'])} s"
+        )
+
+    def _stop_background_services(self) -> None:
+        # Вызывается и при закрытии окна, и из трей-меню: службы останавливаются один раз.
+        if self._services_stopped:
+            return
+        self._services_stopped = True
+        self._tooltip_timer.stop()
+        if self.control_server:
+            self.control_server.stop()
+        if self.file_watcher:
+            self.file_watcher.stop()
+        self.supervisor.shutdown()
+        self.sampler.stop()
+        if self.metrics_server:
+            self.metrics_server.stop()
+
+    def _validate_profiles(self) -> None:
+        """Проверяет файлы всех профилей; при неизмененных файлах это один stat() на файл."""
+        try:
+            results = self.zapret_runner.validator.validate()
+        except (OSError, ValueError, RuntimeError, KeyError) as e:
+            # RuntimeError — commands.json не загрузился, KeyError — профиль
+            # удален параллельным перечитыванием реестра.
+            print(f"Warning: Profile validation failed: {e}")
+            return
+        self.zapret_runner.validator.save()
+        self._bridge.profiles_validated.emit(results)
+
+    def _on_profiles_validated(self, results: dict) -> None:
+        tooltips: dict[str, str] = {}
+        for command_name, issues in results.items():
+            fatal = [str(issue) for issue in issues if issue.fatal]
+            if fatal:
+                tooltips[command_name] = translator.translate(
+                    "profile_files_invalid", "Invalid profile files: {files}"
+                ).format(files="; ".join(fatal))
+        self.profile_list.model.set_tooltips(tooltips)
+
     def handle_command_button(self, command_name: str) -> None:
-        if self._running_command_name == command_name:
-            self._stop_current_command()
-        else:
-            if self._running_command_name:
-                self._pending_command = command_name
-                self._stop_current_command()
-            else:
-                self._run_selected_command(command_name)
+        self.supervisor.toggle(command_name)
 
+    # Модель перерисовывает только строки, чье состояние изменилось.
     def _set_ui_state_can_start(self) -> None:
-        if self._running_command_name:
-            button: Optional[QPushButton] = self._command_buttons.get(
-                self._running_command_name
-            )
-            if button:
-                button.setStyleSheet(self.DEFAULT_STYLE)
         self._running_command_name = None
-        if self._pending_command:
-            command_to_run: str = self._pending_command
-            self._pending_command = None
-            QTimer.singleShot(100, lambda: self._run_selected_command(command_to_run))
-        else:
-            for button in self._command_buttons.values():
-                button.setEnabled(True)
+        self._busy_command_name = None
+        self.profile_list.model.set_running(None)
+        self.profile_list.model.set_busy(None)
 
     def _set_ui_state_can_stop(self, command_name: str) -> None:
-        if self._running_command_name and self._running_command_name != command_name:
-            old_button: Optional[QPushButton] = self._command_buttons.get(
-                self._running_command_name
-            )
-            if old_button:
-                old_button.setStyleSheet(self.DEFAULT_STYLE)
         self._running_command_name = command_name
-        button: Optional[QPushButton] = self._command_buttons.get(command_name)
-        if button:
-            button.setStyleSheet(self.RUNNING_STYLE)
-        for btn in self._command_buttons.values():
-            btn.setEnabled(True)
-
-    def _set_ui_state_busy(self) -> None:
-        for button in self._command_buttons.values():
-            button.setEnabled(False)
-
-    def _run_selected_command(self, command_name: str) -> None:
-        self._set_ui_state_busy()
-        thread: QThread = QThread()
-        worker: CommandWorker = CommandWorker(
-            self.zapret_runner, command_name=command_name
-        )
-        worker.moveToThread(thread)
-        self._active_threads.add(thread)
-        thread.worker = worker
-        thread.started.connect(worker.run_command)
-        worker.command_started.connect(self._on_command_started)
-        worker.error_occurred.connect(self._on_task_error)
-        worker.finished.connect(thread.quit)
-        worker.finished.connect(worker.deleteLater)
-        thread.finished.connect(lambda t=thread: self._active_threads.discard(t))
-        thread.finished.connect(thread.deleteLater)
-        thread.start()
-
-    def _stop_current_command(self) -> None:
-        if self._running_command_name is None:
-            self._set_ui_state_can_start()
-            return
-        self._set_ui_state_busy()
-        thread: QThread = QThread()
-        worker: CommandWorker = CommandWorker(self.zapret_runner)
-        worker.moveToThread(thread)
-        self._active_threads.add(thread)
-        thread.worker = worker
-        thread.started.connect(worker.stop_command)
-        worker.process_stopped.connect(self._on_process_stopped)
-        worker.error_occurred.connect(self._on_task_error)
-        worker.finished.connect(thread.quit)
-        worker.finished.connect(worker.deleteLater)
-        thread.finished.connect(lambda t=thread: self._active_threads.discard(t))
-        thread.finished.connect(thread.deleteLater)
-        thread.start()
-
-    def _on_command_started(self, started_command_name: str) -> None:
-        self._set_ui_state_can_stop(started_command_name)
-
-    def _on_process_stopped(self, success_message: str) -> None:
-        self._set_ui_state_can_start()
-
-    def _on_task_error(self, error_message: str, command_name: Optional[str]) -> None:
-        QMessageBox.warning(self, translator.translate("error", "Error"), error_message)
-        if command_name is not None:
+        self._busy_command_name = None
+        self.profile_list.model.set_running(command_name)
+        self.profile_list.model.set_busy(None)
+
+    def _set_ui_state_busy(self, command_name: Optional[str]) -> None:
+        self._busy_command_name = command_name
+        self.profile_list.model.set_busy(command_name)
+
+    def _on_supervisor_state(self, state: SupervisorState) -> None:
+        if state.status == STATE_RUNNING:
+            self._set_ui_state_can_stop(state.profile)
+            lifecycle.mark("ui_running", state.profile)
+        elif state.status == STATE_STOPPED:
+            stopped: Optional[str] = self._running_command_name
             self._set_ui_state_can_start()
+            lifecycle.mark("ui_stopped", stopped)
         else:
-            if self._running_command_name:
-                self._set_ui_state_can_stop(self._running_command_name)
-            else:
-                self._set_ui_state_can_start()
+            self._set_ui_state_busy(state.profile)
+
+        if state.status == STATE_RESTARTING:
+            self.tray_icon.showMessage(
+                "Zapret", state.error or "", QSystemTrayIcon.MessageIcon.Warning
+            )
+        elif state.error:
+            QMessageBox.warning(
+                self, translator.translate("error", "Error"), state.error
+            )
 
     def closeEvent(self, event: Optional[QCloseEvent]) -> None:
         """Обрабатывает нажатие на крестик окна."""
@@ -271,14 +298,12 @@ class CommandRunnerApp(QWidget):
             self.hide()
 
             event.ignore()
+        else:
+            self.cleanup_and_accept_close(event)
 
     def cleanup_and_accept_close(self, event: Optional[QCloseEvent]):
         """Выполняет очистку и принимает событие закрытия."""
-        for thread in list(self._active_threads):
-            if thread.isRunning():
-                thread.quit()
-                if not thread.wait(500):
-                    print(f"Warning: Thread {thread} did not finish gracefully.")
+        self._stop_background_services()
 
         self.tray_icon.hide()
         if event:
@@ -286,23 +311,16 @@ class CommandRunnerApp(QWidget):
 
     def quit_application(self) -> None:
         """Принудительно завершает приложение (вызывается из трей-меню)."""
-        if self._running_command_name:
-            try:
-                self.zapret_runner.terminate()
-            except Exception as e:
-                QMessageBox.critical(
-                    self,
-                    translator.translate("error", "Ошибка"),
-                    f"{translator.translate('process_stop_error', 'Ошибка при остановке процесса при выходе')}: {str(e)}",
-                )
-
-        for thread in list(self._active_threads):
-            if thread.isRunning():
-                thread.quit()
-                if not thread.wait(500):
-                    print(
-                        f"Warning: Thread {thread} did not finish gracefully on forced quit."
-                    )
+        was_running: bool = self._running_command_name is not None
+        self._stop_background_services()
+
+        state: SupervisorState = self.supervisor.state
+        if was_running and (state.status != STATE_STOPPED or state.error):
+            QMessageBox.critical(
+                self,
+                translator.translate("error", "Ошибка"),
+                f"{translator.translate('process_stop_error', 'Ошибка при остановке процесса при выходе')}: {state.error or state.status}",
+            )
 
         self.tray_icon.hide()
         QApplication.instance().quit()
@@ -0,0 +1,250 @@
+"""Список профилей на модели/представлении вместо кнопки на каждый профиль.
+
+Модель хранит только имена, строки для поиска и имена профилей в
+состояниях "запущен"/"занят"; строки рисует делегат, виджетов на
+профиль нет. Смена состояния сообщает dataChanged только для строк,
+чье состояние изменилось, а представление их лишь перерисовывает, без
+раскладки всего списка: цена переключения не зависит от размера
+каталога. Поиск идет по имени профиля и по именам файлов
+hostlist/ipset, на которые он ссылается.
+"""
+
+from typing import Iterable, Optional
+
+from PyQt6.QtCore import (
+    QAbstractListModel,
+    QModelIndex,
+    QObject,
+    QRect,
+    QSize,
+    QSortFilterProxyModel,
+    Qt,
+    pyqtSignal,
+)
+from PyQt6.QtGui import QColor, QPainter, QPen
+from PyQt6.QtWidgets import (
+    QLineEdit,
+    QListView,
+    QStyle,
+    QStyledItemDelegate,
+    QStyleOptionViewItem,
+    QVBoxLayout,
+    QWidget,
+)
+
+
+STATE_IDLE: int = 0
+STATE_RUNNING: int = 1
+STATE_BUSY: int = 2
+StateRole: int = Qt.ItemDataRole.UserRole + 1
+ROW_HEIGHT: int = 30
+ROW_SPACING: int = 4
+
+
+class ProfileListModel(QAbstractListModel):
+    """Профили в порядке commands.json, их состояние и подсказки с ошибками файлов."""
+
+    def __init__(self, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self._names: list[str] = []
+        self._rows: dict[str, int] = {}
+        # Имя и файлы списков в нижнем регистре: поиск без пересборки строк.
+        self.search_keys: list[str] = []
+        self._tooltips: dict[str, str] = {}
+        self._running: Optional[str] = None
+        self._busy: Optional[str] = None
+
+    def set_profiles(self, profiles: Iterable[tuple[str, Iterable[str]]]) -> None:
+        """Заменяет каталог: пары (имя профиля, имена файлов списков)."""
+        self.beginResetModel()
+        self._names = []
+        self.search_keys = []
+        for name, lists in profiles:
+            self._names.append(name)
+            self.search_keys.append("\n".join((name, *lists)).lower())
+        self._rows = {name: row for row, name in enumerate(self._names)}
+        self._tooltips = {}
+        self.endResetModel()
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._names)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        name = self._names[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return name
+        if role == StateRole:
+            return self.state(name)
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return self._tooltips.get(name) or None
+        return None
+
+    def name_at(self, row: int) -> str:
+        return self._names[row]
+
+    def state(self, name: Optional[str]) -> int:
+        if name is not None and name == self._busy:
+            return STATE_BUSY
+        if name is not None and name == self._running:
+            return STATE_RUNNING
+        return STATE_IDLE
+
+    def _changed(self, *names: Optional[str]) -> None:
+        for name in dict.fromkeys(names):
+            row = self._rows.get(name) if name is not None else None
+            if row is not None:
+                index = self.index(row)
+                self.dataChanged.emit(index, index, [StateRole])
+
+    def set_running(self, name: Optional[str]) -> None:
+        previous, self._running = self._running, name
+        if previous != name:
+            self._changed(previous, name)
+
+    def set_busy(self, name: Optional[str]) -> None:
+        previous, self._busy = self._busy, name
+        if previous != name:
+            self._changed(previous, name)
+
+    def set_tooltips(self, tooltips: dict[str, str]) -> None:
+        """Подсказки по профилям; сообщает только о строках, где текст изменился."""
+        changed = [
+            name
+            for name in self._rows
+            if tooltips.get(name, "") != self._tooltips.get(name, "")
+        ]
+        self._tooltips = {name: text for name, text in tooltips.items() if text}
+        for name in changed:
+            index = self.index(self._rows[name])
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.ToolTipRole])
+
+
+class ProfileFilterProxy(QSortFilterProxyModel):
+    """Фильтр по подстроке в имени профиля и именах его списков.
+
+    Если новый запрос продолжает предыдущий, подходящих строк может только
+    убавиться, и проверяются лишь строки, прошедшие прошлый фильтр.
+    """
+
+    def __init__(self, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self._needle: str = ""
+        self._accepted: Optional[set[int]] = None
+
+    def set_pattern(self, text: str) -> None:
+        needle = text.strip().lower()
+        if needle == self._needle:
+            return
+        source: ProfileListModel = self.sourceModel()
+        keys = source.search_keys
+        if not needle:
+            self._accepted = None
+        elif self._needle and needle.startswith(self._needle) and self._accepted is not None:
+            self._accepted = {row for row in self._accepted if needle in keys[row]}
+        else:
+            self._accepted = {row for row, key in enumerate(keys) if needle in key}
+        self._needle = needle
+        self.invalidateFilter()
+
+    def setSourceModel(self, model: ProfileListModel) -> None:
+        super().setSourceModel(model)
+        model.modelReset.connect(self._reset)
+
+    def _reset(self) -> None:
+        needle, self._needle = self._needle, ""
+        self.set_pattern(needle)
+
+    def filterAcceptsRow(self, source_row: int, source_parent: QModelIndex) -> bool:
+        return self._accepted is None or source_row in self._accepted
+
+
+class ProfileDelegate(QStyledItemDelegate):
+    """Рисует строку как кнопку профиля: фон зависит от состояния."""
+
+    BACKGROUND: dict[int, QColor] = {
+        STATE_IDLE: QColor("#3a3a3a"),
+        STATE_RUNNING: QColor("lightgreen"),
+        STATE_BUSY: QColor("khaki"),
+    }
+    HOVER: QColor = QColor("#4a4a4a")
+    BORDER: QColor = QColor("#4a4a4a")
+
+    def __init__(self, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self.painted: int = 0
+
+    def sizeHint(self, option: QStyleOptionViewItem, index: QModelIndex) -> QSize:
+        return QSize(option.rect.width(), ROW_HEIGHT + ROW_SPACING)
+
+    def paint(self, painter: QPainter, option: QStyleOptionViewItem, index: QModelIndex) -> None:
+        self.painted += 1
+        state = index.data(StateRole)
+        rect = QRect(option.rect).adjusted(0, ROW_SPACING // 2, -1, -ROW_SPACING // 2 - 1)
+        background = self.BACKGROUND[state]
+        if state == STATE_IDLE and option.state & QStyle.StateFlag.State_MouseOver:
+            background = self.HOVER
+        painter.save()
+        painter.fillRect(rect, background)
+        painter.setPen(QPen(self.BORDER))
+        painter.drawRect(rect)
+        painter.setPen(QColor("black") if state != STATE_IDLE else QColor("white"))
+        painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, index.data(Qt.ItemDataRole.DisplayRole))
+        painter.restore()
+
+
+class ProfileListView(QListView):
+    """QListView, который при смене состояния строки только перерисовывает ее.
+
+    На любой dataChanged QListView заново раскладывает все строки, это
+    O(n) на каждое переключение. Состояние и подсказка на размер строк не
+    влияют, так что для этих ролей достаточно перерисовки.
+    """
+
+    REPAINT_ONLY_ROLES: frozenset[int] = frozenset({StateRole, Qt.ItemDataRole.ToolTipRole})
+
+    def dataChanged(self, top_left: QModelIndex, bottom_right: QModelIndex, roles: Iterable[int] = ()) -> None:
+        if roles and all(role in self.REPAINT_ONLY_ROLES for role in roles):
+            for row in range(top_left.row(), bottom_right.row() + 1):
+                self.update(top_left.siblingAtRow(row))
+            return
+        super().dataChanged(top_left, bottom_right, roles)
+
+
+class ProfileListWidget(QWidget):
+    """Поле поиска и список профилей; profile_clicked передает имя профиля."""
+
+    profile_clicked: pyqtSignal = pyqtSignal(str)
+
+    def __init__(self, placeholder: str = "", parent: Optional[QWidget] = None):
+        super().__init__(parent)
+        self.model: ProfileListModel = ProfileListModel(self)
+        self.proxy: ProfileFilterProxy = ProfileFilterProxy(self)
+        self.proxy.setSourceModel(self.model)
+        self.delegate: ProfileDelegate = ProfileDelegate(self)
+
+        self.search: QLineEdit = QLineEdit(self)
+        self.search.setPlaceholderText(placeholder)
+        self.search.setClearButtonEnabled(True)
+        self.search.textChanged.connect(self.proxy.set_pattern)
+
+        self.view: ProfileListView = ProfileListView(self)
+        self.view.setModel(self.proxy)
+        self.view.setItemDelegate(self.delegate)
+        # Одинаковая высота строк: представлению не нужно опрашивать каждую строку.
+        self.view.setUniformItemSizes(True)
+        self.view.setMouseTracking(True)
+        self.view.setSelectionMode(QListView.SelectionMode.NoSelection)
+        self.view.setVerticalScrollMode(QListView.ScrollMode.ScrollPerPixel)
+        self.view.clicked.connect(self._on_clicked)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.search)
+        layout.addWidget(self.view)
+
+    def _on_clicked(self, index: QModelIndex) -> None:
+        source = self.proxy.mapToSource(index)
+        if source.isValid():
+            self.profile_clicked.emit(self.model.name_at(source.row()))
@@ -0,0 +1,184 @@
+"""Замер списка профилей на большом каталоге с платформой Qt offscreen.
+
+``python -m src.gui.profile_list_bench --profiles 10000`` в отдельных
+процессах строит список профилей (модель, фильтр и делегат) и, для
+сравнения, прежний вариант с кнопкой на профиль в QScrollArea. Для
+каждого печатаются время построения с первой отрисовкой, прирост RSS,
+время смены состояния строки (занят -> запущен) до конца перерисовки и
+число перерисованных строк. Для модели отдельно меряется поиск по мере
+набора запроса. Без PyQt6 замер пропускается с кодом 0.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Final, Optional
+
+from src.core.resource_sampler import open_reader
+
+
+MODES: Final[tuple[str, ...]] = ("list", "buttons")
+SEARCH_QUERY: Final[str] = "ipset-07"
+# Профили, которые переключаются в замере: видимые строки в начале списка.
+TOGGLED_ROWS: Final[int] = 5
+
+
+def _rss_mb() -> float:
+    reader = open_reader(os.getpid())
+    try:
+        return reader.sample()[1] / 2**20
+    finally:
+        reader.close()
+
+
+def _catalog(count: int) -> list[tuple[str, list[str]]]:
+    return [
+        (f"Профиль {n:05d}", ["list-general.txt", f"ipset-{n % 100:02d}.txt"])
+        for n in range(count)
+    ]
+
+
+def _percentiles(samples: list[float]) -> tuple[float, float]:
+    ordered = sorted(samples)
+    return statistics.median(ordered), ordered[min(int(0.95 * len(ordered)), len(ordered) - 1)]
+
+
+def run_mode(mode: str, count: int, toggles: int) -> int:
+    from PyQt6.QtWidgets import QApplication, QPushButton, QScrollArea, QVBoxLayout, QWidget
+
+    app = QApplication.instance() or QApplication([sys.argv[0]])
+    catalog = _catalog(count)
+    names = [name for name, _ in catalog]
+    rss_before = _rss_mb()
+    started = time.perf_counter()
+    if mode == "list":
+        from src.gui.profile_list import ProfileListWidget
+
+        widget = ProfileListWidget("search")
+        widget.model.set_profiles(catalog)
+        model, delegate = widget.model, widget.delegate
+
+        def set_state(name: Optional[str], running: bool) -> None:
+            if running:
+                model.set_running(name)
+                model.set_busy(None)
+            else:
+                model.set_busy(name)
+    else:
+        # Прежняя реализация: кнопка со своим стилем на каждый профиль.
+        widget = QScrollArea()
+        widget.setWidgetResizable(True)
+        inner = QWidget()
+        layout = QVBoxLayout(inner)
+        buttons: dict[str, QPushButton] = {}
+        for name in names:
+            button = QPushButton(name)
+            button.setStyleSheet("")
+            button.setMinimumHeight(30)
+            button.clicked.connect(lambda checked, n=name: None)
+            layout.addWidget(button)
+            buttons[name] = button
+        widget.setWidget(inner)
+        current: dict[str, Optional[str]] = {"running": None, "busy": None}
+        delegate = None
+
+        def set_state(name: Optional[str], running: bool) -> None:
+            for key in ("running", "busy"):
+                if current[key] in buttons and current[key] != name:
+                    buttons[current[key]].setStyleSheet("")
+            if running:
+                current["running"], current["busy"] = name, None
+                buttons[name].setStyleSheet("background-color: lightgreen; color: black;")
+            else:
+                current["busy"] = name
+                buttons[name].setStyleSheet("background-color: khaki; color: black;")
+
+    widget.resize(500, 350)
+    widget.show()
+    app.processEvents()
+    build = time.perf_counter() - started
+    rss = _rss_mb() - rss_before
+
+    durations: list[float] = []
+    painted: list[int] = []
+    for i in range(toggles):
+        name = names[i % min(TOGGLED_ROWS, count)]
+        if delegate is not None:
+            delegate.painted = 0
+        started = time.perf_counter()
+        set_state(name, running=False)
+        app.processEvents()
+        set_state(name, running=True)
+        app.processEvents()
+        durations.append(time.perf_counter() - started)
+        if delegate is not None:
+            painted.append(delegate.painted)
+    p50, p95 = _percentiles(durations)
+    rows = f"{statistics.mean(painted):.1f}" if painted else "-"
+    print(
+        f"{mode}\t{count}\t{build * 1000:.1f}\t{rss:.1f}\t{p50 * 1000:.3f}\t{p95 * 1000:.3f}\t{rows}",
+        flush=True,
+    )
+
+    if mode == "list":
+        # Набор запроса по одному символу, затем очистка поля.
+        steps: list[str] = []
+        for n in range(1, len(SEARCH_QUERY) + 1):
+            started = time.perf_counter()
+            widget.search.setText(SEARCH_QUERY[:n])
+            app.processEvents()
+            steps.append(f"{(time.perf_counter() - started) * 1000:.1f}")
+        matched = widget.proxy.rowCount()
+        started = time.perf_counter()
+        widget.search.clear()
+        app.processEvents()
+        print(
+            f"# search '{SEARCH_QUERY}': {matched} rows, per keystroke ms {' '.join(steps)}, "
+            f"clear {(time.perf_counter() - started) * 1000:.1f} ms",
+            flush=True,
+        )
+    widget.close()
+    return 0
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure the profile list on a large catalog.")
+    parser.add_argument("--profiles", type=int, default=10000)
+    parser.add_argument("--toggles", type=int, default=200)
+    parser.add_argument("--mode", choices=MODES, help="Measure one mode in this process")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        import PyQt6.QtWidgets  # noqa: F401
+    except ImportError:
+        print("# PyQt6 is not installed: bench skipped")
+        return 0
+    if args.mode:
+        return run_mode(args.mode, args.profiles, args.toggles)
+
+    print("mode\tprofiles\tbuild_ms\trss_mb\ttoggle_p50_ms\ttoggle_p95_ms\trows_painted")
+    for mode in MODES:
+        # Каждый режим в своем процессе, чтобы прирост RSS не смешивался.
+        result = subprocess.run(
+            [
+                sys.executable, "-m", "src.gui.profile_list_bench",
+                "--mode", mode,
+                "--profiles", str(args.profiles),
+                "--toggles", str(args.toggles),
+            ],
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        sys.stdout.write(result.stdout)
+        if result.returncode != 0:
+            print(f"FAIL: {mode} mode exited with {result.returncode}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
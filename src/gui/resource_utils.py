@@ -1,11 +1,13 @@
 import os
 import sys
 
+from src.core import extract_cache
+
 
 def resource_path(relative_path):
     """Возвращает корректный путь для доступа к ресурсам после сборки в exe"""
     if hasattr(sys, "_MEIPASS"):
-        base_path = sys._MEIPASS
+        return extract_cache.resource_path(relative_path)
     else:
         base_path = os.path.abspath("../..")
 
@@ -1,13 +1,9 @@
-import locale
-import json
 import os
-import ctypes
 import sys
-import logging
-from typing import Dict, Optional
+from typing import Dict, Optional, Set
 
-logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 
+FALLBACK_LANG = "en"
 
 try:
     if getattr(sys, "frozen", False) and hasattr(sys, "_MEIPASS"):
@@ -21,123 +17,115 @@ except NameError:
 
 
 def resource_path(relative_path: str) -> str:
-    """Возвращает абсолютный путь к ресурсу."""
+    """Возвращает абсолютный путь к ресурсу (в сборке — из кэша распаковки)."""
+    if getattr(sys, "frozen", False):
+        from src.core import extract_cache
+
+        return extract_cache.resource_path(relative_path)
     return os.path.join(_BASE_PATH, relative_path)
 
 
+def _logger():
+    # logging импортируется лениво: он не нужен, пока не о чем сообщать.
+    import logging
+
+    return logging.getLogger(__name__)
+
+
 class Translator:
-    def __init__(self):
-        self._translations: Dict[str, Dict[str, str]] = {}
-        self._current_lang: str = "en"
-        self._load_translations()
-        if self._translations:
-            self._current_lang = self._detect_system_language()
-        logging.info(f"Translator initialized. Using language: {self._current_lang}")
-
-    def _load_translations(self) -> None:
+    """Каталог сообщений, который строится при первом обращении.
+
+    Загружается только файл определенного языка, английские строки
+    подмешиваются в него заранее, так что перевод — один поиск в плоском
+    словаре. Предупреждение о каждом отсутствующем ключе выводится один раз.
+    """
+
+    def __init__(self, translations_dir: Optional[str] = None):
+        # Каталог определяется при первой загрузке: в сборке это распаковка кэша.
+        self._translations_dir: Optional[str] = translations_dir
+        self._catalog: Optional[Dict[str, str]] = None
+        self._current_lang: str = FALLBACK_LANG
+        self._missing: Set[str] = set()
+
+    @property
+    def current_lang(self) -> str:
+        self._ensure_loaded()
+        return self._current_lang
+
+    def _lang_path(self, lang: str) -> str:
+        if self._translations_dir is None:
+            self._translations_dir = resource_path("src/gui/translations")
+        return os.path.join(self._translations_dir, f"{lang}.json")
+
+    def _load_file(self, lang: str) -> Optional[Dict[str, str]]:
+        import json
+
+        file_path = self._lang_path(lang)
         try:
-            translations_dir = resource_path("src/gui/translations")
-            if not os.path.isdir(translations_dir):
-                logging.error(f"Translations directory not found: {translations_dir}")
-                return
-
-            logging.info(f"Loading translations from: {translations_dir}")
-            loaded_langs = []
-            for filename in os.listdir(translations_dir):
-                if filename.endswith(".json"):
-                    lang = filename.split(".")[0]
-                    file_path = os.path.join(translations_dir, filename)
-                    try:
-                        with open(file_path, "r", encoding="utf-8") as f:
-                            self._translations[lang] = json.load(f)
-                        loaded_langs.append(lang)
-                    except json.JSONDecodeError as json_e:
-                        logging.error(f"Error decoding JSON file {filename}: {json_e}")
-                    except IOError as io_e:
-                        logging.error(
-                            f"Error reading translation file {filename}: {io_e}"
-                        )
-                    except Exception as e:
-                        logging.error(
-                            f"Unexpected error loading translation file {filename}: {e}"
-                        )
-
-            if loaded_langs:
-                logging.info(f"Loaded languages: {', '.join(loaded_langs)}")
-            else:
-                logging.warning("No translations were successfully loaded.")
-
+            with open(file_path, "r", encoding="utf-8") as f:
+                return json.load(f)
         except FileNotFoundError:
-            logging.error(
-                f"Base translations directory path incorrect or inaccessible."
-            )
-        except Exception as e:
-            logging.error(f"Error accessing translations directory: {e}")
+            _logger().error(f"Translation file not found: {file_path}")
+        except json.JSONDecodeError as json_e:
+            _logger().error(f"Error decoding JSON file {file_path}: {json_e}")
+        except OSError as io_e:
+            _logger().error(f"Error reading translation file {file_path}: {io_e}")
+        return None
+
+    def _ensure_loaded(self) -> Dict[str, str]:
+        if self._catalog is not None:
+            return self._catalog
+
+        catalog: Dict[str, str] = self._load_file(FALLBACK_LANG) or {}
+        lang = self._detect_system_language()
+        if lang != FALLBACK_LANG:
+            translations = self._load_file(lang)
+            if translations is not None:
+                catalog.update(translations)
+            else:
+                lang = FALLBACK_LANG
+        self._current_lang = lang
+        self._catalog = catalog
+        return catalog
 
     def _detect_system_language(self) -> str:
-        detected_lang = "en"
+        if sys.platform == "win32":
+            try:
+                import ctypes
 
-        try:
-            if sys.platform == "win32":
-                windll = ctypes.windll.kernel32
-                lang_id = windll.GetUserDefaultUILanguage()
-                primary_lang = lang_id & 0xFF
+                lang_id = ctypes.windll.kernel32.GetUserDefaultUILanguage()
                 # 0x09 = en, 0x19 = ru
-                logging.info(
-                    f"Detected WinAPI UI Language ID: {lang_id:#04x} (Primary: {primary_lang:#02x})"
-                )
-                if primary_lang == 0x19 and "ru" in self._translations:
-                    detected_lang = "ru"
-                    logging.info("Detected 'ru' via WinAPI UI Language.")
-                    return detected_lang
-        except Exception as e:
-            logging.warning(f"Windows API language detection failed: {e}")
+                if lang_id & 0xFF == 0x19 and os.path.exists(self._lang_path("ru")):
+                    return "ru"
+            except Exception as e:
+                _logger().warning(f"Windows API language detection failed: {e}")
 
         try:
-            locale_lang, _ = locale.getdefaultlocale()
-            logging.info(f"Detected locale: {locale_lang}")
-            if locale_lang:
-
-                if locale_lang.lower().startswith("ru") and "ru" in self._translations:
-                    detected_lang = "ru"
-                    logging.info("Detected 'ru' via locale.")
-
+            import locale
+
+            locale_lang, _ = locale.getlocale()
+            if (
+                locale_lang
+                and locale_lang.lower().startswith("ru")
+                and os.path.exists(self._lang_path("ru"))
+            ):
+                return "ru"
         except Exception as e:
-            logging.warning(f"Locale detection failed: {e}")
-
-        if detected_lang == "ru" and "ru" not in self._translations:
-            logging.warning(
-                "Detected 'ru' but 'ru.json' not loaded. Falling back to 'en'."
-            )
-            return "en"
-        elif "en" not in self._translations and detected_lang == "en":
-            logging.warning(
-                "'en.json' not loaded, but it's the default/fallback language."
-            )
+            _logger().warning(f"Locale detection failed: {e}")
 
-            return "en"
-
-        return detected_lang
+        return FALLBACK_LANG
 
     def translate(self, key: str, default: Optional[str] = None) -> str:
         """Возвращает перевод для ключа или значение по умолчанию."""
-
-        lang_dict = self._translations.get(self._current_lang)
-
-        if lang_dict is None:
-            lang_dict = self._translations.get("en")
-
-        if lang_dict is None:
-            return default if default is not None else key
-
-        translation = lang_dict.get(key)
+        translation = self._ensure_loaded().get(key)
         if translation is not None:
             return translation
-        else:
-            logging.warning(
+        if key not in self._missing:
+            self._missing.add(key)
+            _logger().warning(
                 f"Translation key '{key}' not found for language '{self._current_lang}'."
             )
-            return default if default is not None else key
+        return default if default is not None else key
 
 
 translator = Translator()
@@ -1,18 +1,66 @@
-import os
 import json
+import os
 import shlex
+import shutil
 import subprocess
-from typing import Final
+import sys
+import time
+from typing import Any, Callable, Final, Optional
 
+from src.core import lifecycle
+from src.core.backends import RunnerBackend, create_backend
+from src.core.extract_cache import resource_path
+from src.core.latency import LatencyRecorder
+from src.core.paths import data_dir
+from src.core.process_log import LogBuffer, StderrReader
+from src.core.process_utils import (
+    DETACHED_CREATION_FLAGS,
+    pid_alive,
+    process_start_time,
+    stop_pid,
+)
+from src.core.registry import ProfileEntry, ProfileRegistry
+from src.core.validation import MANIFEST_NAME, PROBLEM_MISSING, ProfileValidator
 from src.gui.translations import translator
 
 
-SCRIPT_DIR: Final[str] = os.path.dirname(os.path.abspath(__file__))
+# В onefile-сборке скрипты и бинарники берутся из постоянного кэша распаковки.
+SCRIPT_DIR: Final[str] = (
+    resource_path("src/scripts")
+    if getattr(sys, "frozen", False)
+    else os.path.dirname(os.path.abspath(__file__))
+)
+COMMANDS_PATH: Final[str] = os.path.join(SCRIPT_DIR, "commands.json")
+WINWS_EXE_PATH: Final[str] = os.path.join(SCRIPT_DIR, "bin", "winws.exe")
+# Переопределяет команду запуска winws/nfqws (например, заглушкой для тестов).
+WINWS_LAUNCHER_ENV: Final[str] = "ZAPRET_WINWS"
+# "1" включает режим с отдельным процессом winws на каждую группу портов.
+SHARDED_ENV: Final[str] = "ZAPRET_SHARDED"
+PREFETCH_CHUNK: Final[int] = 1 << 20
+# Сколько ждать выхода после мягкой остановки и после принудительной, секунды.
+# На Windows Popen.terminate() уже вызывает TerminateProcess, и ожидание
+# подтверждает, что winws закрыл дескрипторы WinDivert.
+GRACEFUL_STOP_TIMEOUT: Final[float] = 2.0
+KILL_TIMEOUT: Final[float] = 1.0
+# PID и время запуска процессов winws: по ним следующий запуск находит
+# процессы, оставшиеся после аварийного завершения приложения.
+LOCK_NAME: Final[str] = "winws.lock"
+
+
+def default_backend() -> RunnerBackend:
+    return create_backend(SCRIPT_DIR, WINWS_EXE_PATH)
+
+
+def default_launcher(backend: Optional[RunnerBackend] = None) -> tuple[str, ...]:
+    override = os.environ.get(WINWS_LAUNCHER_ENV)
+    if override:
+        return tuple(shlex.split(override))
+    return (backend or default_backend()).default_launcher()
 
 
 class ZapretRunner:
     _instance = None
-    commands: dict[str, str] = {}
+    registry: ProfileRegistry
 
     def __new__(cls, *args, **kwargs):
         if cls._instance is None:
@@ -21,45 +69,103 @@ class ZapretRunner:
         return cls._instance
 
     def __init__(self):
-        self._current_process: subprocess.Popen | None = None
-        self._load_commands()
+        if getattr(self, "_initialized", False):
+            return
+        self._processes: list[subprocess.Popen] = []
+        self._shards: tuple[tuple[str, ...], ...] = ()
+        self._profile: Optional[str] = None
+        self.sharded: bool = os.environ.get(SHARDED_ENV) == "1"
+        self.log_buffer: LogBuffer = LogBuffer()
+        self.stop_latency: LatencyRecorder = LatencyRecorder()
+        self.graceful_timeout: float = GRACEFUL_STOP_TIMEOUT
+        self.kill_timeout: float = KILL_TIMEOUT
+        self.lock_path: str = os.path.join(data_dir(), LOCK_NAME)
+        self.backend: RunnerBackend = default_backend()
+        self.registry = ProfileRegistry(COMMANDS_PATH, SCRIPT_DIR, default_launcher(self.backend))
+        self.validator: ProfileValidator = ProfileValidator(
+            self.registry, os.path.join(data_dir(), MANIFEST_NAME)
+        )
+        self._initialized = True
 
-    @classmethod
-    def _load_commands(cls) -> None:
-        commands_path = os.path.join(SCRIPT_DIR, "commands.json")
-        try:
-            with open(commands_path, "r", encoding="utf-8") as f:
-                commands_data = json.load(f)
-                cls.commands = {
-                    name: data["args"] for name, data in commands_data.items()
-                }
-        except Exception as e:
-            raise RuntimeError(f"Failed to load commands: {str(e)}")
+    @property
+    def commands(self) -> dict[str, str]:
+        return self.registry.commands
 
-    def run(self, command_name: str) -> None:
-        if command_name not in self.commands:
+    @property
+    def current_process(self) -> subprocess.Popen | None:
+        """Процесс winws (в режиме шардов — первый из них)."""
+        return self._processes[0] if self._processes else None
+
+    @property
+    def processes(self) -> tuple[subprocess.Popen, ...]:
+        """Все процессы текущего профиля, по одному на шард."""
+        return tuple(self._processes)
+
+    def use_backend(self, backend: RunnerBackend) -> None:
+        """Меняет бэкенд (процессы должны быть остановлены) и пересобирает argv."""
+        self.backend = backend
+        self.registry.set_launcher(default_launcher(backend))
+
+    def discard_process(self, process: subprocess.Popen) -> None:
+        """Забывает процесс, завершившийся самостоятельно."""
+        if process in self._processes:
+            self._processes.remove(process)
+            self._write_lock()
+
+    def prepare(self, command_name: str) -> ProfileEntry:
+        """Проверяет файлы профиля и заранее читает те, которые winws откроет при старте.
+
+        Вызывается до остановки текущего процесса, чтобы при переключении
+        профиля на этот этап не приходилось время без обхода.
+        """
+        self.registry.refresh()
+        if command_name not in self.registry:
             raise ValueError(f"Command '{command_name}' not found")
+        entry = self.registry.get(command_name)
 
-        winws_exe_path = os.path.join(SCRIPT_DIR, "bin", "winws.exe")
-        winws_args = self.commands[command_name]
-        args = [winws_exe_path] + shlex.split(winws_args)
+        executable = entry.argv[0]
+        missing = [] if os.path.isfile(executable) or shutil.which(executable) else [executable]
+        issues = [issue for issue in self.validator.validate([command_name])[command_name] if issue.fatal]
+        self.validator.save()
+        missing += [issue.path for issue in issues if issue.problem == PROBLEM_MISSING]
+        if missing:
+            raise RuntimeError(
+                translator.translate("profile_files_missing", "Files not found: {files}").format(
+                    files=", ".join(missing)
+                )
+            )
+        if issues:
+            raise RuntimeError(
+                translator.translate("profile_files_invalid", "Invalid profile files: {files}").format(
+                    files="; ".join(str(issue) for issue in issues)
+                )
+            )
+        buffer = bytearray(PREFETCH_CHUNK)
+        for path in entry.files:
+            try:
+                with open(path, "rb", buffering=0) as f:
+                    while f.readinto(buffer):
+                        pass
+            except OSError:
+                pass
+        return entry
 
-        self._current_process = subprocess.Popen(
-            args,
+    def _popen(self, argv: tuple[str, ...]) -> subprocess.Popen:
+        process = subprocess.Popen(
+            argv,
             cwd=SCRIPT_DIR,
-            creationflags=(
-                subprocess.CREATE_NO_WINDOW
-                | subprocess.CREATE_NEW_PROCESS_GROUP
-                | subprocess.DETACHED_PROCESS
-            ),
+            creationflags=DETACHED_CREATION_FLAGS,
             stdout=subprocess.DEVNULL,
             stderr=subprocess.PIPE,
             stdin=subprocess.DEVNULL,
             shell=False,
         )
-        return_code = self._current_process.poll()
+        StderrReader(process.stderr, self.log_buffer).start()
+        return process
+
+    def _check_started(self, process: subprocess.Popen) -> None:
+        return_code = process.poll()
         if return_code is not None and return_code != 0:
-            self._current_process.stderr.close()
             raise RuntimeError(
                 translator.translate(
                     "process_immediate_exit",
@@ -67,17 +173,190 @@ class ZapretRunner:
                 )
             )
 
+    def _backend_call(self, action: Callable[[], None]) -> None:
+        try:
+            action()
+        except (OSError, RuntimeError, ValueError) as e:
+            raise RuntimeError(
+                translator.translate(
+                    "backend_error", "Failed to set up packet interception ({backend}): {error}"
+                ).format(backend=self.backend.name, error=e)
+            )
+
+    def _rollback_backend(self) -> None:
+        # Исходная ошибка запуска важнее ошибки отката.
+        try:
+            self.backend.rollback()
+        except (OSError, RuntimeError):
+            pass
+
+    def spawn(self, entry: ProfileEntry) -> None:
+        """Запускает winws для подготовленного профиля (в режиме шардов — пул процессов)."""
+        self._shards = self.backend.commands(entry, self.registry.launcher, self.sharded)
+        self._backend_call(lambda: self.backend.activate(entry))
+        started: list[subprocess.Popen] = []
+        try:
+            for argv in self._shards:
+                started.append(self._popen(argv))
+        except OSError:
+            # Уже запущенные шарды не должны остаться работать без учета.
+            self._processes = []
+            self._stop_processes(tuple(started))
+            self._rollback_backend()
+            raise
+        self._processes = started
+        self._profile = entry.name
+        lifecycle.mark("spawned", entry.name, processes=len(self._processes))
+        try:
+            for process in self._processes:
+                self._check_started(process)
+        except RuntimeError:
+            processes, self._processes = tuple(self._processes), []
+            self._stop_processes(processes)
+            self._rollback_backend()
+            raise
+        lifecycle.mark("first_poll", entry.name)
+        self._write_lock()
+
+    def respawn(self, index: int) -> None:
+        """Перезапускает один шард, не трогая остальные."""
+        process = self._popen(self._shards[index])
+        self._processes[index] = process
+        self._write_lock()
+        self._check_started(process)
+
+    def run(self, command_name: str) -> None:
+        self.spawn(self.prepare(command_name))
+
+    def _stop_processes(self, processes: tuple[subprocess.Popen, ...]) -> list[subprocess.Popen]:
+        """Мягкая остановка, ожидание до срока, затем kill. Возвращает невышедшие процессы."""
+        started = time.perf_counter()
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+        lifecycle.mark("terminate_sent", self._profile)
+        deadline = time.monotonic() + self.graceful_timeout
+        stubborn = [p for p in processes if not self._wait(p, deadline)]
+        if stubborn:
+            for process in stubborn:
+                process.kill()
+            deadline = time.monotonic() + self.kill_timeout
+            stubborn = [p for p in stubborn if not self._wait(p, deadline)]
+        self.stop_latency.record(time.perf_counter() - started)
+        return stubborn
+
+    @staticmethod
+    def _wait(process: subprocess.Popen, deadline: float) -> bool:
+        try:
+            process.wait(max(0.0, deadline - time.monotonic()))
+            return True
+        except subprocess.TimeoutExpired:
+            return False
+
     def terminate(self) -> None:
-        if self._current_process is None:
+        """Останавливает процессы профиля и возвращается только после их выхода."""
+        if not self._processes:
             raise RuntimeError(
                 translator.translate("process_not_launched", "Process is not launched")
             )
+        processes, self._processes = tuple(self._processes), []
         try:
-            self._current_process.terminate()
-            self._current_process = None
+            stubborn = self._stop_processes(processes)
         except Exception:
             raise RuntimeError(
                 translator.translate(
                     "process_stop_error", "Error while stopping process"
                 )
             )
+        finally:
+            self._write_lock()
+        if stubborn:
+            # Перехват снимается и остановка попадает в журнал даже с зависшим
+            # процессом; ошибка остановки важнее ошибки deactivate.
+            lifecycle.mark("process_exited", self._profile, stubborn=len(stubborn))
+            try:
+                self._backend_call(self.backend.deactivate)
+            except RuntimeError:
+                pass
+            raise RuntimeError(
+                translator.translate(
+                    "process_stop_timeout", "Process did not exit after being killed: {pids}"
+                ).format(pids=", ".join(str(p.pid) for p in stubborn))
+            )
+        self._backend_call(self.backend.deactivate)
+        lifecycle.mark("process_exited", self._profile)
+
+    def _write_lock(self) -> None:
+        processes = [
+            {"pid": process.pid, "start": process_start_time(process.pid)}
+            for process in self._processes
+        ]
+        try:
+            if not processes:
+                if os.path.exists(self.lock_path):
+                    os.unlink(self.lock_path)
+                return
+            data = {
+                "owner": {"pid": os.getpid(), "start": process_start_time(os.getpid())},
+                "processes": processes,
+            }
+            partial = self.lock_path + ".tmp"
+            with open(partial, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(partial, self.lock_path)
+        except OSError:
+            pass
+
+    def locked_processes(self) -> list[int]:
+        """PID живых winws из lock-файла, чей бы экземпляр их ни запустил."""
+        try:
+            with open(self.lock_path, "r", encoding="utf-8") as f:
+                data: dict[str, Any] = json.load(f)
+        except (OSError, ValueError):
+            return []
+        return [
+            entry["pid"]
+            for entry in data.get("processes", [])
+            if entry.get("pid")
+            and entry.get("start") is not None
+            and pid_alive(entry["pid"])
+            and process_start_time(entry["pid"]) == entry["start"]
+        ]
+
+    def reap_orphans(self) -> list[int]:
+        """Останавливает winws, оставшиеся от прежнего сеанса, по lock-файлу.
+
+        Процесс останавливается, только если совпадают и PID, и время
+        запуска, так что чужой процесс с переиспользованным PID не пострадает.
+        Если владелец lock-файла еще работает, его процессы не трогаются.
+        """
+        try:
+            with open(self.lock_path, "r", encoding="utf-8") as f:
+                data: dict[str, Any] = json.load(f)
+        except (OSError, ValueError):
+            return []
+        owner = data.get("owner") or {}
+        owner_pid = owner.get("pid")
+        if (
+            owner_pid
+            and owner_pid != os.getpid()
+            and pid_alive(owner_pid)
+            and process_start_time(owner_pid) == owner.get("start")
+        ):
+            return []
+        reaped: list[int] = []
+        for entry in data.get("processes", []):
+            pid, start = entry.get("pid"), entry.get("start")
+            if not pid or start is None or any(p.pid == pid for p in self._processes):
+                continue
+            if pid_alive(pid) and process_start_time(pid) == start:
+                if stop_pid(pid, self.graceful_timeout, self.kill_timeout):
+                    reaped.append(pid)
+        self._write_lock()
+        if not self._processes:
+            # Правила перехвата прежнего сеанса больше никто не обслуживает.
+            try:
+                self.backend.deactivate()
+            except (OSError, RuntimeError):
+                pass
+        return reaped